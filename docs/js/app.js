@@ -2,12 +2,23 @@
 // Interactive map visualization with filtering
 
 import { Timeline } from './timeline.js';
+import { TextIndex } from './text-search.js';
+import { NameSearch } from './name-search.js';
+import { decodeColumnar } from './columnar.js';
 
 let map;
 let allPersons = [];
 let filteredPersons = [];
 let timeline = null;
 let temporalFilter = null;  // { start: year, end: year }
+let filterIndex = null;     // Precomputed filter bitmaps (data/filters.json), if available
+let clusterPyramid = null;  // Precomputed clusters per zoom level (data/clusters.json), if available
+let clusterZoom = null;     // Pyramid level currently rendered
+let locationTable = null;   // Persons per location (data/locations.json), if available
+let filteredIds = new Set(); // IDs of filteredPersons
+let textIndex = null;       // Full-text index over register entries (data/text_index.json), if available
+let textMatches = null;     // IDs matching the biography search (null = no search)
+let nameSearch = null;      // Prefix/trigram name index (data/name_search.json), if available
 
 // Tooltip variables (accessible to all event handlers)
 let clusterTooltip = null;
@@ -82,6 +93,7 @@ async function init() {
         await loadData();
         initMap();
         initFilters();
+        initNameSearch();
         initTabs();
         log.init('Application ready');
     } catch (error) {
@@ -90,15 +102,38 @@ async function init() {
     }
 }
 
-// Load persons.json data
+// Fetch and parse a JSON file
+async function fetchJSON(url) {
+    const response = await fetch(url);
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    return response.json();
+}
+
+// Sharded index + meta (build_herdata.py --shards), else the columnar file (--columnar), else persons.json
+async function fetchDataset() {
+    try {
+        const [index, meta] = await Promise.all([
+            fetchJSON('data/shards/index.json'),
+            fetchJSON('data/shards/meta.json')
+        ]);
+        return { meta, persons: index.persons };
+    } catch (error) {
+        log.init(`No shards (${error.message}), loading persons.columnar.json`);
+    }
+    try {
+        return decodeColumnar(await fetchJSON('data/persons.columnar.json'));
+    } catch (error) {
+        log.init(`No columnar data (${error.message}), loading persons.json`);
+        return fetchJSON('data/persons.json');
+    }
+}
+
+// Load persons data
 async function loadData() {
     const loading = document.getElementById('loading');
     loading.textContent = 'Daten werden geladen...';
 
-    const response = await fetch('data/persons.json');
-    if (!response.ok) throw new Error(`HTTP ${response.status}`);
-
-    const data = await response.json();
+    const data = await fetchDataset();
 
     // Validate structure
     if (!data.meta || !Array.isArray(data.persons)) {
@@ -106,11 +141,19 @@ async function loadData() {
     }
 
     // Add occupation group to each person
-    allPersons = data.persons.map(person => ({
+    allPersons = data.persons.map((person, row) => ({
         ...person,
-        occupation_group: getOccupationGroup(person)
+        row,  // Position in persons.json (bit/leaf index of filters.json and clusters.json)
+        normierung: person.normierung || (person.gnd ? 'gnd' : 'sndb'),  // Not stored in the shard index
+        occupation_group: person.occupation_group || getOccupationGroup(person)  // Precomputed in the shard index
     }));
     filteredPersons = allPersons;
+    filteredIds = new Set(allPersons.map(person => person.id));
+    filterIndex = await loadFilterIndex(allPersons.length, data.meta.generated);
+    clusterPyramid = await loadClusterPyramid(allPersons.length, data.meta.generated);
+    locationTable = await loadLocationTable();
+    textIndex = await loadTextIndex();
+    nameSearch = await loadNameSearch();
 
     // Update stats in navbar
     updateStats(data.meta);
@@ -165,36 +208,182 @@ function initMap() {
     });
 }
 
+// GeoJSON point feature of a person at the first place (primary location)
+function personFeature(person) {
+    const place = person.places[0];
+    return {
+        type: 'Feature',
+        geometry: {
+            type: 'Point',
+            coordinates: [place.lon, place.lat]
+        },
+        properties: {
+            id: person.id,
+            name: person.name,
+            role: person.role,
+            normierung: person.normierung,
+            gnd: person.gnd || null,
+            birth: person.dates?.birth || null,
+            death: person.dates?.death || null,
+            letter_count: person.letter_count || 0,
+            mention_count: person.mention_count || 0,
+            place_name: place.name,
+            place_type: place.type
+        }
+    };
+}
+
 // Convert persons to GeoJSON format
 function personsToGeoJSON(persons) {
-    const features = [];
+    const features = persons
+        .filter(person => person.places && person.places.length > 0)
+        .map(personFeature);
 
-    persons.forEach(person => {
-        if (!person.places || person.places.length === 0) return;
+    return {
+        type: 'FeatureCollection',
+        features: features
+    };
+}
 
-        // Use first place (primary location)
-        const place = person.places[0];
+// Load the cluster pyramid (build_herdata.py --clusters); null if missing or from another run than the persons
+async function loadClusterPyramid(count, generated) {
+    try {
+        const data = await fetchJSON('data/clusters.json');
+        if (data.version !== 1 || data.leaves.length !== count) return null;
+        if (data.generated !== generated) {
+            log.init('Cluster pyramid is from another run, clustering in the browser');
+            return null;
+        }
+        log.init(`Cluster pyramid loaded (zoom ${data.min_zoom}-${data.max_zoom})`);
+        return data;
+    } catch (error) {
+        return null;
+    }
+}
 
-        features.push({
-            type: 'Feature',
-            geometry: {
-                type: 'Point',
-                coordinates: [place.lon, place.lat]
-            },
-            properties: {
-                id: person.id,
-                name: person.name,
-                role: person.role,
-                normierung: person.normierung,
-                gnd: person.gnd || null,
-                birth: person.dates?.birth || null,
-                death: person.dates?.death || null,
-                letter_count: person.letter_count || 0,
-                mention_count: person.mention_count || 0,
-                place_name: place.name,
-                place_type: place.type
-            }
+// Load the location table (build_herdata.py --locations) as Map 'lat,lon' -> persons; null if missing or stale
+async function loadLocationTable() {
+    try {
+        const data = await fetchJSON('data/locations.json');
+        if (data.version !== 1) return null;
+
+        const personsById = new Map(allPersons.map(person => [person.id, person]));
+        const table = new Map();
+        for (const [key, location] of Object.entries(data.locations)) {
+            const persons = location.persons.map(id => personsById.get(id));
+            if (persons.includes(undefined)) return null;
+            table.set(key, persons);
+        }
+        log.init(`Location table loaded (${table.size} locations)`);
+        return table;
+    } catch (error) {
+        return null;
+    }
+}
+
+// Load the full-text index (build_herdata.py --text-index); null if missing
+async function loadTextIndex() {
+    try {
+        const index = new TextIndex(await fetchJSON('data/text_index.json'));
+        log.init(`Text index loaded (${index.docs.length} persons, ${index.terms.length} terms)`);
+        return index;
+    } catch (error) {
+        return null;
+    }
+}
+
+// Load the name search index (build_herdata.py --name-search); null if missing
+async function loadNameSearch() {
+    try {
+        const index = new NameSearch(await fetchJSON('data/name_search.json'));
+        log.init(`Name search loaded (${index.names.length} name forms)`);
+        return index;
+    } catch (error) {
+        return null;
+    }
+}
+
+// Filtered persons whose first place is within radius (degrees) of a point
+function filteredPersonsNear(lon, lat, radius) {
+    const withinRadius = (placeLon, placeLat) =>
+        Math.sqrt(Math.pow(placeLon - lon, 2) + Math.pow(placeLat - lat, 2)) < radius;
+
+    if (!locationTable) {
+        return filteredPersons.filter(person => {
+            if (!person.places || person.places.length === 0) return false;
+            return withinRadius(person.places[0].lon, person.places[0].lat);
         });
+    }
+
+    // Look up every location key (4 decimals) in the surrounding box
+    const steps = Math.ceil(radius * 10000);
+    const baseLat = Math.round(lat * 10000);
+    const baseLon = Math.round(lon * 10000);
+    const found = [];
+    for (let dLat = -steps; dLat <= steps; dLat++) {
+        for (let dLon = -steps; dLon <= steps; dLon++) {
+            const keyLat = (baseLat + dLat) / 10000;
+            const keyLon = (baseLon + dLon) / 10000;
+            const persons = locationTable.get(`${keyLat.toFixed(4)},${keyLon.toFixed(4)}`);
+            if (!persons) continue;
+            for (const person of persons) {
+                if (filteredIds.has(person.id) && withinRadius(person.places[0].lon, person.places[0].lat)) {
+                    found.push(person);
+                }
+            }
+        }
+    }
+    return found.sort((a, b) => a.row - b.row);  // Same order as filteredPersons
+}
+
+// Pyramid level for the current map zoom (max_zoom + 1 = individual points)
+function pyramidLevel() {
+    const zoom = Math.floor(map.getZoom());
+    return Math.max(clusterPyramid.min_zoom, Math.min(zoom, clusterPyramid.max_zoom + 1));
+}
+
+// Abbreviated cluster count label (as in MapLibre clustering)
+function abbreviateCount(count) {
+    if (count >= 10000) return `${Math.round(count / 1000)}k`;
+    if (count >= 1000) return `${Math.round(count / 100) / 10}k`;
+    return count;
+}
+
+// Precomputed clusters of the current zoom level, recounted for the filtered persons
+function clustersToGeoJSON(persons, zoom) {
+    const pyramid = clusterPyramid;
+    if (zoom > pyramid.max_zoom) return personsToGeoJSON(persons);
+
+    const level = pyramid.levels[zoom];
+    const nodeCount = level.count.length;
+    const members = Array.from({ length: nodeCount }, () => []);
+    for (const person of persons) {
+        let node = pyramid.leaves[person.row];
+        if (node < 0) continue;
+        for (let z = pyramid.max_zoom; z > zoom; z--) node = pyramid.parents[z][node];
+        members[node].push(person);
+    }
+
+    const features = [];
+    members.forEach((nodePersons, node) => {
+        if (nodePersons.length === 1) {
+            features.push(personFeature(nodePersons[0]));
+        } else if (nodePersons.length > 1) {
+            const roleCount = role => nodePersons.filter(p => p.role === role).length;
+            features.push({
+                type: 'Feature',
+                geometry: { type: 'Point', coordinates: [level.lon[node], level.lat[node]] },
+                properties: {
+                    cluster: true,
+                    point_count: nodePersons.length,
+                    point_count_abbreviated: abbreviateCount(nodePersons.length),
+                    sender_count: roleCount('sender'),
+                    mentioned_count: roleCount('mentioned'),
+                    both_count: roleCount('both'),
+                    indirect_count: roleCount('indirect')
+                }
+            });
+        }
     });
 
     return {
@@ -205,13 +394,26 @@ function personsToGeoJSON(persons) {
 
 // Render markers on map
 function renderMarkers(persons) {
-    const geojson = personsToGeoJSON(persons);
+    let geojson;
+    if (clusterPyramid) {
+        clusterZoom = pyramidLevel();
+        geojson = clustersToGeoJSON(persons, clusterZoom);
+    } else {
+        geojson = personsToGeoJSON(persons);
+    }
 
     // Check if source exists - update data or create new source
     if (map.getSource('persons')) {
         // Update existing source data (preserves layers and event handlers)
         log.render(`Updating data: ${geojson.features.length} markers (via setData)`);
         map.getSource('persons').setData(geojson);
+    } else if (clusterPyramid) {
+        // First time: precomputed clusters, no client-side clustering
+        log.render(`Creating source: ${geojson.features.length} markers and clusters (precomputed)`);
+        map.addSource('persons', {
+            type: 'geojson',
+            data: geojson
+        });
     } else {
         // First time: create source with clustering
         log.render(`Creating source: ${geojson.features.length} markers (initial)`);
@@ -328,6 +530,12 @@ function addMapLayers() {
 function setupEventHandlers() {
     log.event('Registering event handlers');
 
+    // Precomputed clusters: switch pyramid level when the integer zoom changes
+    map.on('zoomend', () => {
+        if (!clusterPyramid) return;
+        if (pyramidLevel() !== clusterZoom) renderMarkers(filteredPersons);
+    });
+
     // Click handler for individual markers
     map.on('click', 'persons-layer', (e) => {
         const features = map.queryRenderedFeatures(e.point, {
@@ -371,15 +579,7 @@ function setupEventHandlers() {
 
             // Find all persons at this exact location from our data
             const radius = 0.001; // ~100m radius for coordinate matching
-            const personsAtLocation = filteredPersons.filter(person => {
-                if (!person.places || person.places.length === 0) return false;
-                const place = person.places[0];
-                const distance = Math.sqrt(
-                    Math.pow(place.lon - clusterCoords[0], 2) +
-                    Math.pow(place.lat - clusterCoords[1], 2)
-                );
-                return distance < radius;
-            });
+            const personsAtLocation = filteredPersonsNear(clusterCoords[0], clusterCoords[1], radius);
 
             log.click(`Found ${personsAtLocation.length} persons at cluster location`);
 
@@ -643,11 +843,24 @@ function initFilters() {
     const roleCheckboxes = document.querySelectorAll('input[name="role"]');
     const occupationCheckboxes = document.querySelectorAll('input[name="occupation"]');
     const resetButton = document.getElementById('reset-filters');
+    const textSearch = document.getElementById('text-search');
 
     // Attach change listeners
     roleCheckboxes.forEach(cb => cb.addEventListener('change', applyFilters));
     occupationCheckboxes.forEach(cb => cb.addEventListener('change', applyFilters));
 
+    // Biography search (only with the full-text index)
+    if (textIndex) {
+        textSearch.addEventListener('input', () => {
+            const query = textSearch.value.trim();
+            textMatches = query ? new Set(textIndex.search(query)) : null;
+            log.event(`Text search "${query}": ${textMatches ? textMatches.size : allPersons.length} persons`);
+            applyFilters();
+        });
+    } else {
+        document.getElementById('text-search-group').hidden = true;
+    }
+
     // Initialize noUiSlider for year range
     const yearRangeSlider = document.getElementById('year-range-slider');
     const yearRangeText = document.getElementById('year-range-text');
@@ -693,17 +906,126 @@ function initFilters() {
         yearRangeSlider.noUiSlider.set([1762, 1824]);
         temporalFilter = null;
 
+        textSearch.value = '';
+        textMatches = null;
+
         applyFilters();
     });
 }
 
+// Name search box: matching women as links to their detail pages
+function initNameSearch() {
+    const input = document.getElementById('name-search');
+    const results = document.getElementById('name-search-results');
+    if (!nameSearch) {
+        document.getElementById('name-search-group').hidden = true;
+        return;
+    }
+
+    const personsById = new Map(allPersons.map(person => [person.id, person]));
+    input.addEventListener('input', () => {
+        const query = input.value.trim();
+        const persons = query ? nameSearch.search(query).map(id => personsById.get(id)).filter(Boolean) : [];
+        results.innerHTML = persons.map(person => {
+            const dates = person.dates?.birth || person.dates?.death
+                ? `(${person.dates.birth || '?'} – ${person.dates.death || '?'})`
+                : '';
+            return `
+                <div class="person-item" data-id="${person.id}" onclick="window.location.href='person.html?id=${person.id}'">
+                    <div class="person-name"><strong>${person.name}</strong> ${dates}</div>
+                </div>
+            `;
+        }).join('');
+    });
+}
+
+// Decode a base64 bitmap (little-endian bytes, bit i = person i) into 32-bit words
+function decodeBitmap(text, words) {
+    const bytes = new Uint8Array(words * 4);
+    bytes.set(Uint8Array.from(atob(text), c => c.charCodeAt(0)));
+    const view = new DataView(bytes.buffer);
+    const bitmap = new Uint32Array(words);
+    for (let i = 0; i < words; i++) bitmap[i] = view.getUint32(i * 4, true);
+    return bitmap;
+}
+
+// Load filter bitmaps (build_herdata.py --filters); null if missing or from another run than the persons
+async function loadFilterIndex(count, generated) {
+    try {
+        const data = await fetchJSON('data/filters.json');
+        if (data.version !== 1 || data.count !== count) return null;
+        if (data.generated !== generated) {
+            log.init('Filter bitmaps are from another run, filtering by scan');
+            return null;
+        }
+
+        const words = Math.ceil(count / 32);
+        const decodeAll = bitmaps => Object.fromEntries(
+            Object.entries(bitmaps).map(([value, text]) => [value, decodeBitmap(text, words)])
+        );
+        log.init('Filter bitmaps loaded');
+        return {
+            words,
+            roles: decodeAll(data.roles),
+            groups: decodeAll(data.groups),
+            years: decodeAll(data.years),
+            decades: decodeAll(data.decades),
+            undated: decodeBitmap(data.undated, words)
+        };
+    } catch (error) {
+        return null;
+    }
+}
+
+// OR a bitmap into target
+function orBitmap(target, bitmap) {
+    if (!bitmap) return;
+    for (let i = 0; i < target.length; i++) target[i] |= bitmap[i];
+}
+
+// Filter with bitmaps: same result as the scan in applyFilters
+function filterWithIndex(roleFilters, occupationFilters) {
+    const { words } = filterIndex;
+    const result = new Uint32Array(words);
+    roleFilters.forEach(role => orBitmap(result, filterIndex.roles[role]));
+
+    const groups = new Uint32Array(words);
+    occupationFilters.forEach(group => orBitmap(groups, filterIndex.groups[group]));
+    for (let i = 0; i < words; i++) result[i] &= groups[i];
+
+    if (temporalFilter) {
+        // Whole decades, then single years at the edges; persons without letter years always pass
+        const years = new Uint32Array(words);
+        orBitmap(years, filterIndex.undated);
+        let year = temporalFilter.start;
+        while (year <= temporalFilter.end) {
+            if (year % 10 === 0 && year + 9 <= temporalFilter.end) {
+                orBitmap(years, filterIndex.decades[year]);
+                year += 10;
+            } else {
+                orBitmap(years, filterIndex.years[year]);
+                year += 1;
+            }
+        }
+        for (let i = 0; i < words; i++) result[i] &= years[i];
+    }
+
+    const persons = [];
+    for (let i = 0; i < words; i++) {
+        for (let word = result[i]; word !== 0; word &= word - 1) {
+            persons.push(allPersons[i * 32 + 31 - Math.clz32(word & -word)]);
+        }
+    }
+    return persons;
+}
+
 // Apply filters to data and update map
 function applyFilters() {
     const roleFilters = getCheckedValues('role');
     const occupationFilters = getCheckedValues('occupation');
 
     // Filter persons
-    filteredPersons = allPersons.filter(person => {
+    filteredPersons = filterIndex ? filterWithIndex(roleFilters, occupationFilters) : allPersons.filter(person => {
         // Role filter: check if person's role matches any selected role
         const roleMatch = roleFilters.some(r => {
             if (person.roles && person.roles.includes(r)) return true;
@@ -725,6 +1047,11 @@ function applyFilters() {
         return roleMatch && occupationMatch && temporalMatch;
     });
 
+    if (textMatches) {
+        filteredPersons = filteredPersons.filter(person => textMatches.has(person.id));
+    }
+    filteredIds = new Set(filteredPersons.map(person => person.id));
+
     log.render(`Filters applied: ${filteredPersons.length} / ${allPersons.length} persons`);
 
     // Update map
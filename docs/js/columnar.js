@@ -0,0 +1,109 @@
+/**
+ * Columnar persons data for HerData
+ * Decodes data/persons.columnar.json (written by build_herdata.py --columnar;
+ * see preprocessing/columnar_output.py) back to the persons.json structure
+ */
+
+const COLUMNAR_FORMAT = 'herdata-columnar';
+const COLUMNAR_VERSION = 1;
+const ABSENT = -1;
+
+function decodeBase64(text) {
+    return Uint8Array.from(atob(text), c => c.charCodeAt(0));
+}
+
+// Packed little-endian float64 values (NaN = missing)
+function decodeFloats(text) {
+    const bytes = decodeBase64(text);
+    const view = new DataView(bytes.buffer);
+    const values = new Float64Array(bytes.length / 8);
+    for (let i = 0; i < values.length; i++) values[i] = view.getFloat64(8 * i, true);
+    return values;
+}
+
+// Start offset of each row's values (length N + 1) from a per-row length column
+function offsets(lengths) {
+    const result = new Uint32Array(lengths.length + 1);
+    for (let row = 0; row < lengths.length; row++) result[row + 1] = result[row] + lengths[row];
+    return result;
+}
+
+// {meta, persons} of a columnar structure, same as persons.json
+export function decodeColumnar(data) {
+    const schema = data.schema || {};
+    if (schema.format !== COLUMNAR_FORMAT || schema.version !== COLUMNAR_VERSION) {
+        throw new Error(`Unsupported columnar data: ${schema.format} version ${schema.version}`);
+    }
+
+    const strings = data.strings;
+    const columns = data.columns;
+    const value = (table, code) => (code === ABSENT ? null : strings[table][code]);
+    const coords = decodeFloats(columns.place_coords);
+    const coord = i => (Number.isNaN(coords[i]) ? null : coords[i]);
+
+    let ids = columns.id;
+    if (schema.columns.id.encoding === 'delta') {
+        let previous = 0;
+        ids = ids.map(delta => String(previous += delta));
+    }
+
+    const letterYears = offsets(columns.letter_years_lengths);
+    const places = offsets(columns.places_lengths);
+    const occupations = offsets(columns.occupations_lengths);
+    const { template, exceptions } = columns.sndb_url;
+
+    const persons = new Array(schema.count);
+    for (let row = 0; row < schema.count; row++) {
+        const person = {
+            id: ids[row],
+            name: columns.name[row],
+            role: value('role', columns.role[row]),
+            normierung: value('normierung', columns.normierung[row]),
+            sndb_url: exceptions[row] ?? template.replace('{id}', ids[row])
+        };
+        if (columns.gnd[row] !== null) person.gnd = columns.gnd[row];
+        if (columns.roles[row] !== ABSENT) person.roles = [...value('roles', columns.roles[row])];
+        if (columns.letter_count[row]) person.letter_count = columns.letter_count[row];
+
+        if (letterYears[row + 1] > letterYears[row]) {
+            let year = 0;
+            person.letter_years = [];
+            for (let i = letterYears[row]; i < letterYears[row + 1]; i++) {
+                person.letter_years.push(year += columns.letter_years[i]);
+            }
+        }
+        if (columns.mention_count[row]) person.mention_count = columns.mention_count[row];
+
+        const dates = {};
+        for (const field of ['birth', 'death']) {
+            if (columns[field][row] !== ABSENT) dates[field] = value('year', columns[field][row]);
+        }
+        if (Object.keys(dates).length) person.dates = dates;
+
+        if (places[row + 1] > places[row]) {
+            person.places = [];
+            for (let i = places[row]; i < places[row + 1]; i++) {
+                person.places.push({
+                    name: value('place_name', columns.place_name[i]),
+                    lat: coord(2 * i),
+                    lon: coord(2 * i + 1),
+                    type: value('place_type', columns.place_type[i])
+                });
+            }
+        }
+
+        if (occupations[row + 1] > occupations[row]) {
+            person.occupations = [];
+            for (let i = occupations[row]; i < occupations[row + 1]; i++) {
+                person.occupations.push({
+                    name: value('occupation', columns.occupation[i]),
+                    type: value('occupation_type', columns.occupation_type[i])
+                });
+            }
+        }
+
+        persons[row] = Object.assign(person, columns.extra[row]);
+    }
+
+    return { meta: data.meta, persons };
+}
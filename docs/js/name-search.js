@@ -0,0 +1,179 @@
+/**
+ * Name search for HerData
+ * Queries the prefix/trigram name index (data/name_search.json, written by
+ * build_herdata.py --name-search; see preprocessing/name_search.py)
+ */
+
+import { fold } from './text-search.js';
+
+const NAME_SEARCH_VERSION = 1;
+const SIMILARITY_THRESHOLD = 0.3;
+const DEFAULT_LIMIT = 10;
+
+// Folded words of a name joined by single spaces
+export function normalize(name) {
+    return (fold(name || '').match(/[a-z0-9]+/g) || []).join(' ');
+}
+
+// Distinct trigrams of a normalized text (padded: with word boundary at both ends)
+export function trigrams(text, padded = true) {
+    if (padded) text = ` ${text} `;
+    const result = new Set();
+    for (let i = 0; i + 3 <= text.length; i++) result.add(text.slice(i, i + 3));
+    return result;
+}
+
+// All unsigned LEB128 varints of a byte array
+function decodeVarints(bytes, start = 0, end = bytes.length) {
+    const values = [];
+    let value = 0;
+    let shift = 0;
+    for (let i = start; i < end; i++) {
+        value += (bytes[i] & 0x7f) * 2 ** shift;
+        if (bytes[i] & 0x80) {
+            shift += 7;
+        } else {
+            values.push(value);
+            value = 0;
+            shift = 0;
+        }
+    }
+    return values;
+}
+
+function decodeBase64(text) {
+    return Uint8Array.from(atob(text), c => c.charCodeAt(0));
+}
+
+export class NameSearch {
+    constructor(data) {
+        if (data.version !== NAME_SEARCH_VERSION) {
+            throw new Error(`Unsupported name search version: ${data.version}`);
+        }
+        this.ids = data.ids;
+        this.names = data.names;
+        this.owners = Uint32Array.from(data.owners);
+        this.sizes = Uint16Array.from(this.names, name => trigrams(name).size);
+
+        const prefix = decodeVarints(decodeBase64(data.prefix));
+        this.prefixNames = new Uint32Array(prefix.length / 2);
+        this.prefixStarts = new Uint16Array(prefix.length / 2);
+        for (let i = 0; i < this.prefixNames.length; i++) {
+            this.prefixNames[i] = prefix[2 * i];
+            this.prefixStarts[i] = prefix[2 * i + 1];
+        }
+
+        // Trigram postings stay encoded until first use
+        this.postingBytes = decodeBase64(data.postings);
+        this.postingRanges = new Map();
+        let start = 0;
+        data.trigrams.forEach((trigram, t) => {
+            this.postingRanges.set(trigram, [start, start + data.lengths[t]]);
+            start += data.lengths[t];
+        });
+        this.postings = new Map();
+    }
+
+    // Name numbers (ascending) containing a trigram
+    posting(trigram) {
+        if (!this.postings.has(trigram)) {
+            const range = this.postingRanges.get(trigram);
+            const numbers = range ? decodeVarints(this.postingBytes, range[0], range[1]) : [];
+            for (let i = 1; i < numbers.length; i++) numbers[i] += numbers[i - 1];
+            this.postings.set(trigram, numbers);
+        }
+        return this.postings.get(trigram);
+    }
+
+    suffix(position) {
+        return this.names[this.prefixNames[position]].slice(this.prefixStarts[position]);
+    }
+
+    // First position whose suffix is >= value
+    lowerBound(value, low = 0) {
+        let high = this.prefixNames.length;
+        while (low < high) {
+            const middle = (low + high) >> 1;
+            if (this.suffix(middle) < value) low = middle + 1;
+            else high = middle;
+        }
+        return low;
+    }
+
+    // Distinct person IDs of name numbers, in the given order
+    persons(numbers, limit = null) {
+        const result = [];
+        const seen = new Set();
+        for (const number of numbers) {
+            const person = this.owners[number];
+            if (seen.has(person)) continue;
+            seen.add(person);
+            result.push(this.ids[person]);
+            if (limit && result.length === limit) break;
+        }
+        return result;
+    }
+
+    // Person IDs with a name form containing a word that starts with prefix (may span words)
+    complete(prefix, limit = DEFAULT_LIMIT) {
+        prefix = normalize(prefix);
+        if (!prefix) return [];
+        const start = this.lowerBound(prefix);
+        const end = this.lowerBound(prefix + '\uffff', start);
+        const numbers = [];
+        for (let position = start; position < end; position++) numbers.push(this.prefixNames[position]);
+        return this.persons(numbers, limit);
+    }
+
+    // Person IDs with a name form containing text (in name order)
+    substring(text, limit = null) {
+        text = normalize(text);
+        if (!text) return [];
+        let candidates;
+        if (text.length < 3) {
+            // Shorter than a trigram: every name containing it has a trigram containing it
+            candidates = new Set();
+            for (const trigram of this.postingRanges.keys()) {
+                if (trigram.includes(text)) this.posting(trigram).forEach(number => candidates.add(number));
+            }
+            candidates = [...candidates].sort((a, b) => a - b);
+        } else {
+            const lists = [...trigrams(text, false)].map(trigram => this.posting(trigram)).sort((a, b) => a.length - b.length);
+            const others = lists.slice(1).map(list => new Set(list));
+            candidates = lists[0].filter(number => others.every(set => set.has(number)));
+        }
+        return this.persons(candidates.filter(number => this.names[number].includes(text)), limit);
+    }
+
+    // [[similarity, person ID]] of the best name form per person, best first
+    similar(text, limit = DEFAULT_LIMIT, threshold = SIMILARITY_THRESHOLD) {
+        text = normalize(text);
+        if (!text) return [];
+        const query = trigrams(text);
+        const shared = new Map();
+        for (const trigram of query) {
+            for (const number of this.posting(trigram)) shared.set(number, (shared.get(number) || 0) + 1);
+        }
+        const minimum = threshold * query.size;
+        const best = new Map();
+        for (const [number, count] of shared) {
+            if (count < minimum) continue;
+            const score = count / (query.size + this.sizes[number] - count);
+            const person = this.owners[number];
+            if (score >= threshold && score > (best.get(person) || 0)) best.set(person, score);
+        }
+        return [...best].sort((a, b) => b[1] - a[1] || a[0] - b[0]).slice(0, limit)
+            .map(([person, score]) => [Math.round(score * 10000) / 10000, this.ids[person]]);
+    }
+
+    // Person IDs for a search box: word-prefix hits first, then similar names
+    search(text, limit = DEFAULT_LIMIT) {
+        const result = this.complete(text, limit);
+        if (result.length < limit) {
+            for (const [, id] of this.similar(text, limit + result.length)) {
+                if (!result.includes(id)) result.push(id);
+            }
+        }
+        return result.slice(0, limit);
+    }
+}
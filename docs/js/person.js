@@ -2,7 +2,6 @@
 // Displays detailed information about a single person
 
 let currentPerson = null;
-let allPersons = [];
 let miniMap = null;
 
 // Initialize page
@@ -17,11 +16,8 @@ async function init() {
             return;
         }
 
-        // Load data
-        await loadData();
-
-        // Find person
-        currentPerson = allPersons.find(p => p.id === personId);
+        // Load person
+        currentPerson = await loadPerson(personId);
 
         if (!currentPerson) {
             showNotFound();
@@ -39,18 +35,39 @@ async function init() {
     }
 }
 
-// Load persons.json data
-async function loadData() {
-    const response = await fetch('data/persons.json');
+// Fetch and parse a JSON file (null if missing)
+async function fetchJSON(url) {
+    const response = await fetch(url);
+    if (response.status === 404) return null;
     if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    return response.json();
+}
 
-    const data = await response.json();
+// Detail shard number of a person ID: 32-bit FNV-1a over the UTF-8 ID
+// (same as output_shards.shard_bucket in the preprocessing pipeline)
+function shardBucket(personId, buckets) {
+    let hash = 0x811c9dc5;
+    for (const byte of new TextEncoder().encode(personId)) {
+        hash = Math.imul(hash ^ byte, 0x01000193) >>> 0;
+    }
+    return hash % buckets;
+}
 
-    if (!data.meta || !Array.isArray(data.persons)) {
-        throw new Error('Ungültige Datenstruktur');
+// Load one person: from its detail shard if the sharded output exists, else from persons.json
+async function loadPerson(personId) {
+    const meta = await fetchJSON('data/shards/meta.json');
+    if (meta && meta.shards) {
+        const buckets = meta.shards.buckets;
+        const bucket = String(shardBucket(personId, buckets)).padStart(String(buckets - 1).length, '0');
+        const shard = await fetchJSON(`data/shards/persons/${bucket}.json`);
+        return (shard && shard.persons[personId]) || null;
     }
 
-    allPersons = data.persons;
+    const data = await fetchJSON('data/persons.json');
+    if (!data || !data.meta || !Array.isArray(data.persons)) {
+        throw new Error('Ungültige Datenstruktur');
+    }
+    return data.persons.find(p => p.id === personId) || null;
 }
 
 // Render person information
@@ -0,0 +1,145 @@
+/**
+ * Full-text search for HerData
+ * Queries the inverted index over register entries (data/text_index.json,
+ * written by build_herdata.py --text-index; see preprocessing/text_index.py)
+ */
+
+const TEXT_INDEX_VERSION = 1;
+
+// Lowercase ASCII form: diacritics removed, ß -> ss (name_index.fold)
+export function fold(text) {
+    return text.toLowerCase().replace(/ß/g, 'ss').normalize('NFKD').replace(/\p{M}/gu, '');
+}
+
+export function tokenize(text) {
+    return fold(text || '').match(/[a-z0-9]+/g) || [];
+}
+
+// All unsigned LEB128 varints in bytes[start:end]
+function decodeVarints(bytes, start, end) {
+    const values = [];
+    let value = 0;
+    let shift = 0;
+    for (let i = start; i < end; i++) {
+        const byte = bytes[i];
+        value += (byte & 0x7f) * 2 ** shift;
+        if (byte & 0x80) {
+            shift += 7;
+        } else {
+            values.push(value);
+            value = 0;
+            shift = 0;
+        }
+    }
+    return values;
+}
+
+// First index in a sorted array with array[index] >= value
+function lowerBound(array, value) {
+    let low = 0;
+    let high = array.length;
+    while (low < high) {
+        const middle = (low + high) >> 1;
+        if (array[middle] < value) low = middle + 1;
+        else high = middle;
+    }
+    return low;
+}
+
+function intersect(a, b) {
+    return new Set([...a].filter(doc => b.has(doc)));
+}
+
+export class TextIndex {
+    constructor(data) {
+        if (data.version !== TEXT_INDEX_VERSION) {
+            throw new Error(`Unsupported text index version: ${data.version}`);
+        }
+        this.docs = data.docs;
+        this.terms = data.terms;
+        this.offsets = new Uint32Array(data.lengths.length + 1);
+        data.lengths.forEach((length, t) => { this.offsets[t + 1] = this.offsets[t] + length; });
+        this.postings = Uint8Array.from(atob(data.postings), c => c.charCodeAt(0));
+    }
+
+    termId(term) {
+        const t = lowerBound(this.terms, term);
+        return this.terms[t] === term ? t : -1;
+    }
+
+    // Map doc -> positions of term number t
+    postingsOf(t) {
+        const values = decodeVarints(this.postings, this.offsets[t], this.offsets[t + 1]);
+        const result = new Map();
+        let doc = 0;
+        let i = 1;
+        for (let n = 0; n < values[0]; n++) {
+            doc += values[i];
+            const count = values[i + 1];
+            const positions = [];
+            let position = 0;
+            for (let j = i + 2; j < i + 2 + count; j++) {
+                position += values[j];
+                positions.push(position);
+            }
+            result.set(doc, positions);
+            i += 2 + count;
+        }
+        return result;
+    }
+
+    termDocs(word) {
+        const t = this.termId(fold(word));
+        return t < 0 ? new Set() : new Set(this.postingsOf(t).keys());
+    }
+
+    prefixDocs(prefix) {
+        prefix = fold(prefix);
+        const docs = new Set();
+        for (let t = lowerBound(this.terms, prefix); t < this.terms.length && this.terms[t].startsWith(prefix); t++) {
+            for (const doc of this.postingsOf(t).keys()) docs.add(doc);
+        }
+        return docs;
+    }
+
+    phraseDocs(text) {
+        const tokens = tokenize(text);
+        if (tokens.length === 0) return new Set();
+        const lists = [];
+        for (const token of tokens) {
+            const t = this.termId(token);
+            if (t < 0) return new Set();
+            lists.push(this.postingsOf(t));
+        }
+
+        const matches = new Set();
+        for (const [doc, positions] of lists[0]) {
+            let starts = positions;
+            for (let offset = 1; offset < lists.length && starts.length; offset++) {
+                const next = new Set(lists[offset].get(doc) || []);
+                starts = starts.filter(start => next.has(start + offset));
+            }
+            if (starts.length) matches.add(doc);
+        }
+        return matches;
+    }
+
+    // Person IDs matching all parts: word, word* (prefix) or "several words" (phrase)
+    search(query) {
+        let docs = null;
+        for (const [, phrase, word] of query.matchAll(/"([^"]*)"|(\S+)/g)) {
+            let part;
+            if (phrase !== undefined) {
+                part = this.phraseDocs(phrase);
+            } else if (word.endsWith('*')) {
+                part = this.prefixDocs(word.replace(/\*+$/, ''));
+            } else {
+                const tokens = tokenize(word);  // 'Sachsen-Weimar' -> phrase 'sachsen weimar'
+                part = tokens.length === 1 ? this.termDocs(tokens[0]) : this.phraseDocs(word);
+            }
+            docs = docs === null ? part : intersect(docs, part);
+            if (docs.size === 0) break;
+        }
+        return [...(docs || [])].sort((a, b) => a - b).map(doc => this.docs[doc]);
+    }
+}
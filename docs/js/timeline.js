@@ -27,8 +27,13 @@ export class Timeline {
         Debug.log('INIT', 'Loading timeline data...');
 
         try {
-            const response = await fetch('data/persons.json');
-            const json = await response.json();
+            // Small meta shard if the sharded output exists, else the full file
+            let response = await fetch('data/shards/meta.json');
+            const sharded = response.ok;
+            if (!sharded) {
+                response = await fetch('data/persons.json');
+            }
+            const json = sharded ? { meta: await response.json() } : await response.json();
 
             // Get timeline data from metadata
             if (json.meta && json.meta.timeline) {
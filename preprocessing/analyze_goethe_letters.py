@@ -3,23 +3,50 @@ Deep Analysis of CMIF Letters to Goethe Dataset
 Generates a comprehensive report on the correspondence metadata.
 """
 
-import xml.etree.ElementTree as ET
+import argparse
 from collections import Counter, defaultdict
 from datetime import datetime
 import re
 from pathlib import Path
 
-# Namespace for TEI
-NS = {'tei': 'http://www.tei-c.org/ns/1.0'}
+from chunked_reader import chunk_count, element_ranges, map_ranges, read_chunk
+from cmif_reader import available_backends, benchmark_backends, get_backend
+
+# Analysis results merged across chunks (lists are concatenated, counts added)
+RESULT_FIELDS = (
+    'letter_count', 'senders', 'sender_counts', 'places', 'place_counts', 'dates', 'exact_dates',
+    'date_ranges', 'mentioned_persons', 'mentioned_persons_counts', 'mentioned_bibls', 'mentioned_orgs',
+    'languages', 'has_tei_file', 'has_transcription', 'has_abstract', 'text_base_types',
+    'letters_with_person_mentions', 'letters_with_bibl_mentions', 'letters_with_org_mentions', 'rich_letters'
+)
+
+
+def analyze_cmif_range(xml_file, start, end, namespaces, backend_name):
+    """Worker: analysis results for one correspDesc-aligned byte range"""
+    analyzer = GoetheCMIFAnalyzer(read_chunk(xml_file, start, end, namespaces), backend_name, verbose=False)
+    analyzer.analyze()
+    return analyzer.results()
+
 
 class GoetheCMIFAnalyzer:
-    def __init__(self, xml_file):
-        print(f"Loading XML file: {xml_file}")
-        self.tree = ET.parse(xml_file)
-        self.root = self.tree.getroot()
-        self.correspondences = self.root.findall('.//tei:correspDesc', NS)
+    def __init__(self, xml_file, backend=None, workers=1, verbose=True):
+        self.xml_file = xml_file
+        self.backend = get_backend(backend)
+        self.verbose = verbose
+
+        # Large files are parsed in byte-range chunks by worker processes (see analyze)
+        self.chunks = chunk_count(xml_file, workers)
+        if self.chunks > 1:
+            self.log(f"Loading XML file: {xml_file} ({self.backend.name} backend, {self.chunks} chunks)")
+            self.root = None
+            self.correspondences = []
+        else:
+            self.log(f"Loading XML file: {xml_file} ({self.backend.name} backend)")
+            self.root = self.backend.parse(xml_file)
+            self.correspondences = self.backend.findall(self.root, 'correspDesc')
 
         # Data containers
+        self.letter_count = 0
         self.senders = []
         self.sender_counts = Counter()
         self.places = []
@@ -36,8 +63,17 @@ class GoetheCMIFAnalyzer:
         self.has_transcription = 0
         self.has_abstract = 0
         self.text_base_types = Counter()
+        self.letters_with_person_mentions = 0
+        self.letters_with_bibl_mentions = 0
+        self.letters_with_org_mentions = 0
+        self.rich_letters = 0
+
+        if self.chunks <= 1:
+            self.log(f"Found {len(self.correspondences)} correspondence entries")
 
-        print(f"Found {len(self.correspondences)} correspondence entries")
+    def log(self, message):
+        if self.verbose:
+            print(message)
 
     def extract_gnd_id(self, url):
         """Extract GND ID from URL"""
@@ -59,17 +95,30 @@ class GoetheCMIFAnalyzer:
 
     def analyze(self):
         """Perform deep analysis of all correspondence entries"""
-        print("\nAnalyzing correspondence entries...")
+        if self.chunks > 1:
+            self.analyze_chunks()
+            return
+
+        self.log("\nAnalyzing correspondence entries...")
 
         for idx, corresp in enumerate(self.correspondences):
             if (idx + 1) % 1000 == 0:
-                print(f"  Processed {idx + 1} entries...")
+                self.log(f"  Processed {idx + 1} entries...")
+
+            # Letter-level mention flags
+            self.letter_count += 1
+            if self.backend.find(corresp, 'mentionsPerson') is not None:
+                self.letters_with_person_mentions += 1
+            if self.backend.find(corresp, 'mentionsBibl') is not None:
+                self.letters_with_bibl_mentions += 1
+            if self.backend.find(corresp, 'mentionsOrg') is not None:
+                self.letters_with_org_mentions += 1
 
             # Analyze sent action
-            sent_action = corresp.find('.//tei:correspAction[@type="sent"]', NS)
-            if sent_action:
+            sent_action = self.backend.find(corresp, 'sent')
+            if sent_action is not None and len(sent_action):  # ElementTree truthiness: has children
                 # Sender
-                sender = sent_action.find('.//tei:persName', NS)
+                sender = self.backend.find(sent_action, 'persName')
                 if sender is not None:
                     sender_name = sender.text
                     sender_ref = sender.get('ref', '')
@@ -81,7 +130,7 @@ class GoetheCMIFAnalyzer:
                     self.sender_counts[sender_name] += 1
 
                 # Place
-                place = sent_action.find('.//tei:placeName', NS)
+                place = self.backend.find(sent_action, 'placeName')
                 if place is not None:
                     place_name = place.text
                     place_ref = place.get('ref', '')
@@ -93,7 +142,7 @@ class GoetheCMIFAnalyzer:
                     self.place_counts[place_name] += 1
 
                 # Date
-                date = sent_action.find('.//tei:date', NS)
+                date = self.backend.find(sent_action, 'date')
                 if date is not None:
                     when = date.get('when')
                     not_before = date.get('notBefore')
@@ -113,10 +162,10 @@ class GoetheCMIFAnalyzer:
                             self.dates.append(year)
 
             # Analyze notes
-            note = corresp.find('.//tei:note', NS)
+            note = self.backend.find(corresp, 'note')
             if note is not None:
                 # Mentioned persons
-                for ref in note.findall('.//tei:ref[@type="cmif:mentionsPerson"]', NS):
+                for ref in self.backend.findall(note, 'mentionsPerson'):
                     person_name = ref.text
                     person_ref = ref.get('target', '')
                     self.mentioned_persons.append({
@@ -128,27 +177,27 @@ class GoetheCMIFAnalyzer:
                         self.mentioned_persons_counts[person_name] += 1
 
                 # Mentioned bibliographic items
-                for ref in note.findall('.//tei:ref[@type="cmif:mentionsBibl"]', NS):
+                for ref in self.backend.findall(note, 'mentionsBibl'):
                     if ref.text:
                         self.mentioned_bibls.append(ref.text)
 
                 # Mentioned organizations
-                for ref in note.findall('.//tei:ref[@type="cmif:mentionsOrg"]', NS):
+                for ref in self.backend.findall(note, 'mentionsOrg'):
                     if ref.text:
                         self.mentioned_orgs.append(ref.text)
 
                 # Languages
-                for ref in note.findall('.//tei:ref[@type="cmif:hasLanguage"]', NS):
+                for ref in self.backend.findall(note, 'hasLanguage'):
                     lang = ref.get('target', '')
                     if lang:
                         self.languages.append(lang)
 
                 # TEI file availability
-                if note.find('.//tei:ref[@type="cmif:isAvailableAsTEIfile"]', NS) is not None:
+                if self.backend.find(note, 'isAvailableAsTEIfile') is not None:
                     self.has_tei_file += 1
 
                 # Publication types
-                for ref in note.findall('.//tei:ref[@type="cmif:isPublishedWith"]', NS):
+                for ref in self.backend.findall(note, 'isPublishedWith'):
                     pub_type = ref.get('target', '')
                     if 'Transcription' in pub_type:
                         self.has_transcription += 1
@@ -156,16 +205,47 @@ class GoetheCMIFAnalyzer:
                         self.has_abstract += 1
 
                 # Text base types
-                for ref in note.findall('.//tei:ref[@type="cmif:hasTextBase"]', NS):
+                for ref in self.backend.findall(note, 'hasTextBase'):
                     text_base = ref.get('target', '')
                     if text_base:
                         self.text_base_types[text_base] += 1
 
-        print(f"  Completed analysis of {len(self.correspondences)} entries\n")
+                # Richness: letters with 2+ mention types
+                has_person = self.backend.find(note, 'mentionsPerson') is not None
+                has_bibl = self.backend.find(note, 'mentionsBibl') is not None
+                has_org = self.backend.find(note, 'mentionsOrg') is not None
+                if sum([has_person, has_bibl, has_org]) >= 2:
+                    self.rich_letters += 1
+
+        self.log(f"  Completed analysis of {len(self.correspondences)} entries\n")
+
+    def analyze_chunks(self):
+        """Analyze byte-range chunks in worker processes and merge them in file order"""
+        ranges, namespaces = element_ranges(self.xml_file, 'correspDesc', self.chunks)
+        self.log(f"\nAnalyzing correspondence entries in {len(ranges)} chunks...")
+        for results in map_ranges(analyze_cmif_range, self.xml_file, ranges, namespaces, self.backend.name,
+                                  workers=self.chunks):
+            self.merge(results)
+        self.log(f"Found {self.letter_count} correspondence entries")
+        self.log(f"  Completed analysis of {self.letter_count} entries\n")
+
+    def results(self):
+        """Analysis results as a picklable dict (see RESULT_FIELDS)"""
+        return {field: getattr(self, field) for field in RESULT_FIELDS}
+
+    def merge(self, results):
+        """Add the results of a later chunk: lists are extended, counters and counts added"""
+        for field, value in results.items():
+            if isinstance(value, list):
+                getattr(self, field).extend(value)
+            elif isinstance(value, Counter):
+                getattr(self, field).update(value)
+            else:
+                setattr(self, field, getattr(self, field) + value)
 
     def generate_report(self, output_file):
         """Generate comprehensive analysis report"""
-        total = len(self.correspondences)
+        total = self.letter_count
 
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write("# DEEP ANALYSIS REPORT: Letters to Goethe (1762-1824)\n\n")
@@ -247,8 +327,7 @@ class GoetheCMIFAnalyzer:
             f.write("## 5. MENTIONED PERSONS ANALYSIS\n\n")
             f.write(f"- Total person mentions: {len(self.mentioned_persons):,}\n")
             f.write(f"- Unique persons mentioned: {len(self.mentioned_persons_counts):,}\n")
-            letters_with_person_mentions = sum(1 for c in self.correspondences if c.find('.//tei:ref[@type="cmif:mentionsPerson"]', NS) is not None)
-            f.write(f"- Letters with person mentions: {letters_with_person_mentions:,}\n\n")
+            f.write(f"- Letters with person mentions: {self.letters_with_person_mentions:,}\n\n")
 
             f.write(f"### Top 20 Most Mentioned Persons\n\n")
             f.write("| Rank | Person | Mentions |\n")
@@ -261,8 +340,7 @@ class GoetheCMIFAnalyzer:
             f.write("## 6. BIBLIOGRAPHIC MENTIONS\n\n")
             f.write(f"- Total bibliographic mentions: {len(self.mentioned_bibls):,}\n")
             f.write(f"- Unique works mentioned: {len(set(self.mentioned_bibls)):,}\n")
-            letters_with_bibl_mentions = sum(1 for c in self.correspondences if c.find('.//tei:ref[@type="cmif:mentionsBibl"]', NS) is not None)
-            f.write(f"- Letters with bibliographic mentions: {letters_with_bibl_mentions:,}\n\n")
+            f.write(f"- Letters with bibliographic mentions: {self.letters_with_bibl_mentions:,}\n\n")
 
             if self.mentioned_bibls:
                 bibl_counts = Counter(self.mentioned_bibls)
@@ -277,8 +355,7 @@ class GoetheCMIFAnalyzer:
             f.write("## 7. ORGANIZATION MENTIONS\n\n")
             f.write(f"- Total organization mentions: {len(self.mentioned_orgs):,}\n")
             f.write(f"- Unique organizations: {len(set(self.mentioned_orgs)):,}\n")
-            letters_with_org_mentions = sum(1 for c in self.correspondences if c.find('.//tei:ref[@type="cmif:mentionsOrg"]', NS) is not None)
-            f.write(f"- Letters with org mentions: {letters_with_org_mentions:,}\n\n")
+            f.write(f"- Letters with org mentions: {self.letters_with_org_mentions:,}\n\n")
 
             if self.mentioned_orgs:
                 org_counts = Counter(self.mentioned_orgs)
@@ -313,24 +390,14 @@ class GoetheCMIFAnalyzer:
             f.write("## 10. CORRESPONDENCE NETWORK INSIGHTS\n\n")
 
             # Calculate mentions per letter
-            letters_with_mentions = sum(1 for c in self.correspondences
-                                       if c.find('.//tei:ref[@type="cmif:mentionsPerson"]', NS) is not None)
+            letters_with_mentions = self.letters_with_person_mentions
             avg_mentions = len(self.mentioned_persons) / letters_with_mentions if letters_with_mentions > 0 else 0
 
             f.write(f"- Average persons mentioned per letter (when mentioned): {avg_mentions:.1f}\n")
             f.write(f"- Letters with no person mentions: {total - letters_with_mentions:,} ({(total - letters_with_mentions)/total*100:.1f}%)\n")
 
-            # Calculate richness - letters with multiple metadata types
-            rich_letters = 0
-            for c in self.correspondences:
-                note = c.find('.//tei:note', NS)
-                if note is not None:
-                    has_person = note.find('.//tei:ref[@type="cmif:mentionsPerson"]', NS) is not None
-                    has_bibl = note.find('.//tei:ref[@type="cmif:mentionsBibl"]', NS) is not None
-                    has_org = note.find('.//tei:ref[@type="cmif:mentionsOrg"]', NS) is not None
-                    if sum([has_person, has_bibl, has_org]) >= 2:
-                        rich_letters += 1
-
+            # Richness - letters with multiple metadata types (counted in analyze)
+            rich_letters = self.rich_letters
             f.write(f"- 'Rich' letters (with 2+ mention types): {rich_letters:,} ({rich_letters/total*100:.1f}%)\n\n")
 
             # KEY FINDINGS
@@ -377,6 +444,15 @@ class GoetheCMIFAnalyzer:
             f.write("For detailed querying methods, see the accompanying documentation file.*\n")
 
 def main():
+    parser = argparse.ArgumentParser(description='Analyze the CMIF letters to Goethe')
+    parser.add_argument('--backend', choices=['etree', 'lxml'],
+                        help='XML backend (default: lxml if installed, else etree)')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Compare throughput of the available backends and exit')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Parse large files in byte-range chunks with N worker processes (default: 1)')
+    args = parser.parse_args()
+
     xml_file = Path(__file__).parent.parent / 'data' / 'ra-cmif.xml'
     output_file = Path(__file__).parent.parent / 'data' / 'analysis-report.md'
 
@@ -384,7 +460,14 @@ def main():
     print("GOETHE LETTERS CMIF DATASET ANALYZER")
     print("=" * 60)
 
-    analyzer = GoetheCMIFAnalyzer(xml_file)
+    if args.benchmark:
+        print(f"Backends: {', '.join(available_backends())}")
+        for name, result in benchmark_backends(xml_file).items():
+            print(f"  {name:6s} stream: {result['stream_s']:.2f}s ({result['letters_per_s']:,} letters/s), "
+                  f"parse + lookups: {result['parse_s']:.2f}s")
+        return
+
+    analyzer = GoetheCMIFAnalyzer(xml_file, args.backend, args.workers)
     analyzer.analyze()
 
     print("Generating comprehensive report...")
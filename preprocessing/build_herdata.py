@@ -8,32 +8,262 @@ Testing strategy:
 - Summary statistics printed for manual verification
 """
 
-import xml.etree.ElementTree as ET
 from pathlib import Path
 from collections import defaultdict, Counter
-import json
+import argparse
+import time
 from datetime import datetime
 
-# TEI namespace for CMIF
-NS = {'tei': 'http://www.tei-c.org/ns/1.0'}
+from sndb_reader import load_tables
+from chunked_reader import chunk_count
+from sndb_table import SNDBTable
+from cmif_reader import get_backend, iter_cmif_letters
+from name_index import NameIndex, lookup_keys
+from name_search import NameSearch, write_name_search
+from year_histogram import YearHistograms
+from output_shards import write_shards
+from columnar_output import write_columnar
+from json_writer import write_persons_json, default_encoder
+from filter_index import write_filter_index
+from point_clusters import write_clusters
+from spatial_index import SpatialIndex, write_locations
+from place_authority import PlaceAuthorities, read_place_links
+from relationship_graph import RelationshipGraph, read_relations, read_vocabulary, write_relationships
+from network_metrics import NetworkMetrics, BENCHMARK_BUDGET_S, BENCHMARK_FACTOR, benchmark, default_backend
+from text_index import TextIndex, write_text_index
+from table_cache import TableCache, fingerprint, source_hash
+from run_profile import RunProfile, write_profile
+from stage_graph import StageGraph, StageCache
+import sndb_table
+import sndb_reader
+import relationship_graph
+import network_metrics
+from run_state import load_state, save_state, table_digests, changed_keys
+
+
+# ============================================================
+# SNDB Table Loaders
+# ============================================================
+# Module-level so they can run in worker processes (see load_tables).
+# Each loader parses one export into a columnar SNDBTable keyed by ID,
+# keeping only the columns the pipeline uses. workers > 1 scans large
+# exports in parallel byte ranges (see sndb_reader.scan_sndb_chunks).
+
+def load_person_names(xml_file, workers=1):
+    """pers_koerp_main: name rows (LFDNR=0 main entry, LFDNR>0 variant forms)"""
+    return SNDBTable.load(xml_file, fields=('ID', 'LFDNR', 'NACHNAME', 'VORNAMEN', 'TITEL'), workers=workers)
+
+
+def load_person_indiv(xml_file, workers=1):
+    """pers_koerp_indiv: SEXUS and GND per person"""
+    return SNDBTable.load(xml_file, fields=('ID', 'SEXUS', 'GND'), workers=workers)
+
+
+def load_life_dates(xml_file, workers=1):
+    """pers_koerp_datierungen: dated events (ART=Geburtsdatum/Sterbedatum, JAHR)"""
+    return SNDBTable.load(xml_file, fields=('ID', 'ART', 'JAHR'), workers=workers)
+
+
+def load_person_places(xml_file, workers=1):
+    """pers_koerp_orte: person → place links (SNDB_ID) with link type (ART)"""
+    return SNDBTable.load(xml_file, fields=('ID', 'ART', 'SNDB_ID'), workers=workers)
+
+
+def load_place_names(xml_file, workers=1):
+    """geo_main: place names (LFDNR=0 main form)"""
+    return SNDBTable.load(xml_file, fields=('ID', 'LFDNR', 'BEZEICHNUNG'), workers=workers)
+
+
+def load_place_coords(xml_file, workers=1):
+    """geo_indiv: place coordinates"""
+    return SNDBTable.load(xml_file, fields=('ID', 'LATITUDE', 'LONGITUDE'), workers=workers)
+
+
+def load_place_links(xml_file, workers=1):
+    """geo_links: place -> external resource links (URL, NORM_ID, QUELLE)"""
+    return SNDBTable.load(xml_file, fields=('ID', 'URL', 'NORM_ID', 'QUELLE'), workers=workers)
+
+
+def load_occupations(xml_file, workers=1):
+    """pers_koerp_berufe: occupations per person"""
+    return SNDBTable.load(xml_file, fields=('ID', 'BERUF'), workers=workers)
+
+
+def load_relationships(xml_file, workers=1):
+    """pers_koerp_beziehungen: person pairs with one AGRELON type per direction"""
+    return SNDBTable.load(xml_file, fields=('ID1', 'ID2', 'AGRELON_ID1', 'AGRELON_ID2'), workers=workers)
+
+
+def load_agrelon(xml_file, workers=1):
+    """nsl_agrelon: AGRELON relation types (BEZIEHUNG, KATEGORIE, inverse type CORRIDENT)"""
+    return SNDBTable.load(xml_file, fields=('IDENT', 'KATEGORIE', 'BEZIEHUNG', 'CORRIDENT'), workers=workers)
+
+
+def load_register_entries(xml_file, workers=1):
+    """pers_koerp_projekt_*: register entry text (REGISTEREINTRAG) of a person in one edition project"""
+    return SNDBTable.load(xml_file, fields=('ID', 'REGISTEREINTRAG'), workers=workers)
+
+
+# Table name -> (loader, SNDB export)
+SNDB_TABLES = {
+    'names': (load_person_names, 'pers_koerp_main.xml'),
+    'indiv': (load_person_indiv, 'pers_koerp_indiv.xml'),
+    'dates': (load_life_dates, 'pers_koerp_datierungen.xml'),
+    'places': (load_person_places, 'pers_koerp_orte.xml'),
+    'place_names': (load_place_names, 'geo_main.xml'),
+    'place_coords': (load_place_coords, 'geo_indiv.xml'),
+    'place_links': (load_place_links, 'geo_links.xml'),
+    'occupations': (load_occupations, 'pers_koerp_berufe.xml'),
+    'relationships': (load_relationships, 'pers_koerp_beziehungen.xml'),
+    'agrelon': (load_agrelon, 'nsl_agrelon.xml'),
+    'register_goebriefe': (load_register_entries, 'pers_koerp_projekt_goebriefe.xml'),
+    'register_tagebuch': (load_register_entries, 'pers_koerp_projekt_tagebuch.xml'),
+    'register_bug': (load_register_entries, 'pers_koerp_projekt_bug.xml')
+}
+PHASE1_TABLES = ('names', 'indiv', 'dates')
+REGISTER_TABLES = ('register_goebriefe', 'register_tagebuch', 'register_bug')
+PHASE3_TABLES = ('places', 'place_names', 'place_coords', 'place_links', 'occupations', 'relationships',
+                 'agrelon') + REGISTER_TABLES
+# Stages of the phase methods; Phase 3 is every other stage except 'output' (Phase 4), incl. plug-ins
+PHASE_STAGES = {1: ('phase1_tables', 'women', 'name_search'), 2: ('letters',)}
+
 
 class HerDataPipeline:
-    """4-phase pipeline to extract and enrich women from SNDB + CMIF"""
+    """4-phase pipeline to extract and enrich women from SNDB + CMIF
+
+    The phases are declared as a DAG of stages (see define_stages); run()
+    executes it, running independent stages concurrently.
+    """
 
-    def __init__(self, data_dir, output_file, verbose=True):
+    def __init__(self, data_dir, output_file, verbose=True, workers=None, use_cache=True, cmif_backend=None,
+                 year_range=None, shard_dir=None, columnar_file=None, compact=False, json_encoder=None,
+                 filter_file=None, cluster_file=None, location_file=None, relationship_file=None,
+                 network_backend=None, text_index_file=None, name_search_file=None, profile_file=None,
+                 cprofile_dir=None, scale=1.0, keep_persons=False):
         self.data_dir = Path(data_dir)
         self.output_file = Path(output_file)
         self.verbose = verbose
+        self.workers = workers  # Parallel table loads and chunked parsing (None = CPU count, 1 = sequential)
+        self.cmif_backend = get_backend(cmif_backend, streaming=True)  # etree unless lxml is asked for
+        self.shard_dir = Path(shard_dir) if shard_dir else None  # Also write sharded output (see output_shards)
+        self.columnar_file = Path(columnar_file) if columnar_file else None  # Also write columnar output
+        self.compact = compact  # persons.json without indentation
+        self.keep_persons = keep_persons  # Return the person entries even if no other output needs them
+        self.filter_file = Path(filter_file) if filter_file else None  # Also write map filter bitmaps
+        self.cluster_file = Path(cluster_file) if cluster_file else None  # Also write the map cluster pyramid
+        self.location_file = Path(location_file) if location_file else None  # Also write location -> person IDs
+        self.relationship_file = Path(relationship_file) if relationship_file else None  # Also write relationships
+        self.text_index_file = Path(text_index_file) if text_index_file else None  # Also write the full-text index
+        self.name_search_file = Path(name_search_file) if name_search_file else None  # Also write the name search index
+        self.profile_file = Path(profile_file) if profile_file else None  # Also write per-stage run metrics
+        self.scale = scale  # Corpus size relative to the real data (synthetic_corpus); scales the expected counts
+        self.json_encoder = json_encoder or default_encoder()  # orjson if installed, else json
+        self.network_backend = network_backend or default_backend()  # numpy if installed, else python
+
+        # Parsed tables are cached per source file fingerprint, cached stage results per source digest
+        self.cache = TableCache(self.data_dir / '.cache', modules=(sndb_table, sndb_reader)) if use_cache else None
+        self.stage_cache = StageCache(self.data_dir / '.cache') if use_cache else None
 
         # Data containers
         self.women = {}  # {sndb_id: {name, gnd, dates, ...}}
-        self.cmif_letters = []
+        self.name_search = None  # Prefix/trigram search over the women's name forms (built in Phase 1)
+        self.place_authorities = None  # SNDB places <-> authority IDs, merged places (built in Phase 3)
+        self.spatial_index = None  # Persons by place coordinates (built in Phase 3)
+        self.relationship_graph = None  # All SNDB relationships (built in Phase 3)
+        self.network_metrics = None  # Network position of every person in the graph
+        self.text_index = None  # Full-text index over the register entries of all women (built in Phase 3)
+        self.year_histograms = YearHistograms(year_range)  # Letters per woman and year (default 1762-1824)
+        self.tables = {}  # Loaded SNDB tables by SNDB_TABLES name
+        self.cmif_letters = []  # Compact letter records (incremental mode only)
+        self.letter_matches = []  # [(woman_id, role)] per letter (incremental mode only)
+        self.track_letters = False
         self.stats = {
             'phase1': {},
             'phase2': {},
             'phase3': {},
             'phase4': {}
         }
+        self.stages = self.define_stages()
+
+        # Profiling (see run_profile): stage metrics, input throughput, optional cProfile dumps per stage
+        self.profile = RunProfile(cprofile_dir) if self.profile_file or cprofile_dir else None
+        if self.profile:
+            self.stages.monitor = self.profile.stage
+
+    def define_stages(self):
+        """Pipeline stages with their input and output artifacts (see stage_graph)
+
+        Table names of SNDB_TABLES are artifacts of the table loading stages;
+        women_* artifacts stand for fields filled in on the women records.
+        """
+        stages = StageGraph(self.stage_cache)
+        graph_sources = [self.data_dir / 'SNDB' / SNDB_TABLES[name][1] for name in ('relationships', 'agrelon')]
+        graph_params = (source_hash(load_relationships, load_agrelon, sndb_table, relationship_graph),)
+
+        # Phase 1: Identify women from SNDB
+        stages.add('phase1_tables', self.load_phase1_tables, outputs=PHASE1_TABLES)
+        stages.add('women', self.identify_women, inputs=PHASE1_TABLES, outputs=('women',))
+        stages.add('name_search', self.build_name_search, inputs=('women', 'names'), outputs=('name_search',))
+
+        # Phase 2: Match CMIF letters
+        stages.add('letters', self.match_letters, inputs=('women', 'names'), outputs=('women_letters',))
+
+        # Phase 3: Enrich (tables load while Phases 1 and 2 run)
+        stages.add('phase3_tables', self.load_phase3_tables, outputs=PHASE3_TABLES)
+        stages.add('place_authorities', self.build_place_authorities, inputs=('place_links', 'place_coords'),
+                   outputs=('place_authorities',))
+        stages.add('places', self.enrich_women, outputs=('women_places',),
+                   inputs=('women', 'places', 'place_names', 'place_coords', 'place_authorities', 'occupations'))
+        stages.add('relationship_graph', self.build_relationship_graph, inputs=('relationships', 'agrelon'),
+                   outputs=('relationship_graph',), sources=graph_sources, params=graph_params, cache=True,
+                   restore=lambda graph: setattr(self, 'relationship_graph', graph))
+        stages.add('relationships', self.enrich_relationships, inputs=('women', 'names', 'relationship_graph'),
+                   outputs=('women_relationships',))
+        stages.add('network_metrics', self.build_network_metrics, inputs=('relationship_graph',),
+                   outputs=('network_metrics',), sources=graph_sources, cache=True,
+                   params=graph_params + (self.network_backend, source_hash(network_metrics)),
+                   restore=self.restore_network_metrics)
+        stages.add('network', self.set_network, inputs=('women', 'network_metrics'), outputs=('women_network',))
+        stages.add('spatial_index', self.build_spatial_index, inputs=('women_places',), outputs=('spatial_index',))
+        stages.add('text_index', self.build_text_index, inputs=('women',) + REGISTER_TABLES, outputs=('text_index',))
+        stages.add('phase3_check', self.test_phase3, outputs=('enriched',),
+                   inputs=('women_places', 'women_relationships', 'women_network', 'spatial_index', 'text_index'))
+
+        # Phase 4: Generate JSON output
+        stages.add('output', self.phase4_generate_json, inputs=('women_letters', 'name_search', 'enriched'),
+                   outputs=('output_data',))
+        return stages
+
+    def add_stage(self, name, func, inputs=(), outputs=(), before=('phase3_check',), **options):
+        """Plug in a stage (by default an enrichment that must finish before Phase 3 validation)"""
+        return self.stages.add(name, func, inputs, outputs, before=before, **options)
+
+    def phase_stages(self, phase):
+        """Stage names of Phase 1, 2 or 3 (see PHASE_STAGES)"""
+        if phase in PHASE_STAGES:
+            return PHASE_STAGES[phase]
+        named = {name for names in PHASE_STAGES.values() for name in names} | {'output'}
+        return tuple(name for name in self.stages.stages if name not in named)
+
+    def run_phase(self, phase, title):
+        """Run the stages of one phase (earlier phases must have run); returns the women"""
+        self.log("\n" + "="*60)
+        self.log(f"PHASE {phase}: {title}")
+        self.log("="*60)
+        self.stages.run(self.phase_stages(phase), workers=1 if self.profile else self.workers)
+        return self.women
+
+    def phase1_identify_women(self):
+        """Extract all women (SEXUS='w') from SNDB with biographical data"""
+        return self.run_phase(1, "Identifying women from SNDB")
+
+    def phase2_match_letters(self):
+        """Match CMIF letters to women via GND-ID or name"""
+        return self.run_phase(2, "Matching CMIF letters")
+
+    def phase3_enrich_data(self):
+        """Add geodata, occupations, relationships from SNDB"""
+        return self.run_phase(3, "Enriching with geodata and biographical info")
 
     def log(self, message):
         """Print log message if verbose mode enabled"""
@@ -47,7 +277,7 @@ class HerDataPipeline:
         with_dates = sum(1 for w in self.women.values() if w.get('dates', {}).get('birth') or w.get('dates', {}).get('death'))
 
         # Expected ranges based on documentation
-        assert 3500 <= total <= 3700, f"Expected ~3,617 women, got {total}"
+        assert 3500 * self.scale <= total <= 3700 * self.scale, f"Expected ~{3617 * self.scale:,.0f} women, got {total}"
         # Women have lower GND coverage than overall SNDB (34% vs 53%)
         assert 0.25 <= with_gnd/total <= 0.50, f"Expected 25-50% GND coverage for women, got {with_gnd/total*100:.1f}%"
 
@@ -86,6 +316,7 @@ class HerDataPipeline:
         """Validate Phase 3 output: geodata enrichment"""
         with_geodata = sum(1 for w in self.women.values() if w.get('places') and len(w['places']) > 0)
         with_occupations = sum(1 for w in self.women.values() if w.get('occupations') and len(w['occupations']) > 0)
+        with_relationships = sum(1 for w in self.women.values() if w.get('relationships'))
 
         # Expected ~30-60% geodata coverage for women (may be lower than overall SNDB)
         if len(self.women) > 0:
@@ -95,141 +326,186 @@ class HerDataPipeline:
         self.stats['phase3'] = {
             'with_geodata': with_geodata,
             'geodata_coverage': f"{with_geodata/len(self.women)*100:.1f}%",
-            'with_occupations': with_occupations
+            'with_occupations': with_occupations,
+            'with_relationships': with_relationships,
+            'network_backend': self.network_backend,
+            'with_register_entries': len(self.text_index) if self.text_index else 0
         }
 
         self.log(f"[OK] Phase 3 validation passed: {with_geodata} women with geodata ({with_geodata/len(self.women)*100:.1f}%)")
         return True
 
-    def test_phase4(self, output_data):
-        """Validate Phase 4 output: JSON generation"""
+    def test_phase4(self, output_data, person_count, missing_fields):
+        """Validate Phase 4 output: JSON generation
+
+        person_count and missing_fields ({field: persons without it}) are
+        counted while the persons stream to the file.
+        """
         assert 'meta' in output_data, "Missing 'meta' field in output"
-        assert 'persons' in output_data, "Missing 'persons' field in output"
-        assert len(output_data['persons']) == len(self.women), "Person count mismatch"
+        assert person_count == len(self.women), "Person count mismatch"
 
-        # Check sample person has required fields
-        if output_data['persons']:
-            sample = output_data['persons'][0]
-            required_fields = ['id', 'name', 'role', 'normierung']
-            for field in required_fields:
-                assert field in sample, f"Missing required field: {field}"
+        # Check every person has the required fields
+        for field, count in missing_fields.items():
+            assert count == 0, f"Missing required field: {field} ({count} persons)"
 
         self.stats['phase4'] = {
-            'total_persons': len(output_data['persons']),
+            'total_persons': person_count,
             'output_file_size': 'pending'
         }
 
-        self.log(f"[OK] Phase 4 validation passed: {len(output_data['persons'])} persons in output")
+        self.log(f"[OK] Phase 4 validation passed: {person_count} persons in output")
         return True
 
+    def sndb_tasks(self, names):
+        """load_tables() tasks for the given SNDB_TABLES entries"""
+        sndb_dir = self.data_dir / 'SNDB'
+        return {name: (SNDB_TABLES[name][0], sndb_dir / SNDB_TABLES[name][1]) for name in names}
+
+    def load_tables(self, tasks):
+        """Load SNDB tables from cache, parsing only missing or stale ones"""
+        tables = {}
+        pending = {}
+        for name, (loader, xml_file) in tasks.items():
+            start = time.perf_counter()
+            table = self.cache.get(loader, xml_file) if self.cache else None
+            if table is not None:
+                tables[name] = table
+                self.record_input(xml_file, table, time.perf_counter() - start, self.cache.entry_path(loader, xml_file),
+                                  'cache')
+            else:
+                pending[name] = (loader, xml_file)
+
+        if pending:
+            # Large exports are split across all workers; the rest run one table per worker
+            chunked = {name: task for name, task in pending.items() if chunk_count(task[1], self.workers) > 1}
+            start = time.perf_counter()
+            parsed = load_tables({name: task for name, task in pending.items() if name not in chunked}, self.workers)
+            seconds = time.perf_counter() - start  # Tables parsed side by side share the batch time
+            for name in parsed:
+                self.record_input(pending[name][1], parsed[name], seconds)
+            for name, (loader, xml_file) in chunked.items():
+                self.log(f"  Parsing {Path(xml_file).name} in {chunk_count(xml_file, self.workers)} chunks")
+                start = time.perf_counter()
+                parsed[name] = loader(xml_file, self.workers)
+                self.record_input(xml_file, parsed[name], time.perf_counter() - start)
+            for name, table in parsed.items():
+                if self.cache:
+                    loader, xml_file = pending[name]
+                    self.cache.put(loader, xml_file, table)
+                tables[name] = table
+
+        if self.cache:
+            self.log(f"  Table cache: {len(tasks) - len(pending)} hit(s), {len(pending)} parsed")
+
+        self.tables.update(tables)
+        return tables
+
+    def record_input(self, xml_file, table, seconds, read_file=None, source='parsed'):
+        """Profile throughput of one loaded table (read_file: file actually read, default the export)"""
+        if self.profile:
+            self.profile.record_input(Path(xml_file).name, len(table), seconds,
+                                      Path(read_file or xml_file).stat().st_size, source)
+
     # ============================================================
     # PHASE 1: Identify Women from SNDB
     # ============================================================
 
-    def phase1_identify_women(self):
-        """Extract all women (SEXUS='w') from SNDB with biographical data"""
-        self.log("\n" + "="*60)
-        self.log("PHASE 1: Identifying women from SNDB")
-        self.log("="*60)
+    def iter_women(self):
+        """(person_id, gnd) for every woman (SEXUS='w') in pers_koerp_indiv order"""
+        indiv = self.tables['indiv']
+        for row in range(len(indiv)):
+            if indiv.get(row, 'SEXUS') == 'w':
+                yield indiv.get(row, 'ID'), indiv.get(row, 'GND')
+
+    def person_name(self, person_id):
+        """Display name from the main entry (LFDNR=0) in pers_koerp_main"""
+        main_entry = None
+        for record in self.tables['names'].records(person_id):
+            # Only use main entries (LFDNR=0)
+            if record.get('LFDNR', '0') == '0':
+                main_entry = record
+        if main_entry is None:
+            return f"Person {person_id}"
+
+        # Build display name
+        name_parts = []
+        for field in ('VORNAMEN', 'NACHNAME', 'TITEL'):
+            if main_entry.get(field):
+                name_parts.append(main_entry[field])
+
+        return ' '.join(name_parts) if name_parts else f"Person {person_id}"
+
+    def life_dates(self, person_id):
+        """{'birth': jahr, 'death': jahr} from pers_koerp_datierungen"""
+        dates = {}
+        for record in self.tables['dates'].records(person_id):
+            art = record.get('ART')
+            jahr = record.get('JAHR')
+
+            if jahr and art:
+                if art == 'Geburtsdatum':
+                    dates['birth'] = jahr
+                elif art == 'Sterbedatum':
+                    dates['death'] = jahr
+        return dates
+
+    def place_name(self, place_id):
+        """Main form (LFDNR=0) of a place name from geo_main"""
+        name = None
+        for record in self.tables['place_names'].records(place_id):
+            if record.get('LFDNR', '0') == '0' and record.get('BEZEICHNUNG'):
+                name = record['BEZEICHNUNG']
+        return name
+
+    def place_coords(self, place_id):
+        """{'lat', 'lon'} of a place from geo_indiv (None if missing or invalid)"""
+        coords = None
+        for record in self.tables['place_coords'].records(place_id):
+            lat = record.get('LATITUDE')
+            lon = record.get('LONGITUDE')
 
-        sndb_dir = self.data_dir / 'SNDB'
+            if lat and lon:
+                try:
+                    coords = {
+                        'lat': float(lat),
+                        'lon': float(lon)
+                    }
+                except ValueError:
+                    pass  # Skip invalid coordinates
+        return coords
+
+    def build_woman(self, person_id, gnd):
+        """Create the Phase 1 record for one woman from the loaded tables"""
+        return {
+            'id': person_id,
+            'name': self.person_name(person_id),
+            'gnd': gnd,
+            'sndb_url': f"https://ores.klassik-stiftung.de/ords/f?p=900:2:::::P2_ID:{person_id}",
+            'dates': self.life_dates(person_id),
+            'occupations': [],
+            'places': [],
+            'relationships': [],
+            'network': None,
+            'roles': [],
+            'letter_count': 0,
+            'mention_count': 0
+        }
+
+    def load_phase1_tables(self):
+        """Load the person tables (independent: parsed concurrently)"""
+        self.log("Loading pers_koerp_main.xml, pers_koerp_indiv.xml, pers_koerp_datierungen.xml...")
+        tables = self.load_tables(self.sndb_tasks(PHASE1_TABLES))
+        self.log(f"  Found {len(tables['names'].keys())} persons in main data")
+
+    def identify_women(self):
+        """Extract all women (SEXUS='w') from SNDB with biographical data"""
+        # Individual data (SEXUS, GND), life dates
+        for person_id, gnd in self.iter_women():
+            self.women[person_id] = self.build_woman(person_id, gnd)
 
-        # Step 1: Load main person data (names)
-        self.log("Loading pers_koerp_main.xml...")
-        main_tree = ET.parse(sndb_dir / 'pers_koerp_main.xml')
-        main_root = main_tree.getroot()
-
-        id_to_name = {}
-        for item in main_root.findall('.//ITEM'):
-            person_id = item.find('ID').text
-            lfdnr = item.find('LFDNR').text if item.find('LFDNR') is not None else '0'
-
-            # Only keep main entries (LFDNR=0)
-            if lfdnr == '0':
-                nachname = item.find('NACHNAME').text if item.find('NACHNAME') is not None else ''
-                vornamen = item.find('VORNAMEN').text if item.find('VORNAMEN') is not None else ''
-                titel = item.find('TITEL').text if item.find('TITEL') is not None else ''
-
-                # Build display name
-                name_parts = []
-                if vornamen:
-                    name_parts.append(vornamen)
-                if nachname:
-                    name_parts.append(nachname)
-                if titel:
-                    name_parts.append(titel)
-
-                display_name = ' '.join(name_parts) if name_parts else f"Person {person_id}"
-
-                id_to_name[person_id] = {
-                    'name': display_name,
-                    'nachname': nachname,
-                    'vornamen': vornamen,
-                    'titel': titel
-                }
-
-        self.log(f"  Found {len(id_to_name)} main person entries")
-
-        # Step 2: Load individual data (SEXUS, GND)
-        self.log("Loading pers_koerp_indiv.xml...")
-        indiv_tree = ET.parse(sndb_dir / 'pers_koerp_indiv.xml')
-        indiv_root = indiv_tree.getroot()
-
-        women_count = 0
-        for item in indiv_root.findall('.//ITEM'):
-            person_id = item.find('ID').text
-            sexus = item.find('SEXUS').text if item.find('SEXUS') is not None else None
-
-            # Filter for women (SEXUS='w')
-            if sexus == 'w':
-                women_count += 1
-                gnd = item.find('GND').text if item.find('GND') is not None else None
-
-                # Get name from main data
-                name_data = id_to_name.get(person_id, {'name': f"Person {person_id}"})
-
-                self.women[person_id] = {
-                    'id': person_id,
-                    'name': name_data['name'],
-                    'gnd': gnd,
-                    'sndb_url': f"https://ores.klassik-stiftung.de/ords/f?p=900:2:::::P2_ID:{person_id}",
-                    'dates': {},
-                    'occupations': [],
-                    'places': [],
-                    'relationships': [],
-                    'roles': [],
-                    'letter_count': 0,
-                    'mention_count': 0
-                }
-
-        self.log(f"  Found {women_count} women (SEXUS='w')")
-
-        # Step 3: Add life dates
-        self.log("Loading pers_koerp_datierungen.xml...")
-        dates_tree = ET.parse(sndb_dir / 'pers_koerp_datierungen.xml')
-        dates_root = dates_tree.getroot()
-
-        # Collect birth/death dates (structure: ART=Geburtsdatum/Sterbedatum, JAHR field)
-        person_dates = defaultdict(dict)
-        for item in dates_root.findall('.//ITEM'):
-            person_id = item.find('ID').text
-            if person_id in self.women:
-                art = item.find('ART').text if item.find('ART') is not None else None
-                jahr = item.find('JAHR').text if item.find('JAHR') is not None else None
-
-                if jahr and art:
-                    if art == 'Geburtsdatum':
-                        person_dates[person_id]['birth'] = jahr
-                    elif art == 'Sterbedatum':
-                        person_dates[person_id]['death'] = jahr
-
-        # Add dates to women
-        dates_added = 0
-        for person_id, dates in person_dates.items():
-            if dates:
-                self.women[person_id]['dates'] = dates
-                dates_added += 1
+        self.log(f"  Found {len(self.women)} women (SEXUS='w')")
 
+        dates_added = sum(1 for w in self.women.values() if w['dates'])
         self.log(f"  Added dates for {dates_added} women")
 
         # Validate Phase 1
@@ -247,133 +523,168 @@ class HerDataPipeline:
             return url.split('gnd/')[-1]
         return None
 
-    def phase2_match_letters(self):
-        """Match CMIF letters to women via GND-ID or name"""
-        self.log("\n" + "="*60)
-        self.log("PHASE 2: Matching CMIF letters")
-        self.log("="*60)
-
-        cmif_file = self.data_dir / 'ra-cmif.xml'
-        self.log(f"Loading {cmif_file}...")
-
-        cmif_tree = ET.parse(cmif_file)
-        cmif_root = cmif_tree.getroot()
-        correspondences = cmif_root.findall('.//tei:correspDesc', NS)
-
-        self.log(f"  Found {len(correspondences)} letters")
-
-        # Build GND lookup for fast matching
+    def name_variants(self, person_id):
+        """Alternate name forms from pers_koerp_main rows with LFDNR > 0"""
+        variants = []
+        for record in self.tables['names'].records(person_id):
+            if record.get('LFDNR', '0') == '0':
+                continue
+            name_parts = [record[field] for field in ('VORNAMEN', 'NACHNAME', 'TITEL') if record.get(field)]
+            if name_parts:
+                variants.append(' '.join(name_parts))
+        return variants
+
+    def name_forms(self, person_id):
+        """Display name, main VORNAMEN and NACHNAME, and variant forms of one person"""
+        forms = [self.person_name(person_id)]
+        for record in self.tables['names'].records(person_id):
+            if record.get('LFDNR', '0') == '0':
+                forms += [record[field] for field in ('VORNAMEN', 'NACHNAME') if record.get(field)]
+        return forms + self.name_variants(person_id)
+
+    def build_name_search(self):
+        """Prefix/trigram search index over the name forms of all women (see name_search)"""
+        self.name_search = NameSearch.build((woman_id, self.name_forms(woman_id)) for woman_id in self.women)
+        self.log(f"  Name search: {len(self.name_search.names)} name forms, "
+                 f"{len(self.name_search.postings)} trigrams")
+
+    def build_match_indexes(self):
+        """GND lookup and name index (display names + variants) from the current women
+
+        gnd_to_woman maps the GND of every SNDB person (pers_koerp_indiv)
+        to the woman's ID, or to None for everybody else. All other persons
+        in pers_koerp_main are indexed as competitors, so a man's name is
+        not resolved to a woman with a similar name.
+        """
+        indiv = self.tables['indiv']
         gnd_to_woman = {}
-        name_to_woman = {}
+        for row in range(len(indiv)):
+            gnd = indiv.get(row, 'GND')
+            if gnd and gnd not in gnd_to_woman:
+                gnd_to_woman[gnd] = None
+        name_index = NameIndex()
         for woman_id, woman_data in self.women.items():
             if woman_data.get('gnd'):
                 gnd_to_woman[woman_data['gnd']] = woman_id
             # Also index by name for fallback
-            name_to_woman[woman_data['name'].lower()] = woman_id
+            name_index.add(woman_id, woman_data['name'])
+            for variant in self.name_variants(woman_id):
+                name_index.add(woman_id, variant, variant=True)
+        for person_id in self.tables['names'].keys():
+            if person_id not in self.women:
+                for name in [self.person_name(person_id)] + self.name_variants(person_id):
+                    name_index.add(person_id, name, woman=False)
+        return gnd_to_woman, name_index
+
+    def match_woman(self, ref, name, gnd_to_woman, name_index):
+        """Resolve a CMIF person reference to a woman ID (GND if known to SNDB, else name)"""
+        gnd = self.extract_gnd_id(ref)
+        if gnd in gnd_to_woman:
+            return gnd_to_woman[gnd]  # None: the GND of another SNDB person is a definite no
+        if name:
+            return name_index.lookup(name)
+        return None
 
-        self.log(f"  Built GND index: {len(gnd_to_woman)} women with GND")
+    def match_letter(self, letter, gnd_to_woman, name_index):
+        """Return [(woman_id, role)] for the sender and mentions of one letter"""
+        matches = []
+
+        # Check sender
+        sender = letter['sender']
+        if sender is not None:
+            woman_id = self.match_woman(sender['ref'], sender['name'], gnd_to_woman, name_index)
+            if woman_id:
+                matches.append((woman_id, 'sender'))
+
+        # Check mentioned persons
+        for mention in letter['mentions']:
+            woman_id = self.match_woman(mention['ref'], mention['name'], gnd_to_woman, name_index)
+            if woman_id:
+                matches.append((woman_id, 'mentioned'))
+
+        return matches
+
+    def letter_keys(self, letter):
+        """Lookup keys a letter's match depends on: ('gnd', id), ('name', lowercased), ('block', code)"""
+        keys = set()
+        refs = ([letter['sender']] if letter['sender'] is not None else []) + letter['mentions']
+        for ref in refs:
+            gnd = self.extract_gnd_id(ref['ref'])
+            if gnd:
+                keys.add(('gnd', gnd))
+            if ref['name']:
+                keys |= lookup_keys(ref['name'])  # Also with a GND: unknown GNDs fall back to the name
+        return keys
+
+    def record_letter_match(self, woman_id, role, letter_year):
+        """Count a matched letter for a woman and record role and year"""
+        woman = self.women[woman_id]
+        woman['letter_count' if role == 'sender' else 'mention_count'] += 1
+        if role not in woman['roles']:
+            woman['roles'].append(role)
+        # Add letter year if available
+        if letter_year:
+            self.year_histograms.add(woman_id, letter_year)
+
+    def assign_role(self, woman_data):
+        """Derive the combined role from the roles list"""
+        roles = woman_data['roles']
+        if len(roles) == 0:
+            woman_data['role'] = 'indirect'  # SNDB-only, no CMIF match
+        elif len(roles) == 2:
+            woman_data['role'] = 'both'
+        elif 'sender' in roles:
+            woman_data['role'] = 'sender'
+        elif 'mentioned' in roles:
+            woman_data['role'] = 'mentioned'
+
+    def stream_letter_matches(self, gnd_to_woman, name_index):
+        """Stream CMIF and yield (letter, matches) for every correspDesc"""
+        cmif_file = self.data_dir / 'ra-cmif.xml'
+        self.log(f"Streaming {cmif_file} ({self.cmif_backend.name} backend)...")
+        for letter in iter_cmif_letters(cmif_file, self.cmif_backend, self.workers):
+            yield letter, self.match_letter(letter, gnd_to_woman, name_index)
 
-        # Match letters and extract years
+    def match_letters(self):
+        """Match CMIF letters to women via GND-ID or name"""
+        # Build GND lookup and name index for fast matching
+        gnd_to_woman, name_index = self.build_match_indexes()
+        self.log(f"  Built GND index: {sum(1 for woman_id in gnd_to_woman.values() if woman_id)} women with GND")
+
+        # Stream letters: each correspDesc is matched and discarded right away
         matched_senders = set()
         matched_mentioned = set()
-
-        for corresp in correspondences:
-            # Extract letter year
-            letter_year = None
-            sent_action = corresp.find('.//tei:correspAction[@type="sent"]', NS)
-            if sent_action:
-                date_elem = sent_action.find('.//tei:date', NS)
-                if date_elem is not None and date_elem.get('when'):
-                    try:
-                        letter_year = int(date_elem.get('when')[:4])
-                    except:
-                        pass
-
-            # Check senders
-            if sent_action:
-                sender = sent_action.find('.//tei:persName', NS)
-                if sender is not None:
-                    sender_ref = sender.get('ref', '')
-                    sender_gnd = self.extract_gnd_id(sender_ref)
-
-                    # Match by GND (primary)
-                    if sender_gnd and sender_gnd in gnd_to_woman:
-                        woman_id = gnd_to_woman[sender_gnd]
-                        self.women[woman_id]['letter_count'] += 1
-                        if 'sender' not in self.women[woman_id]['roles']:
-                            self.women[woman_id]['roles'].append('sender')
-                        # Add letter year if available
-                        if letter_year:
-                            if 'letter_years' not in self.women[woman_id]:
-                                self.women[woman_id]['letter_years'] = []
-                            self.women[woman_id]['letter_years'].append(letter_year)
-                        matched_senders.add(woman_id)
-                    # Fallback: match by name
-                    elif sender.text:
-                        sender_name_lower = sender.text.lower()
-                        if sender_name_lower in name_to_woman:
-                            woman_id = name_to_woman[sender_name_lower]
-                            self.women[woman_id]['letter_count'] += 1
-                            if 'sender' not in self.women[woman_id]['roles']:
-                                self.women[woman_id]['roles'].append('sender')
-                            # Add letter year if available
-                            if letter_year:
-                                if 'letter_years' not in self.women[woman_id]:
-                                    self.women[woman_id]['letter_years'] = []
-                                self.women[woman_id]['letter_years'].append(letter_year)
-                            matched_senders.add(woman_id)
-
-            # Check mentioned persons
-            note = corresp.find('.//tei:note', NS)
-            if note:
-                for ref in note.findall('.//tei:ref[@type="cmif:mentionsPerson"]', NS):
-                    person_ref = ref.get('target', '')
-                    person_gnd = self.extract_gnd_id(person_ref)
-
-                    # Match by GND
-                    if person_gnd and person_gnd in gnd_to_woman:
-                        woman_id = gnd_to_woman[person_gnd]
-                        self.women[woman_id]['mention_count'] += 1
-                        if 'mentioned' not in self.women[woman_id]['roles']:
-                            self.women[woman_id]['roles'].append('mentioned')
-                        # Add letter year if available
-                        if letter_year:
-                            if 'letter_years' not in self.women[woman_id]:
-                                self.women[woman_id]['letter_years'] = []
-                            self.women[woman_id]['letter_years'].append(letter_year)
-                        matched_mentioned.add(woman_id)
-                    # Fallback: match by name
-                    elif ref.text:
-                        person_name_lower = ref.text.lower()
-                        if person_name_lower in name_to_woman:
-                            woman_id = name_to_woman[person_name_lower]
-                            self.women[woman_id]['mention_count'] += 1
-                            if 'mentioned' not in self.women[woman_id]['roles']:
-                                self.women[woman_id]['roles'].append('mentioned')
-                            # Add letter year if available
-                            if letter_year:
-                                if 'letter_years' not in self.women[woman_id]:
-                                    self.women[woman_id]['letter_years'] = []
-                                self.women[woman_id]['letter_years'].append(letter_year)
-                            matched_mentioned.add(woman_id)
+        letter_total = 0
+        start = time.perf_counter()
+
+        for letter, matches in self.stream_letter_matches(gnd_to_woman, name_index):
+            letter_total += 1
+            for woman_id, role in matches:
+                self.record_letter_match(woman_id, role, letter['year'])
+                (matched_senders if role == 'sender' else matched_mentioned).add(woman_id)
+
+            # Incremental mode keeps compact letter records for the run state
+            if self.track_letters:
+                self.cmif_letters.append(letter)
+                self.letter_matches.append(matches)
+
+        self.log(f"  Processed {letter_total} letters")
+        if self.profile:
+            cmif_file = self.data_dir / 'ra-cmif.xml'
+            self.profile.record_input(cmif_file.name, letter_total, time.perf_counter() - start,
+                                      cmif_file.stat().st_size)
 
         # Assign combined roles
-        for woman_id, woman_data in self.women.items():
-            roles = woman_data['roles']
-            if len(roles) == 0:
-                woman_data['role'] = 'indirect'  # SNDB-only, no CMIF match
-            elif len(roles) == 2:
-                woman_data['role'] = 'both'
-            elif 'sender' in roles:
-                woman_data['role'] = 'sender'
-            elif 'mentioned' in roles:
-                woman_data['role'] = 'mentioned'
+        for woman_data in self.women.values():
+            self.assign_role(woman_data)
 
         self.log(f"  Matched {len(matched_senders)} women as senders")
         self.log(f"  Matched {len(matched_mentioned)} women as mentioned")
+        self.log(f"  Name matches by tier: {dict(name_index.hits)} ({len(name_index)} indexed names)")
 
         # Validate Phase 2
         self.test_phase2()
+        self.stats['phase2']['name_matches'] = dict(name_index.hits)
 
         return self.women
 
@@ -381,136 +692,250 @@ class HerDataPipeline:
     # PHASE 3: Enrich with Geodata and Biographical Info
     # ============================================================
 
-    def phase3_enrich_data(self):
-        """Add geodata, occupations, relationships from SNDB"""
-        self.log("\n" + "="*60)
-        self.log("PHASE 3: Enriching with geodata and biographical info")
-        self.log("="*60)
-
-        sndb_dir = self.data_dir / 'SNDB'
+    def build_place_authorities(self):
+        """Index geo_links by authority ID and merge places sharing one (see place_authority)"""
+        self.place_authorities = PlaceAuthorities.build(read_place_links(self.tables['place_links']),
+                                                        lambda place_id: self.place_coords(place_id) is not None)
+        authorities = self.place_authorities
+        merged = sum(len(group) for group in authorities.groups.values())
+        self.log(f"  Place authorities: {len(authorities)} places, {len(authorities.key_places)} authority IDs, "
+                 f"{merged} places merged into {len(authorities.groups)}")
+
+    def enrich_woman(self, woman_data):
+        """Add places (with name and coordinates) and occupations to one woman"""
+        merged = {}  # (canonical place, link type) -> SNDB place linked first
+        for link in self.tables['places'].records(woman_data['id']):
+            place_id = link.get('SNDB_ID')
+            if not place_id:
+                continue
+            canonical = self.place_authorities.canonical(place_id)
+            if merged.setdefault((canonical, link.get('ART')), place_id) != place_id:
+                continue  # Same place under another SNDB ID (repeated links of one ID are kept as before)
+            place_id = canonical
+            place_name = self.place_name(place_id)
+            coords = self.place_coords(place_id)
+
+            if place_name and coords:
+                woman_data['places'].append({
+                    'name': place_name,
+                    'lat': coords['lat'],
+                    'lon': coords['lon'],
+                    'type': link.get('ART', 'Ort')
+                })
 
-        # Step 1: Load place linkage (person → place ID)
-        self.log("Loading pers_koerp_orte.xml...")
-        orte_tree = ET.parse(sndb_dir / 'pers_koerp_orte.xml')
-        orte_root = orte_tree.getroot()
-
-        person_to_places = defaultdict(list)
-        for item in orte_root.findall('.//ITEM'):
-            person_id = item.find('ID').text
-            sndb_id = item.find('SNDB_ID').text if item.find('SNDB_ID') is not None else None
-            art = item.find('ART').text if item.find('ART') is not None else 'Ort'
-
-            if person_id in self.women and sndb_id:
-                person_to_places[person_id].append({
-                    'sndb_id': sndb_id,
-                    'type': art
+        for record in self.tables['occupations'].records(woman_data['id']):
+            if record.get('BERUF'):
+                woman_data['occupations'].append({
+                    'name': record['BERUF'],
+                    'type': 'Beruf'
                 })
 
-        self.log(f"  Found place links for {len(person_to_places)} women")
+    def enrich_women(self):
+        """Merge geodata and occupations into all women"""
+        with_place_links = sum(1 for person_id in self.women if person_id in self.tables['places'])
+        self.log(f"  Found place links for {with_place_links} women")
 
-        # Step 2: Load place names
-        self.log("Loading geo_main.xml...")
-        geo_main_tree = ET.parse(sndb_dir / 'geo_main.xml')
-        geo_main_root = geo_main_tree.getroot()
+        for woman_data in self.women.values():
+            self.enrich_woman(woman_data)
 
-        place_id_to_name = {}
-        for item in geo_main_root.findall('.//ITEM'):
-            place_id = item.find('ID').text
-            lfdnr = item.find('LFDNR').text if item.find('LFDNR') is not None else '0'
-            bezeichnung = item.find('BEZEICHNUNG').text if item.find('BEZEICHNUNG') is not None else None
+        occupations_added = sum(len(w['occupations']) for w in self.women.values())
+        self.log(f"  Added {occupations_added} occupation entries")
 
-            # Only use main form (LFDNR=0)
-            if lfdnr == '0' and bezeichnung:
-                place_id_to_name[place_id] = bezeichnung
+    def build_relationship_graph(self):
+        """Graph of all SNDB relationships with AGRELON types (see relationship_graph)"""
+        vocabulary = read_vocabulary(self.tables['agrelon'])
+        self.relationship_graph = RelationshipGraph.build(read_relations(self.tables['relationships']), vocabulary)
+        graph = self.relationship_graph
+        self.log(f"  Relationship graph: {len(graph)} persons, {graph.edge_count} edges, "
+                 f"{len(vocabulary)} AGRELON types ({graph.nbytes() / 1024:.0f} KB)")
+        return graph
+
+    def resolve_relationships(self, person_id):
+        """Relationships of one person with resolved names and AGRELON types"""
+        relationships = []
+        for target_id, agrelon_id in self.relationship_graph.neighbors(person_id):
+            relation = self.relationship_graph.relation(agrelon_id)
+            relationships.append({
+                'id': target_id,
+                'name': self.person_name(target_id),
+                'type': relation.get('type'),
+                'category': relation.get('category'),
+                'agrelon': agrelon_id
+            })
+        return relationships
+
+    def enrich_relationships(self):
+        """Set the relationships of all women; returns the IDs of women whose relationships changed"""
+        changed = set()
+        for woman_id, woman_data in self.women.items():
+            relationships = self.resolve_relationships(woman_id)
+            if relationships != woman_data['relationships']:
+                woman_data['relationships'] = relationships
+                changed.add(woman_id)
+        relationships_added = sum(len(w['relationships']) for w in self.women.values())
+        self.log(f"  Added {relationships_added} relationship entries")
+        return changed
+
+    def build_network_metrics(self):
+        """Degree, component, PageRank and betweenness over the whole graph (see network_metrics)"""
+        self.network_metrics = NetworkMetrics.build(self.relationship_graph, self.network_backend)
+        sizes = self.network_metrics.component_sizes
+        self.log(f"  Network metrics ({self.network_backend}): {len(sizes)} components, "
+                 f"largest {sizes[0] if sizes else 0} persons")
+        return self.network_metrics
+
+    def restore_network_metrics(self, metrics):
+        """Use cached metrics (on the current relationship graph, which has the same content)"""
+        metrics.graph = self.relationship_graph
+        self.network_metrics = metrics
+
+    def set_network(self):
+        """Network metrics of every woman"""
+        for woman_id, woman_data in self.women.items():
+            woman_data['network'] = self.network_metrics.person(woman_id)
+
+    def benchmark_network(self, factor=BENCHMARK_FACTOR):
+        """Time graph and metrics build on the relationship graph scaled by factor"""
+        relations = list(read_relations(self.tables['relationships']))
+        results = benchmark(relations, self.relationship_graph.vocabulary, factor)
+        for backend, result in results.items():
+            status = 'OK' if result['total_s'] <= BENCHMARK_BUDGET_S else 'OVER BUDGET'
+            self.log(f"[{status}] Network build {factor}x ({backend}): {result['persons']} persons, "
+                     f"{result['edges']} edges in {result['total_s']:.2f} s "
+                     f"(graph {result['graph_s']:.2f} s, metrics {result['metrics_s']:.2f} s; "
+                     f"budget {BENCHMARK_BUDGET_S:.0f} s)")
+        return results
+
+    def build_spatial_index(self):
+        """Index all places of all women by coordinates (see spatial_index)"""
+        self.spatial_index = SpatialIndex.build(self.women)
+        shared = sum(1 for key in self.spatial_index.locations if len(self.spatial_index.persons(key)) > 1)
+        self.log(f"  Spatial index: {len(self.spatial_index)} locations, {shared} shared by several women")
+
+    def register_entries(self, person_id):
+        """Distinct REGISTEREINTRAG texts of one person over all edition projects"""
+        texts = []
+        for name in REGISTER_TABLES:
+            for record in self.tables[name].records(person_id):
+                if record.get('REGISTEREINTRAG'):
+                    texts.append(record['REGISTEREINTRAG'])
+        return list(dict.fromkeys(texts))
+
+    def build_text_index(self):
+        """Inverted index over the register entries of all women (see text_index)"""
+        self.text_index = TextIndex.build((woman_id, self.register_entries(woman_id)) for woman_id in self.women)
+        index = self.text_index
+        self.log(f"  Text index: {len(index)} women with register entries, {len(index.terms)} terms, "
+                 f"{index.token_count} tokens ({len(index.postings) / 1024:.0f} KB postings)")
+
+    def load_phase3_tables(self):
+        """Load the enrichment tables (independent: parsed concurrently)"""
+        self.log("Loading pers_koerp_orte.xml, geo_main.xml, geo_indiv.xml, geo_links.xml, pers_koerp_berufe.xml, "
+                 "pers_koerp_beziehungen.xml, nsl_agrelon.xml, pers_koerp_projekt_*.xml...")
+        tables = self.load_tables(self.sndb_tasks(PHASE3_TABLES))
+        self.log(f"  Loaded {len(tables['places'].keys())} persons with place links")
+        self.log(f"  Loaded {len(tables['place_names'].keys())} places with names")
+        self.log(f"  Loaded {len(tables['place_coords'].keys())} places with coordinates")
 
-        self.log(f"  Loaded {len(place_id_to_name)} place names")
+    # ============================================================
+    # PHASE 4: Generate JSON Output
+    # ============================================================
 
-        # Step 3: Load coordinates
-        self.log("Loading geo_indiv.xml...")
-        geo_indiv_tree = ET.parse(sndb_dir / 'geo_indiv.xml')
-        geo_indiv_root = geo_indiv_tree.getroot()
+    def timeline_by_role(self):
+        """{role: timeline} for women with letters (sender, mentioned, both)"""
+        groups = defaultdict(list)
+        for woman_id, woman_data in self.women.items():
+            if woman_data.get('role', 'indirect') != 'indirect':
+                groups[woman_data['role']].append(woman_id)
+        return self.year_histograms.timelines_by(dict(sorted(groups.items())))
 
-        place_id_to_coords = {}
-        for item in geo_indiv_root.findall('.//ITEM'):
-            place_id = item.find('ID').text
-            lat = item.find('LATITUDE').text if item.find('LATITUDE') is not None else None
-            lon = item.find('LONGITUDE').text if item.find('LONGITUDE') is not None else None
+    def timeline_by_occupation(self):
+        """{occupation name: timeline} for women with letters"""
+        groups = defaultdict(list)
+        for woman_id, woman_data in self.women.items():
+            if woman_data.get('role', 'indirect') == 'indirect':
+                continue
+            for name in {occupation['name'] for occupation in woman_data.get('occupations', [])}:
+                groups[name].append(woman_id)
+        return self.year_histograms.timelines_by(dict(sorted(groups.items())))
+
+    def build_person_entry(self, woman_data):
+        """Build the output entry for one woman (empty fields removed to save space)"""
+        # Determine normierung status
+        if woman_data.get('gnd'):
+            normierung = 'gnd'
+        else:
+            normierung = 'sndb'
+
+        person = {
+            'id': woman_data['id'],
+            'name': woman_data['name'],
+            'role': woman_data.get('role', 'indirect'),
+            'normierung': normierung,
+            'sndb_url': woman_data['sndb_url']
+        }
 
-            if lat and lon:
-                try:
-                    place_id_to_coords[place_id] = {
-                        'lat': float(lat),
-                        'lon': float(lon)
-                    }
-                except ValueError:
-                    pass  # Skip invalid coordinates
+        # Add optional fields only if present
+        if woman_data.get('gnd'):
+            person['gnd'] = woman_data['gnd']
 
-        self.log(f"  Loaded coordinates for {len(place_id_to_coords)} places")
-
-        # Step 4: Merge geodata into women
-        for person_id, places_list in person_to_places.items():
-            for place_info in places_list:
-                place_id = place_info['sndb_id']
-                place_name = place_id_to_name.get(place_id)
-                coords = place_id_to_coords.get(place_id)
-
-                if place_name and coords:
-                    self.women[person_id]['places'].append({
-                        'name': place_name,
-                        'lat': coords['lat'],
-                        'lon': coords['lon'],
-                        'type': place_info['type']
-                    })
-
-        # Step 5: Load occupations
-        self.log("Loading pers_koerp_berufe.xml...")
-        berufe_tree = ET.parse(sndb_dir / 'pers_koerp_berufe.xml')
-        berufe_root = berufe_tree.getroot()
-
-        occupations_added = 0
-        for item in berufe_root.findall('.//ITEM'):
-            person_id = item.find('ID').text
-            if person_id in self.women:
-                beruf = item.find('BERUF').text if item.find('BERUF') is not None else None
-                if beruf:
-                    self.women[person_id]['occupations'].append({
-                        'name': beruf,
-                        'type': 'Beruf'
-                    })
-                    occupations_added += 1
+        if woman_data.get('roles'):
+            person['roles'] = woman_data['roles']
 
-        self.log(f"  Added {occupations_added} occupation entries")
+        if woman_data.get('letter_count', 0) > 0:
+            person['letter_count'] = woman_data['letter_count']
 
-        # Validate Phase 3
-        self.test_phase3()
+        letter_years = self.year_histograms.years(woman_data['id'])
+        if letter_years:
+            person['letter_years'] = letter_years
 
-        return self.women
+        if woman_data.get('mention_count', 0) > 0:
+            person['mention_count'] = woman_data['mention_count']
 
-    # ============================================================
-    # PHASE 4: Generate JSON Output
-    # ============================================================
+        if woman_data.get('dates', {}).get('birth') or woman_data.get('dates', {}).get('death'):
+            person['dates'] = woman_data['dates']
+
+        if woman_data.get('places'):
+            person['places'] = woman_data['places']
 
-    def phase4_generate_json(self):
-        """Generate final JSON output with metadata"""
+        if woman_data.get('occupations'):
+            person['occupations'] = woman_data['occupations']
+
+        if woman_data.get('network'):
+            # Component numbers only hold within one run; zero betweenness is left out like other empty fields
+            person['network'] = {key: value for key, value in woman_data['network'].items()
+                                 if key != 'component' and value}
+
+        return person
+
+    def keeps_persons(self):
+        """Whether Phase 4 collects the person entries (an output written after persons.json needs them)"""
+        return bool(self.keep_persons or self.track_letters or self.shard_dir or self.columnar_file
+                    or self.filter_file or self.cluster_file)
+
+    def phase4_generate_json(self, reuse_entries=None, keep_persons=False):
+        """Generate final JSON output with metadata
+
+        reuse_entries maps woman IDs to person entries from a previous run
+        that are still valid (incremental mode); all others are rebuilt.
+        Person entries are streamed to the file; output_data['persons'] is
+        only filled if keep_persons or keeps_persons() (otherwise there is
+        no 'persons' key), so memory does not grow with the output.
+        """
         self.log("\n" + "="*60)
         self.log("PHASE 4: Generating JSON output")
         self.log("="*60)
 
-        # Calculate metadata statistics
+        # Calculate metadata statistics (one pass)
         total_women = len(self.women)
-        with_letters = sum(1 for w in self.women.values() if w.get('letter_count', 0) > 0 or w.get('mention_count', 0) > 0)
-        with_geodata = sum(1 for w in self.women.values() if w.get('places') and len(w['places']) > 0)
-        with_gnd = sum(1 for w in self.women.values() if w.get('gnd'))
+        with_letters = with_geodata = with_gnd = 0
+        for w in self.women.values():
+            with_letters += w.get('letter_count', 0) > 0 or w.get('mention_count', 0) > 0
+            with_geodata += bool(w.get('places'))
+            with_gnd += bool(w.get('gnd'))
 
-        # Build aggregated timeline data
-        from collections import Counter
-        all_years = []
-        for woman in self.women.values():
-            if woman.get('letter_years'):
-                all_years.extend(woman['letter_years'])
-
-        year_counts = Counter(all_years)
-        timeline_data = [{'year': year, 'count': count} for year, count in sorted(year_counts.items())]
+        # Build aggregated timeline data (column sums over the year histograms)
+        timeline_data = self.year_histograms.timeline(self.women)
 
         # Build output structure
         output_data = {
@@ -526,91 +951,360 @@ class HerDataPipeline:
                     'cmif': 'ra-cmif.xml (2025-03 snapshot)',
                     'sndb': 'SNDB export 2025-10'
                 },
-                'timeline': timeline_data
-            },
-            'persons': []
+                'timeline': timeline_data,
+                'timeline_by_role': self.timeline_by_role()
+            }
         }
 
         self.log(f"  Timeline: {len(timeline_data)} years with letter data")
 
-        # Add persons
-        for woman_id, woman_data in self.women.items():
-            # Determine normierung status
-            if woman_data.get('gnd'):
-                normierung = 'gnd'
-            else:
-                normierung = 'sndb'
-
-            # Build person entry (remove empty fields to save space)
-            person = {
-                'id': woman_data['id'],
-                'name': woman_data['name'],
-                'role': woman_data.get('role', 'indirect'),
-                'normierung': normierung,
-                'sndb_url': woman_data['sndb_url']
-            }
+        # Stream persons to the file as they are built, counting what Phase 4 validates
+        reuse_entries = reuse_entries or {}
+        role_counts = Counter()
+        missing_fields = Counter({field: 0 for field in ('id', 'name', 'role', 'normierung')})
+        persons = [] if keep_persons or self.keeps_persons() else None
+
+        def person_entries():
+            for woman_id, woman_data in self.women.items():
+                person = reuse_entries.get(woman_id)
+                if person is None:
+                    person = self.build_person_entry(woman_data)
+                role_counts[person['role']] += 1
+                for field in missing_fields:
+                    missing_fields[field] += field not in person
+                if persons is not None:
+                    persons.append(person)
+                yield person
 
-            # Add optional fields only if present
-            if woman_data.get('gnd'):
-                person['gnd'] = woman_data['gnd']
+        self.output_file.parent.mkdir(parents=True, exist_ok=True)
+        person_count = write_persons_json(self.output_file, output_data['meta'], person_entries(),
+                                          compact=self.compact, encoder=self.json_encoder)
+        if persons is not None:
+            output_data['persons'] = persons
+
+        # Validate Phase 4
+        self.test_phase4(output_data, person_count, missing_fields)
+        self.stats['phase4']['roles'] = dict(sorted(role_counts.items()))
+        self.stats['phase4']['json_encoder'] = self.json_encoder + (' (compact)' if self.compact else '')
+
+        file_size_mb = self.output_file.stat().st_size / (1024 * 1024)
+        self.stats['phase4']['output_file_size'] = f"{file_size_mb:.2f} MB"
 
-            if woman_data.get('roles'):
-                person['roles'] = woman_data['roles']
+        self.log(f"\n[OK] JSON written to {self.output_file}")
+        self.log(f"  File size: {file_size_mb:.2f} MB")
 
-            if woman_data.get('letter_count', 0) > 0:
-                person['letter_count'] = woman_data['letter_count']
+        if self.shard_dir:
+            sizes = self.save_shards(output_data)
+            self.log(f"[OK] Shards written to {self.shard_dir}")
+            self.log(f"  index.json: {sizes['index.json'] / 1024:.0f} KB, meta.json: {sizes['meta.json'] / 1024:.1f} KB, "
+                     f"{len(sizes) - 2} detail shards")
 
-            if woman_data.get('letter_years'):
-                # Store unique years, sorted
-                person['letter_years'] = sorted(list(set(woman_data['letter_years'])))
+        if self.columnar_file:
+            size = write_columnar(output_data, self.columnar_file)
+            self.stats['phase4']['columnar_file_size'] = f"{size / (1024 * 1024):.2f} MB"
+            self.log(f"[OK] Columnar JSON written to {self.columnar_file} ({size / 1024:.0f} KB)")
 
-            if woman_data.get('mention_count', 0) > 0:
-                person['mention_count'] = woman_data['mention_count']
+        if self.filter_file:
+            size = write_filter_index(output_data['persons'], self.filter_file,
+                                      generated=output_data['meta']['generated'])
+            self.log(f"[OK] Filter bitmaps written to {self.filter_file} ({size / 1024:.0f} KB)")
 
-            if woman_data.get('dates', {}).get('birth') or woman_data.get('dates', {}).get('death'):
-                person['dates'] = woman_data['dates']
+        if self.cluster_file:
+            size = write_clusters(output_data['persons'], self.cluster_file,
+                                  generated=output_data['meta']['generated'])
+            self.log(f"[OK] Cluster pyramid written to {self.cluster_file} ({size / 1024:.0f} KB)")
 
-            if woman_data.get('places'):
-                person['places'] = woman_data['places']
+        if self.location_file:
+            size = write_locations(self.spatial_index, self.location_file)
+            self.log(f"[OK] Location table written to {self.location_file} ({size / 1024:.0f} KB)")
 
-            if woman_data.get('occupations'):
-                person['occupations'] = woman_data['occupations']
+        if self.relationship_file:
+            size = write_relationships(self.women, self.relationship_graph.vocabulary, self.relationship_file)
+            self.log(f"[OK] Relationships written to {self.relationship_file} ({size / 1024:.0f} KB)")
 
-            output_data['persons'].append(person)
+        if self.text_index_file:
+            size = write_text_index(self.text_index, self.text_index_file)
+            self.log(f"[OK] Full-text index written to {self.text_index_file} ({size / 1024:.0f} KB)")
 
-        # Validate Phase 4
-        self.test_phase4(output_data)
+        if self.name_search_file:
+            size = write_name_search(self.name_search, self.name_search_file)
+            self.log(f"[OK] Name search index written to {self.name_search_file} ({size / 1024:.0f} KB)")
 
-        # Write to file
-        self.output_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.output_file, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=2)
+        return output_data
 
-        file_size_mb = self.output_file.stat().st_size / (1024 * 1024)
-        self.stats['phase4']['output_file_size'] = f"{file_size_mb:.2f} MB"
+    def save_shards(self, output_data):
+        """Write index, meta and per-bucket detail shards next to the single file"""
+        sizes = write_shards(output_data, self.shard_dir)
+        self.stats['phase4']['shard_sizes'] = {
+            'index': sizes['index.json'],
+            'meta': sizes['meta.json'],
+            'max_detail': max(size for path, size in sizes.items() if path.startswith('persons/'))
+        }
+        return sizes
 
-        self.log(f"\n[OK] JSON written to {self.output_file}")
-        self.log(f"  File size: {file_size_mb:.2f} MB")
+    # ============================================================
+    # Incremental Rebuild
+    # ============================================================
+
+    def state_file(self):
+        """Run state location (per output file, next to the table cache)"""
+        return self.data_dir / '.cache' / f"run_state-{self.output_file.stem}.pkl"
+
+    def source_files(self):
+        """{source name: path} for every input (SNDB tables + CMIF)"""
+        sndb_dir = self.data_dir / 'SNDB'
+        sources = {name: sndb_dir / filename for name, (_, filename) in SNDB_TABLES.items()}
+        sources['cmif'] = self.data_dir / 'ra-cmif.xml'
+        return sources
+
+    def index_letters(self, letter_matches):
+        """Per-letter lookup keys and per-woman (position, slot, role) entries"""
+        key_index = defaultdict(set)
+        for position, letter in enumerate(self.cmif_letters):
+            for key in self.letter_keys(letter):
+                key_index[key].add(position)
+
+        woman_letters = defaultdict(list)
+        for position, matches in enumerate(letter_matches):
+            for slot, (woman_id, role) in enumerate(matches):
+                woman_letters[woman_id].append((position, slot, role))
+        return dict(key_index), dict(woman_letters)
+
+    def letter_signatures(self, letters, woman_letters):
+        """{woman_id: [(role, year)]} in letter order, independent of positions"""
+        return {woman_id: [(role, letters[position]['year']) for position, _, role in sorted(entries)]
+                for woman_id, entries in woman_letters.items()}
+
+    def apply_letter_entries(self, woman_data, entries):
+        """Recompute Phase 2 fields of one woman from her (position, slot, role) entries"""
+        woman_data['letter_count'] = 0
+        woman_data['mention_count'] = 0
+        woman_data['roles'] = []
+        self.year_histograms.clear(woman_data['id'])
+        for position, _, role in sorted(entries):
+            self.record_letter_match(woman_data['id'], role, self.cmif_letters[position]['year'])
+        self.assign_role(woman_data)
+
+    def save_run_state(self, output_data, digests, fingerprints, key_index, woman_letters):
+        """Persist everything needed to diff the next run against this one"""
+        save_state(self.state_file(), {
+            'fingerprints': fingerprints,
+            'digests': digests,
+            'women': self.women,
+            'persons': {person['id']: person for person in output_data['persons']},
+            'letters': self.cmif_letters,
+            'letter_matches': self.letter_matches,
+            'key_index': key_index,
+            'woman_letters': woman_letters,
+            'match_indexes': self.build_match_indexes(),
+            'place_canonical': self.place_authorities.canonical_ids,
+            'year_histograms': self.year_histograms
+        })
+
+    def run_stages(self):
+        """Run all stages, independent ones concurrently; returns the output data"""
+        # Profiling runs one stage at a time so that time and memory are attributed to one stage
+        workers = 1 if self.profile else self.workers
+        self.log(f"Running {len(self.stages)} stages...")
+        results = self.stages.run(workers=workers)
+
+        seconds, path = self.stages.critical_path()
+        self.stats['stages'] = {
+            'stages': len(self.stages),
+            'total_stage_time': f"{sum(self.stages.timings.values()):.2f} s",
+            'critical_path': f"{' > '.join(path)} ({seconds:.2f} s)",
+            'cached': ', '.join(self.stages.cached) or 'none'
+        }
+        return results['output']
+
+    def run_full_with_state(self):
+        """Full run that records the run state for later incremental runs"""
+        self.track_letters = True
+        output_data = self.run_stages()
 
+        fingerprints = {name: fingerprint(path) for name, path in self.source_files().items()}
+        digests = {name: table_digests(self.tables[name]) for name in SNDB_TABLES}
+        key_index, woman_letters = self.index_letters(self.letter_matches)
+        self.save_run_state(output_data, digests, fingerprints, key_index, woman_letters)
+        return output_data
+
+    def run_incremental(self, state):
+        """Rebuild only the women affected by input changes since the last run
+
+        Unchanged sources are skipped via their fingerprint; changed SNDB
+        tables are diffed per record key; letters are re-matched only if
+        the CMIF file changed or they reference a changed GND/name key.
+        Unaffected women and their output entries are reused as is.
+        """
+        self.log("\n" + "="*60)
+        self.log("INCREMENTAL UPDATE: Diffing inputs against previous run")
+        self.log("="*60)
+
+        # Step 1: Which sources changed? (hashing only files with new size/mtime)
+        fingerprints = {}
+        changed_sources = set()
+        for name, path in self.source_files().items():
+            previous = state['fingerprints'].get(name)
+            fingerprints[name] = fingerprint(path, previous)
+            if previous is None or fingerprints[name]['sha256'] != previous['sha256']:
+                changed_sources.add(name)
+        self.log(f"  Changed sources: {', '.join(sorted(changed_sources)) or 'none'}")
+
+        # Step 2: Load tables (unchanged ones come from the table cache)
+        self.load_tables(self.sndb_tasks(SNDB_TABLES))
+
+        # Step 3: Diff changed tables per record key
+        digests = dict(state['digests'])
+        affected = set()
+        changed_places = set()
+        for name in changed_sources & SNDB_TABLES.keys():
+            digests[name] = table_digests(self.tables[name])
+            keys = changed_keys(state['digests'].get(name, {}), digests[name])
+            if name in ('place_names', 'place_coords'):
+                changed_places |= keys
+            elif name not in ('relationships', 'agrelon', 'place_links') + REGISTER_TABLES:
+                affected |= keys  # Relationships and the text index are rebuilt in Step 6 (not in person entries)
+
+        # Merged places: a changed merge, or a change to any merged place, affects links to all its members
+        self.build_place_authorities()
+        authorities = self.place_authorities
+        changed_places |= changed_keys(state['place_canonical'], authorities.canonical_ids)
+        changed_places |= {member for place_id in changed_places
+                           for member in authorities.groups.get(authorities.canonical(place_id), ())}
+
+        # Step 4: Phase 1 - rebuild changed/new women, reuse the rest
+        old_women = state['women']
+        new_ids = {person_id for person_id, _ in self.iter_women()}
+        if changed_places:
+            places = self.tables['places']
+            affected |= {person_id for person_id in new_ids
+                         if any(link.get('SNDB_ID') in changed_places for link in places.records(person_id))}
+        affected = {person_id for person_id in affected if person_id in new_ids} | (new_ids - old_women.keys())
+
+        for person_id, gnd in self.iter_women():
+            if person_id in affected:
+                self.women[person_id] = self.build_woman(person_id, gnd)
+            else:
+                self.women[person_id] = old_women[person_id]
+        self.test_phase1()
+        self.build_name_search()
+
+        # Step 5: Phase 2 - re-match only letters whose outcome can change
+        gnd_to_woman, name_index = self.build_match_indexes()
+        if 'cmif' in changed_sources:
+            for letter, matches in self.stream_letter_matches(gnd_to_woman, name_index):
+                self.cmif_letters.append(letter)
+                self.letter_matches.append(matches)
+            key_index, woman_letters = self.index_letters(self.letter_matches)
+
+            # Positions shift when letters are added/removed: compare per-woman (role, year) sequences
+            old_signatures = self.letter_signatures(state['letters'], state['woman_letters'])
+            new_signatures = self.letter_signatures(self.cmif_letters, woman_letters)
+            affected |= changed_keys(old_signatures, new_signatures) & new_ids
+        else:
+            self.cmif_letters = state['letters']
+            self.letter_matches = list(state['letter_matches'])
+            key_index = state['key_index']
+            woman_letters = {woman_id: list(entries) for woman_id, entries in state['woman_letters'].items()}
+
+            old_gnd_index, old_name_index = state['match_indexes']
+            changed_lookup = ({('gnd', key) for key in changed_keys(old_gnd_index, gnd_to_woman)} |
+                              name_index.changed_lookup_keys(old_name_index))
+            positions = set()
+            for key in changed_lookup:
+                positions |= key_index.get(key, set())
+
+            for position in sorted(positions):
+                old_matches = self.letter_matches[position]
+                new_matches = self.match_letter(self.cmif_letters[position], gnd_to_woman, name_index)
+                if new_matches == old_matches:
+                    continue
+                self.letter_matches[position] = new_matches
+                for slot, (woman_id, role) in enumerate(old_matches):
+                    woman_letters[woman_id].remove((position, slot, role))
+                    affected.add(woman_id)
+                for slot, (woman_id, role) in enumerate(new_matches):
+                    woman_letters.setdefault(woman_id, []).append((position, slot, role))
+                    affected.add(woman_id)
+            affected &= new_ids
+            self.log(f"  Re-matched {len(positions)} letters")
+
+        self.log(f"  Affected women: {len(affected)} of {len(self.women)}")
+        self.stats['incremental'] = {
+            'changed_sources': sorted(changed_sources),
+            'affected_women': len(affected)
+        }
+
+        # Step 6: Phase 2+3 for affected women (rebuilt from scratch)
+        self.year_histograms = state['year_histograms']
+        for person_id in old_women.keys() - new_ids:
+            self.year_histograms.clear(person_id)
+        for person_id in affected:
+            woman_data = self.women[person_id]
+            if woman_data is old_women.get(person_id):
+                woman_data = self.women[person_id] = self.build_woman(person_id, woman_data['gnd'])
+            self.apply_letter_entries(woman_data, woman_letters.get(person_id, []))
+            self.enrich_woman(woman_data)
+
+        # Relationships depend on other persons (names, reverse links): re-resolve for all women
+        results = self.stages.run(('relationship_graph', 'relationships', 'network_metrics', 'network'), self.workers)
+        changed_relationships = results['relationships'] - affected
+        affected |= changed_relationships
+        self.stats['incremental']['affected_women'] = len(affected)
+        self.log(f"  Relationships changed for {len(changed_relationships)} more women")
+        self.build_spatial_index()
+        self.build_text_index()
+        self.test_phase2()
+        self.test_phase3()
+
+        # Step 7: Phase 4 - patch output, reusing entries of unaffected women
+        reuse_entries = {person_id: person for person_id, person in state['persons'].items()
+                         if person_id not in affected}
+        output_data = self.phase4_generate_json(reuse_entries, keep_persons=True)  # The run state stores them
+
+        self.save_run_state(output_data, digests, fingerprints, key_index, woman_letters)
         return output_data
 
     # ============================================================
     # Run Complete Pipeline
     # ============================================================
 
-    def run(self):
-        """Execute complete 4-phase pipeline"""
+    def run(self, incremental=False):
+        """Execute the complete pipeline (all stages, see define_stages)
+
+        With incremental=True, inputs are diffed against the previous run
+        state and only affected women are recomputed (the first run without
+        a state is a full run that records it).
+        """
         self.log("\n" + "="*60)
         self.log("HERDATA PIPELINE - Building visualization dataset")
         self.log("="*60)
 
         start_time = datetime.now()
-
-        # Run all phases
-        self.phase1_identify_women()
-        self.phase2_match_letters()
-        self.phase3_enrich_data()
-        output_data = self.phase4_generate_json()
+        if self.profile:
+            self.profile.start()
+
+        try:
+            if self.cache:
+                pruned = self.cache.prune()
+                if pruned:
+                    self.log(f"Pruned {pruned} table cache entries of deleted sources")
+
+            state = load_state(self.state_file()) if incremental else None
+            if state is not None:
+                previous, current = state['year_histograms'], self.year_histograms
+                if (previous.first_year, previous.last_year) != (current.first_year, current.last_year):
+                    self.log("Year range differs from the last run: full rebuild")
+                    state = None
+            if state is not None:
+                output_data = self.run_incremental(state)
+            elif incremental:
+                output_data = self.run_full_with_state()
+            else:
+                output_data = self.run_stages()
+        finally:
+            if self.profile:
+                self.save_profile()  # Also after a failed stage (metrics up to the failure)
 
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
@@ -620,6 +1314,25 @@ class HerDataPipeline:
 
         return output_data
 
+    def save_profile(self):
+        """Stop profiling and write the metrics JSON (and log where cProfile dumps went)"""
+        self.profile.stop()
+        if self.profile_file:
+            self.profile_file.parent.mkdir(parents=True, exist_ok=True)
+            size = write_profile(self.profile, self.profile_file,
+                                 caches={'tables': self.cache, 'stages': self.stage_cache},
+                                 critical_path=self.stages.critical_path())
+            self.log(f"[OK] Run metrics written to {self.profile_file} ({size / 1024:.1f} KB)")
+        if self.profile.cprofile_dir:
+            self.log(f"[OK] cProfile dumps per stage written to {self.profile.cprofile_dir}")
+        totals = self.profile.totals
+        self.stats['profile'] = {
+            'cpu_time': f"{totals['cpu_s']:.2f} s",
+            'alloc_peak': f"{totals['alloc_peak_mb']:.1f} MB",
+            'slowest_stages': ', '.join(f"{name} ({metrics['wall_s']:.2f} s)" for name, metrics in sorted(
+                self.profile.stages.items(), key=lambda item: -item[1]['wall_s'])[:3])
+        }
+
     def print_summary(self, duration):
         """Print compact summary of all phases"""
         self.log("\n" + "="*60)
@@ -642,6 +1355,21 @@ class HerDataPipeline:
         for key, value in self.stats['phase4'].items():
             self.log(f"  {key}: {value}")
 
+        if 'stages' in self.stats:
+            self.log(f"\nStages:")
+            for key, value in self.stats['stages'].items():
+                self.log(f"  {key}: {value}")
+
+        if 'profile' in self.stats:
+            self.log(f"\nProfile:")
+            for key, value in self.stats['profile'].items():
+                self.log(f"  {key}: {value}")
+
+        if 'incremental' in self.stats:
+            self.log(f"\nIncremental Update:")
+            for key, value in self.stats['incremental'].items():
+                self.log(f"  {key}: {value}")
+
         self.log(f"\nExecution time: {duration:.2f} seconds")
         self.log("\n" + "="*60)
         self.log("[SUCCESS] PIPELINE COMPLETE")
@@ -650,12 +1378,67 @@ class HerDataPipeline:
 
 def main():
     """Run HerData pipeline with default paths"""
+    parser = argparse.ArgumentParser(description="Build HerData visualization dataset")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes for parallel table loads (default: CPU count, 1 = sequential)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Re-parse all SNDB files instead of using the table cache (data/.cache)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Recompute only women affected by input changes since the last incremental run")
+    parser.add_argument('--backend', choices=['etree', 'lxml'], default=None,
+                        help="CMIF XML backend (default: etree, faster for streaming)")
+    parser.add_argument('--shards', action='store_true',
+                        help="Also write sharded output (index, meta, detail shards) to docs/data/shards/")
+    parser.add_argument('--columnar', action='store_true',
+                        help="Also write dictionary-encoded columnar output to docs/data/persons.columnar.json")
+    parser.add_argument('--filters', action='store_true',
+                        help="Also write map filter bitmaps (role, occupation group, year) to docs/data/filters.json")
+    parser.add_argument('--clusters', action='store_true',
+                        help="Also write precomputed map clusters per zoom level to docs/data/clusters.json")
+    parser.add_argument('--locations', action='store_true',
+                        help="Also write the location -> person IDs table to docs/data/locations.json")
+    parser.add_argument('--relationships', action='store_true',
+                        help="Also write the women's relationships to docs/data/relationships.json")
+    parser.add_argument('--text-index', action='store_true',
+                        help="Also write the full-text index over register entries to docs/data/text_index.json")
+    parser.add_argument('--name-search', action='store_true',
+                        help="Also write the prefix/trigram name search index to docs/data/name_search.json")
+    parser.add_argument('--network-backend', choices=['numpy', 'python'], default=None,
+                        help="Network metrics backend (default: numpy if installed, else python)")
+    parser.add_argument('--benchmark-network', action='store_true',
+                        help=f"After the run, time the network build on the relationship graph scaled {BENCHMARK_FACTOR}x")
+    parser.add_argument('--profile', action='store_true',
+                        help="Write per-stage run metrics (time, memory, throughput, cache hits) to docs/data/persons.metrics.json")
+    parser.add_argument('--cprofile', action='store_true',
+                        help="With --profile, also dump cProfile stats per stage to docs/data/profiles/")
+    parser.add_argument('--compact', action='store_true',
+                        help="Write persons.json without indentation")
+    parser.add_argument('--year-range', type=int, nargs=2, metavar=('FIRST', 'LAST'), default=None,
+                        help="Year columns of the letter histograms (default: 1762 1824; other years still count)")
+    args = parser.parse_args()
+
     script_dir = Path(__file__).parent
     data_dir = script_dir.parent / 'data'
     output_file = script_dir.parent / 'docs' / 'data' / 'persons.json'
 
-    pipeline = HerDataPipeline(data_dir, output_file, verbose=True)
-    pipeline.run()
+    pipeline = HerDataPipeline(data_dir, output_file, verbose=True, workers=args.workers,
+                               use_cache=not args.no_cache, cmif_backend=args.backend,
+                               year_range=args.year_range,
+                               shard_dir=output_file.parent / 'shards' if args.shards else None,
+                               columnar_file=output_file.with_suffix('.columnar.json') if args.columnar else None,
+                               compact=args.compact,
+                               filter_file=output_file.parent / 'filters.json' if args.filters else None,
+                               cluster_file=output_file.parent / 'clusters.json' if args.clusters else None,
+                               location_file=output_file.parent / 'locations.json' if args.locations else None,
+                               relationship_file=output_file.parent / 'relationships.json' if args.relationships else None,
+                               network_backend=args.network_backend,
+                               text_index_file=output_file.parent / 'text_index.json' if args.text_index else None,
+                               name_search_file=output_file.parent / 'name_search.json' if args.name_search else None,
+                               profile_file=output_file.with_suffix('.metrics.json') if args.profile else None,
+                               cprofile_dir=output_file.parent / 'profiles' if args.profile and args.cprofile else None)
+    pipeline.run(incremental=args.incremental)
+    if args.benchmark_network:
+        pipeline.benchmark_network()
 
 
 if __name__ == '__main__':
@@ -12,12 +12,58 @@ Run with: python build_herdata_test.py
 """
 
 import json
+import os
+import pickle
+import random
+import re
+import shutil
+import subprocess
 import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
 from pathlib import Path
 from collections import Counter
 
 # Import the pipeline
-from build_herdata import HerDataPipeline
+from build_herdata import (HerDataPipeline, load_person_places, load_place_names,
+                           load_place_coords, load_occupations, SNDB_TABLES)
+from sndb_reader import iter_sndb_items, scan_sndb_items, scan_sndb_range, load_tables
+from table_cache import TableCache
+from run_state import load_state, STATE_VERSION
+from sndb_table import SNDBTable, read_dtd_fields
+from cmif_reader import (iter_cmif_letters, letter_record, get_backend, available_backends,
+                         benchmark_backends, lxml_etree, parse_cmif_range)
+import chunked_reader
+import sndb_reader
+import sndb_table
+from name_index import NameIndex, normalize_name, phonetic_code
+from year_histogram import YearHistograms
+from output_shards import write_shards, load_person, shard_bucket, shard_path
+from columnar_output import (encode_columnar, decode_columnar, write_columnar, read_columnar,
+                             COLUMNAR_FORMAT, COLUMNAR_VERSION)
+import json_writer
+from json_writer import write_persons_json
+from filter_index import (FilterIndex, OCCUPATION_GROUPS, ROLE_VALUES, GROUP_VALUES, matches_filter,
+                          occupation_group, write_filter_index)
+from point_clusters import ClusterPyramid, project, unproject, write_clusters, CLUSTER_RADIUS, TILE_EXTENT
+from spatial_index import SpatialIndex, haversine_km, location_key, key_label, write_locations
+from place_authority import PlaceAuthorities, authority_key
+from stage_graph import StageGraph, StageCache
+import pstats
+from relationship_graph import RelationshipGraph, read_relations, write_relationships
+import network_metrics
+from network_metrics import NetworkMetrics, BENCHMARK_BUDGET_S, benchmark
+from text_index import TextIndex, decode_varints, encode_varints, tokenize, write_text_index
+import name_search
+from name_search import NameSearch, write_name_search
+from chunked_reader import element_ranges, map_ranges
+from analyze_goethe_letters import GoetheCMIFAnalyzer
+from synthetic_corpus import CorpusGenerator
+
+# TEI namespace for CMIF reference lookups
+NS = {'tei': 'http://www.tei-c.org/ns/1.0'}
 
 
 class HerDataTester:
@@ -60,10 +106,14 @@ class HerDataTester:
             output_file = script_dir.parent / 'docs' / 'data' / 'persons_test.json'
 
             pipeline = HerDataPipeline(data_dir, output_file, verbose=False)
-            output_data = pipeline.run()
+            returned = pipeline.run()
 
             self.assert_test(True, "Pipeline executes without exceptions")
-            self.assert_test(output_data is not None, "Pipeline returns output data")
+            self.assert_test(returned is not None and 'meta' in returned, "Pipeline returns output data")
+
+            # The persons were only streamed to the file: later tests check what was written
+            with open(output_file, encoding='utf-8') as f:
+                output_data = json.load(f)
 
             # Cleanup test file
             if output_file.exists():
@@ -485,6 +535,1622 @@ class HerDataTester:
         print(f"    Occupations: {with_occupations}/{total} ({with_occupations/total*100:.1f}%)")
         print(f"    GND: {with_gnd}/{total} ({with_gnd/total*100:.1f}%)")
 
+    # ================================================================
+    # TEST 11: Streaming SNDB Reader
+    # ================================================================
+
+    def test_streaming_reader(self):
+        """Test streaming reader yields the same records as ET.parse"""
+        print("\n[TEST 11] Streaming SNDB Reader")
+        print("-" * 60)
+
+        script_dir = Path(__file__).parent
+        xml_file = script_dir.parent / 'data' / 'SNDB' / 'geo_main.xml'
+
+        expected = [{child.tag: child.text for child in item}
+                    for item in ET.parse(xml_file).getroot().findall('.//ITEM')]
+        streamed = list(iter_sndb_items(xml_file))
+
+        self.assert_test(len(streamed) == len(expected),
+                        f"Streamed record count matches ({len(streamed)} vs {len(expected)})")
+        self.assert_test(streamed == expected, "Streamed records identical to ET.parse")
+
+        # Column projection keeps only requested fields
+        projected = list(iter_sndb_items(xml_file, fields=('ID', 'BEZEICHNUNG')))
+        extra_fields = sum(1 for r in projected if set(r) - {'ID', 'BEZEICHNUNG'})
+        self.assert_test(extra_fields == 0, f"Field projection drops other columns (errors: {extra_fields})")
+
+    # ================================================================
+    # TEST 12: Streaming CMIF Reader
+    # ================================================================
+
+    def test_streaming_cmif_reader(self):
+        """Test streaming CMIF records match tree-based find() lookups"""
+        print("\n[TEST 12] Streaming CMIF Reader")
+        print("-" * 60)
+
+        script_dir = Path(__file__).parent
+        cmif_file = script_dir.parent / 'data' / 'ra-cmif.xml'
+
+        # Reference extraction with the original tree-based lookups
+        expected = []
+        for corresp in ET.parse(cmif_file).getroot().findall('.//tei:correspDesc', NS):
+            letter = {'year': None, 'sender': None, 'mentions': []}
+            sent_action = corresp.find('.//tei:correspAction[@type="sent"]', NS)
+            if sent_action is not None:
+                date_elem = sent_action.find('.//tei:date', NS)
+                if date_elem is not None and date_elem.get('when'):
+                    letter['year'] = int(date_elem.get('when')[:4])
+                sender = sent_action.find('.//tei:persName', NS)
+                if sender is not None:
+                    letter['sender'] = {'ref': sender.get('ref', ''), 'name': sender.text}
+            note = corresp.find('.//tei:note', NS)
+            if note is not None:
+                for ref in note.findall('.//tei:ref[@type="cmif:mentionsPerson"]', NS):
+                    letter['mentions'].append({'ref': ref.get('target', ''), 'name': ref.text})
+            expected.append(letter)
+
+        streamed = list(iter_cmif_letters(cmif_file))
+
+        self.assert_test(len(streamed) == len(expected),
+                        f"Streamed letter count matches ({len(streamed)} vs {len(expected)})")
+        mismatches = sum(1 for a, b in zip(streamed, expected) if a != b)
+        self.assert_test(mismatches == 0, f"Streamed letters identical to tree lookups (errors: {mismatches})")
+
+    # ================================================================
+    # TEST 13: Parallel Table Loading
+    # ================================================================
+
+    def test_parallel_table_loading(self):
+        """Test process-pool table loading matches sequential loading"""
+        print("\n[TEST 13] Parallel Table Loading")
+        print("-" * 60)
+
+        sndb_dir = Path(__file__).parent.parent / 'data' / 'SNDB'
+        tasks = {
+            'places': (load_person_places, sndb_dir / 'pers_koerp_orte.xml'),
+            'place_names': (load_place_names, sndb_dir / 'geo_main.xml'),
+            'place_coords': (load_place_coords, sndb_dir / 'geo_indiv.xml'),
+            'occupations': (load_occupations, sndb_dir / 'pers_koerp_berufe.xml')
+        }
+
+        sequential = load_tables(tasks, workers=1)
+        parallel = load_tables(tasks, workers=4)
+
+        self.assert_test(set(parallel) == set(tasks), "Parallel load returns all tables")
+        self.assert_test(parallel == sequential, "Parallel results identical to sequential")
+
+    # ================================================================
+    # TEST 14: Table Cache
+    # ================================================================
+
+    def test_table_cache(self):
+        """Test table cache hits, content-hash revalidation and eviction"""
+        print("\n[TEST 14] Table Cache")
+        print("-" * 60)
+
+        sndb_dir = Path(__file__).parent.parent / 'data' / 'SNDB'
+        tmp_dir = Path(tempfile.mkdtemp())
+        try:
+            xml_file = tmp_dir / 'geo_indiv.xml'
+            shutil.copy(sndb_dir / 'geo_indiv.xml', xml_file)
+            cache = TableCache(tmp_dir / 'cache', modules=(sndb_table, sndb_reader))
+
+            self.assert_test(cache.get(load_place_coords, xml_file) is None, "Cold cache misses")
+            table = load_place_coords(xml_file)
+            cache.put(load_place_coords, xml_file, table)
+            self.assert_test(cache.get(load_place_coords, xml_file) == table, "Warm cache returns parsed table")
+
+            # An entry written by another process hits (the key must not depend on the process)
+            cache.evict(cache.entry_path(load_place_coords, xml_file))
+            writer = ("import sys, sndb_reader, sndb_table; from pathlib import Path; "
+                      "from build_herdata import load_place_coords; from table_cache import TableCache; "
+                      "xml_file = Path(sys.argv[1]); "
+                      "TableCache(sys.argv[2], modules=(sndb_table, sndb_reader))"
+                      ".put(load_place_coords, xml_file, load_place_coords(xml_file))")
+            subprocess.run([sys.executable, '-c', writer, str(xml_file), str(tmp_dir / 'cache')],
+                           cwd=Path(__file__).parent, check=True)
+            fresh_hit = cache.get(load_place_coords, xml_file) == table
+            other_code = TableCache(tmp_dir / 'cache', modules=(sndb_table,)).get(load_place_coords, xml_file)
+            self.assert_test(fresh_hit and other_code is None,
+                            "Entry from a fresh process hits; other parsing code misses")
+            cache.put(load_place_coords, xml_file, table)
+
+            # New mtime, same content: still a hit (content hash matches)
+            stat = xml_file.stat()
+            os.utime(xml_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            self.assert_test(cache.get(load_place_coords, xml_file) == table, "Touched file revalidated by content hash")
+
+            # Changed content: stale entry evicted
+            with open(xml_file, 'a', encoding='utf-8') as f:
+                f.write('\n')
+            self.assert_test(cache.get(load_place_coords, xml_file) is None, "Changed file invalidates entry")
+            self.assert_test(not list((tmp_dir / 'cache').glob('*.pkl')), "Stale entry evicted from disk")
+
+            # Entries for deleted sources are pruned; stage results and run states are kept
+            cache.put(load_place_coords, xml_file, table)
+            for other in ('stage-women-0123456789abcdef01234567.pkl', 'run_state-persons.pkl'):
+                (tmp_dir / 'cache' / other).write_bytes(pickle.dumps({}))
+            xml_file.unlink()
+            self.assert_test(cache.prune() == 1 and len(list((tmp_dir / 'cache').glob('*.pkl'))) == 2,
+                            "Prune removes entries of deleted sources only")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # ================================================================
+    # TEST 15: Incremental Rebuild
+    # ================================================================
+
+    def test_incremental_rebuild(self):
+        """Test incremental runs produce the same output as full rebuilds"""
+        print("\n[TEST 15] Incremental Rebuild")
+        print("-" * 60)
+
+        tmp_dir = Path(tempfile.mkdtemp())
+        try:
+            data_dir = tmp_dir / 'data'
+            shutil.copytree(Path(__file__).parent.parent / 'data', data_dir,
+                            ignore=shutil.ignore_patterns('.cache'))
+
+            def build(incremental, year_range=None):
+                output_file = tmp_dir / ('incremental.json' if incremental else 'full.json')
+                pipeline = HerDataPipeline(data_dir, output_file, verbose=False, workers=1, year_range=year_range,
+                                           keep_persons=True)
+                output_data = pipeline.run(incremental=incremental)
+                output_data['meta'].pop('generated')
+                return pipeline, output_data
+
+            # Unusable states are ignored: truncated, classes that no longer exist, not a state at all
+            state_file = tmp_dir / 'run_state.pkl'
+            unusable = []
+            for content in (pickle.dumps({'version': STATE_VERSION})[:-3], b'cno_such_module\nRunState\n.',
+                            b'cos\nno_such_function\n.', pickle.dumps(['not', 'a', 'state'])):
+                state_file.write_bytes(content)
+                unusable.append(load_state(state_file))
+            self.assert_test(unusable == [None] * 4, "Truncated, unimportable and foreign states load as None")
+
+            build(True)  # First incremental run records the state
+            pipeline, incremental_output = build(True)
+            self.assert_test(incremental_output == build(False)[1], "Unchanged inputs: incremental equals full build")
+            self.assert_test(pipeline.stats['incremental']['affected_women'] == 0, "Unchanged inputs: no women recomputed")
+
+            # SNDB change: two persons swap SEXUS, one place moves
+            indiv_file = data_dir / 'SNDB' / 'pers_koerp_indiv.xml'
+            indiv_text = (indiv_file.read_text(encoding='utf-8')
+                          .replace('<SEXUS>m</SEXUS>', '<SEXUS>?</SEXUS>', 1)
+                          .replace('<SEXUS>w</SEXUS>', '<SEXUS>m</SEXUS>', 1)
+                          .replace('<SEXUS>?</SEXUS>', '<SEXUS>w</SEXUS>', 1))
+            indiv_file.write_text(indiv_text, encoding='utf-8')
+            geo_file = data_dir / 'SNDB' / 'geo_indiv.xml'
+            geo_text = geo_file.read_text(encoding='utf-8')
+            start = geo_text.index('<LATITUDE>')
+            end = geo_text.index('</LATITUDE>', start)
+            geo_file.write_text(geo_text[:start] + '<LATITUDE>10.5' + geo_text[end:], encoding='utf-8')
+
+            pipeline, incremental_output = build(True)
+            self.assert_test(incremental_output == build(False)[1], "SNDB change: incremental equals full build")
+            affected = pipeline.stats['incremental']['affected_women']
+            self.assert_test(0 < affected < len(pipeline.women) / 10, f"SNDB change: only affected women recomputed ({affected})")
+
+            # CMIF change: first letter removed
+            cmif_file = data_dir / 'ra-cmif.xml'
+            cmif_text = cmif_file.read_text(encoding='utf-8')
+            start = cmif_text.index('<correspDesc')
+            end = cmif_text.index('</correspDesc>', start) + len('</correspDesc>')
+            cmif_file.write_text(cmif_text[:start] + cmif_text[end:], encoding='utf-8')
+
+            pipeline, incremental_output = build(True)
+            self.assert_test(incremental_output == build(False)[1], "CMIF change: incremental equals full build")
+
+            # Other --year-range: the histograms of the state have other columns, so the run is a full one
+            pipeline, incremental_output = build(True, (1780, 1800))
+            full_run = 'incremental' not in pipeline.stats
+            columns = (pipeline.year_histograms.first_year, pipeline.year_histograms.last_year)
+            pipeline, _ = build(True, (1780, 1800))
+            self.assert_test(incremental_output == build(False, (1780, 1800))[1] and full_run and columns == (1780, 1800)
+                             and pipeline.stats['incremental']['affected_women'] == 0,
+                            "Year range change: full rebuild with the new range, then incremental again")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # ================================================================
+    # TEST 16: Columnar SNDB Table
+    # ================================================================
+
+    def test_sndb_table(self):
+        """Test SNDBTable columns and ID index against streamed records"""
+        print("\n[TEST 16] Columnar SNDB Table")
+        print("-" * 60)
+
+        xml_file = Path(__file__).parent.parent / 'data' / 'SNDB' / 'pers_koerp_orte.xml'
+        records = list(iter_sndb_items(xml_file))
+        table = SNDBTable.load(xml_file)
+
+        self.assert_test(read_dtd_fields(xml_file) == ('ID', 'LFDNR', 'ORT', 'ART', 'SNDB_ID'),
+                        "Field set read from inline DTD")
+        self.assert_test(list(table) == records, f"Table rows identical to streamed records ({len(table)} rows)")
+
+        # One-to-many lookup by ID
+        by_id = {}
+        for record in records:
+            by_id.setdefault(record['ID'], []).append(record)
+        mismatches = sum(1 for person_id, rows in by_id.items() if table.records(person_id) != rows)
+        self.assert_test(mismatches == 0, f"ID index groups all rows per person (errors: {mismatches})")
+        self.assert_test(table.first('no-such-id') is None and 'no-such-id' not in table, "Missing ID returns no rows")
+
+        # Dictionary encoding: repeated values stored once
+        distinct_types = len(table.values['ART']) - 1
+        self.assert_test(distinct_types < 20, f"Place types dictionary-encoded ({distinct_types} distinct values)")
+
+    # ================================================================
+    # TEST 17: Fast SNDB Scanner
+    # ================================================================
+
+    def test_fast_scanner(self):
+        """Test scan_sndb_items against the ElementTree reader"""
+        print("\n[TEST 17] Fast SNDB Scanner")
+        print("-" * 60)
+
+        import time
+
+        sndb_dir = Path(__file__).parent.parent / 'data' / 'SNDB'
+
+        # Differential: every SNDB export, all DTD fields
+        mismatched = []
+        for xml_file in sorted(sndb_dir.glob('*.xml')):
+            fields = read_dtd_fields(xml_file)
+            expected = [tuple(record.get(field) for field in fields) for record in iter_sndb_items(xml_file)]
+            if list(scan_sndb_items(xml_file)) != expected:
+                mismatched.append(xml_file.name)
+        self.assert_test(not mismatched, f"Scanner identical to ElementTree on all exports (mismatches: {mismatched})")
+
+        # Field subset in non-DTD order
+        xml_file = sndb_dir / 'pers_koerp_orte.xml'
+        fields = ('SNDB_ID', 'ID')
+        expected = [tuple(record.get(field) for field in fields) for record in iter_sndb_items(xml_file)]
+        self.assert_test(list(scan_sndb_items(xml_file, fields)) == expected, "Field subset returned in requested order")
+
+        # Items outside the flat shape fall back to ElementTree, in file order
+        irregular = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<!DOCTYPE T [\n<!ELEMENT T (ITEM)*>\n<!ELEMENT ITEM (ID, NAME?, NOTE?)>\n]>\n<T>\n'
+            '<ITEM num="1"><ID>1</ID><NAME>A &amp; B &#228;</NAME></ITEM>\n'
+            '<ITEM num="2"><ID>2</ID><NAME lang="de">attr</NAME></ITEM>\n'
+            '<!-- comment --><ITEM num="3"><NAME>order</NAME><ID>3</ID></ITEM>\n'
+            '<ITEM num="4"><ID>4</ID><NAME><![CDATA[x < y]]></NAME><NOTE></NOTE></ITEM>\n'
+            '<ITEM num="5"><ID>5</ID><NOTE>line\r\nbreak</NOTE></ITEM>\n'
+            '<ITEM num="6"><ID>6</ID><NAME>nested <b>b</b></NAME></ITEM>\n'
+            '</T>\n'
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            xml_file = Path(tmp) / 'irregular.xml'
+            xml_file.write_bytes(irregular.encode('utf-8'))
+            fields = ('ID', 'NAME', 'NOTE')
+            expected = [tuple(record.get(field) for field in fields) for record in iter_sndb_items(xml_file)]
+            scanned = list(scan_sndb_items(xml_file))
+        self.assert_test(scanned == expected and len(scanned) == 6,
+                        f"Irregular items match ElementTree ({len(scanned)} items)")
+
+        # Throughput on the largest export
+        xml_file = max(sndb_dir.glob('*.xml'), key=lambda path: path.stat().st_size)
+        start = time.perf_counter()
+        for _ in iter_sndb_items(xml_file):
+            pass
+        tree_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in scan_sndb_items(xml_file):
+            pass
+        scan_time = time.perf_counter() - start
+        self.assert_test(scan_time < tree_time,
+                        f"Scanner faster than iterparse on {xml_file.name} ({tree_time / scan_time:.1f}x)")
+
+    # ================================================================
+    # TEST 18: CMIF Parser Backends
+    # ================================================================
+
+    def test_cmif_backends(self):
+        """Test lxml/ElementTree backends give identical CMIF results"""
+        print("\n[TEST 18] CMIF Parser Backends")
+        print("-" * 60)
+
+        cmif_file = Path(__file__).parent.parent / 'data' / 'ra-cmif.xml'
+        backends = available_backends()
+
+        expected_default = 'lxml' if lxml_etree is not None else 'etree'
+        try:
+            get_backend('sax')
+            rejects_unknown = False
+        except ValueError:
+            rejects_unknown = True
+        self.assert_test(get_backend().name == expected_default and get_backend(streaming=True).name == 'etree'
+                         and rejects_unknown,
+                        f"Default backend is {expected_default}, etree for streaming (available: {', '.join(backends)})")
+
+        # Streaming and lookup-based letter records agree for every backend
+        reference = list(iter_cmif_letters(cmif_file, 'etree'))
+        mismatched = []
+        for name in backends:
+            backend = get_backend(name)
+            looked_up = [letter_record(backend, corresp)
+                         for corresp in backend.findall(backend.parse(cmif_file), 'correspDesc')]
+            if list(iter_cmif_letters(cmif_file, backend)) != reference or looked_up != reference:
+                mismatched.append(name)
+        self.assert_test(not mismatched, f"Letter records identical across backends (mismatches: {mismatched})")
+
+        # Analyzer results per backend
+        summaries = {}
+        for name in backends:
+            analyzer = GoetheCMIFAnalyzer(cmif_file, name, verbose=False)
+            analyzer.analyze()
+            summaries[name] = (analyzer.senders, analyzer.places, analyzer.dates, analyzer.date_ranges,
+                               analyzer.mentioned_persons, analyzer.mentioned_bibls, analyzer.mentioned_orgs,
+                               analyzer.languages, analyzer.has_tei_file, analyzer.text_base_types)
+        reference_summary = summaries['etree']
+        self.assert_test(all(summary == reference_summary for summary in summaries.values())
+                         and len(reference_summary[0]) > 0,
+                        f"Analyzer results identical across backends ({len(reference_summary[0])} senders)")
+
+        # Benchmark covers every backend
+        results = benchmark_backends(cmif_file)
+        for name, result in results.items():
+            print(f"    {name}: {result['letters_per_s']:,} letters/s streamed, {result['parse_s']:.2f}s parse + lookups")
+        self.assert_test(sorted(results) == sorted(backends)
+                         and all(result['letters'] == len(reference) for result in results.values()),
+                        f"Benchmark ran on {len(results)} backend(s)")
+
+    # ================================================================
+    # TEST 19: Chunked Parallel Parsing
+    # ================================================================
+
+    def test_chunked_parsing(self):
+        """Test byte-range chunks merge to the same results as one-piece parsing"""
+        print("\n[TEST 19] Chunked Parallel Parsing")
+        print("-" * 60)
+
+        data_dir = Path(__file__).parent.parent / 'data'
+        sndb_file = data_dir / 'SNDB' / 'pers_koerp_orte.xml'
+        cmif_file = data_dir / 'ra-cmif.xml'
+
+        # Ranges are contiguous and start at element boundaries
+        ranges, namespaces = element_ranges(sndb_file, 'ITEM', 4)
+        content = sndb_file.read_bytes()
+        aligned = all(content[start:start + 5] == b'<ITEM' for start, _ in ranges)
+        contiguous = all(ranges[i][1] == ranges[i + 1][0] for i in range(len(ranges) - 1))
+        self.assert_test(len(ranges) == 4 and aligned and contiguous and namespaces == b'',
+                        f"SNDB split into {len(ranges)} ITEM-aligned ranges")
+
+        chunked = [row for rows in map_ranges(scan_sndb_range, sndb_file, ranges, None, workers=2) for row in rows]
+        self.assert_test(chunked == list(scan_sndb_items(sndb_file)),
+                        f"Chunked SNDB scan equals one-piece scan ({len(chunked)} rows)")
+
+        ranges, namespaces = element_ranges(cmif_file, 'correspDesc', 4)
+        chunked = [letter for letters in map_ranges(parse_cmif_range, cmif_file, ranges, namespaces, 'etree',
+                                                    workers=2)
+                   for letter in letters]
+        self.assert_test(b'tei-c.org' in namespaces and chunked == list(iter_cmif_letters(cmif_file, 'etree')),
+                        f"Chunked CMIF letters equal streamed letters ({len(chunked)} letters)")
+
+        # Consumers: force chunking regardless of file size
+        min_bytes = chunked_reader.CHUNK_MIN_BYTES
+        chunked_reader.CHUNK_MIN_BYTES = 0
+        try:
+            whole = GoetheCMIFAnalyzer(cmif_file, 'etree', verbose=False)
+            whole.analyze()
+            parts = GoetheCMIFAnalyzer(cmif_file, 'etree', workers=3, verbose=False)
+            parts.analyze()
+            self.assert_test(parts.chunks == 3 and parts.results() == whole.results(),
+                            f"Analyzer results merged from {parts.chunks} chunks equal full parse")
+
+            table = load_person_places(sndb_file, workers=3)
+        finally:
+            chunked_reader.CHUNK_MIN_BYTES = min_bytes
+        self.assert_test(table == load_person_places(sndb_file), "Chunked table load equals sequential load")
+
+        # Chunked streaming holds only the ranges in flight, not all letters
+        tracemalloc.start()
+        letters = list(iter_cmif_letters(cmif_file, 'etree'))
+        all_letters = tracemalloc.get_traced_memory()[0]
+        del letters
+        tracemalloc.stop()
+        settings = chunked_reader.CHUNK_MIN_BYTES, chunked_reader.RANGE_MAX_BYTES
+        chunked_reader.CHUNK_MIN_BYTES, chunked_reader.RANGE_MAX_BYTES = 0, 128 << 10
+        try:
+            ranges = chunked_reader.range_count(cmif_file, 4)
+            tracemalloc.start()
+            streamed = sum(1 for _ in iter_cmif_letters(cmif_file, 'etree', workers=4))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            chunked_reader.CHUNK_MIN_BYTES, chunked_reader.RANGE_MAX_BYTES = settings
+            tracemalloc.stop()
+        self.assert_test(streamed == len(chunked) and ranges > 4 and peak < 0.5 * all_letters,
+                        f"Chunked CMIF stream in {ranges} ranges peaks at {peak / 1e6:.1f} MB "
+                        f"(all letters: {all_letters / 1e6:.1f} MB)")
+
+    # ================================================================
+    # TEST 20: Fuzzy Name Index
+    # ================================================================
+
+    def test_name_index(self, pipeline):
+        """Test name normalization, phonetic blocking and fuzzy fallback lookups"""
+        print("\n[TEST 20] Fuzzy Name Index")
+        print("-" * 60)
+
+        self.assert_test(normalize_name('Gräfin Charlotte von Stein') == normalize_name('Stein, Charlotte')
+                         and normalize_name('Luise Straße') == 'luise strasse',
+                        "Normalization folds diacritics, ß, titles and name-part order")
+        self.assert_test(phonetic_code('mueller') == phonetic_code('müller'.replace('ü', 'u')) == phonetic_code('miller')
+                         and phonetic_code('meier') == phonetic_code('mayr'),
+                        "Kölner Phonetik groups spelling variants")
+
+        # One dropped letter per name: resolved to the same woman
+        index = NameIndex()
+        names = ['Charlotte von Stein', 'Christiane Vulpius', 'Bettina von Arnim', 'Corona Schröter',
+                 'Sophie von La Roche', 'Johanna Schopenhauer', 'Marianne von Willemer', 'Anna Amalia',
+                 'Caroline Herder', 'Friederike Brion', 'Charlotte Buff', 'Lili Schönemann',
+                 'Rahel Varnhagen', 'Caroline Schlegel', 'Luise von Göchhausen', 'Henriette von Egloffstein',
+                 'Ulrike von Levetzow', 'Minna Herzlieb', 'Cornelia Schlosser', 'Katharina Elisabeth Goethe']
+        for number, name in enumerate(names):
+            index.add(f"w{number}", name)
+        resolved = candidates = 0
+        for number, name in enumerate(names):
+            typo = name[:-3] + name[-2:]
+            candidates += len(index.candidates(normalize_name(typo)))
+            resolved += index.lookup(typo) == f"w{number}"
+        self.assert_test(resolved == len(names) and index.hits['fuzzy'] == len(names),
+                        f"Misspelled names found via fuzzy tier ({resolved}/{len(names)})")
+        self.assert_test(candidates / len(names) < 0.5 * len(names),
+                        f"Blocking limits comparisons ({candidates / len(names):.1f} candidates per query)")
+
+        # Pipeline index: display names and variant forms (LFDNR > 0) of every woman
+        _, name_index = pipeline.build_match_indexes()
+        missing = sum(1 for woman_id in pipeline.women
+                      for variant in pipeline.name_variants(woman_id)
+                      if woman_id not in name_index.normalized.get(normalize_name(variant), ()))
+        variants = sum(len(pipeline.name_variants(woman_id)) for woman_id in pipeline.women)
+        self.assert_test(missing == 0 and len(name_index.exact) > 0,
+                        f"Variant name forms indexed ({variants} variants, missing: {missing})")
+
+        # Ambiguous normalized names are rejected
+        index = NameIndex()
+        index.add('a', 'Anna Schmidt')
+        index.add('b', 'Schmidt, Anna')
+        self.assert_test(index.lookup('Anna Schmidt') == 'a' and index.lookup('Schmidt Anna') is None,
+                        "Exact tier keeps original behavior; ambiguous normalized names give no match")
+
+        # Men are competitors: a male name never resolves to a female near-namesake
+        index = NameIndex()
+        pairs = [('Johanna Schopenhauer', 'Johann Schopenhauer'), ('Wilhelmine Herzlieb', 'Wilhelm Herzlieb'),
+                 ('Louise Seidler', 'Louis Seidler')]
+        for number, (woman, man) in enumerate(pairs):
+            index.add(f"w{number}", woman)
+            index.add(f"m{number}", man, woman=False)
+        self.assert_test(all(index.lookup(man) is None and index.lookup(f"{man[:-2]}{man[-1]}") is None
+                             and index.lookup(woman) == f"w{number}"
+                             for number, (woman, man) in enumerate(pairs)),
+                        "Male names (and their misspellings) do not match female near-namesakes")
+
+        # Pipeline: non-women's names and non-women's GNDs never resolve to a woman
+        gnd_to_woman, name_index = pipeline.build_match_indexes()
+        men = [person_id for person_id in pipeline.tables['names'].keys() if person_id not in pipeline.women]
+        wrong = [person_id for person_id in men
+                 if pipeline.person_name(person_id).lower() not in name_index.exact
+                 and name_index.resolve(pipeline.person_name(person_id))[1] is not None]
+        woman_id, woman = next((woman_id, woman) for woman_id, woman in pipeline.women.items() if woman.get('gnd'))
+        man_gnd = next(gnd for gnd, person in gnd_to_woman.items() if person is None)
+        self.assert_test(not wrong and pipeline.match_woman(f"http://d-nb.info/gnd/{man_gnd}", woman['name'],
+                                                            gnd_to_woman, name_index) is None
+                         and pipeline.match_woman(f"http://d-nb.info/gnd/{woman['gnd']}", 'x', gnd_to_woman,
+                                                  name_index) == woman_id,
+                        f"{len(men)} other persons never resolve to a woman; a non-woman GND skips name matching")
+
+        # A woman without GND in SNDB, cited with a GND that SNDB does not know: matched by name
+        unknown_gnd = 'http://d-nb.info/gnd/0000000-0'
+        without_gnd = [(woman_id, woman) for woman_id, woman in pipeline.women.items()
+                       if not woman.get('gnd') and name_index.lookup(woman['name']) == woman_id]
+        cited = sum(1 for letter in iter_cmif_letters(pipeline.data_dir / 'ra-cmif.xml')
+                    for ref in ([letter['sender']] if letter['sender'] else []) + letter['mentions']
+                    if pipeline.extract_gnd_id(ref['ref']) and pipeline.extract_gnd_id(ref['ref']) not in gnd_to_woman
+                    and pipeline.match_woman(ref['ref'], ref['name'], gnd_to_woman, name_index))
+        keys = pipeline.letter_keys({'sender': {'ref': unknown_gnd, 'name': without_gnd[0][1]['name']}, 'mentions': []})
+        self.assert_test(without_gnd and all(pipeline.match_woman(unknown_gnd, woman['name'], gnd_to_woman, name_index)
+                                             == woman_id for woman_id, woman in without_gnd)
+                         and ('name', without_gnd[0][1]['name'].lower()) in keys,
+                        f"Unknown GNDs fall back to the name ({len(without_gnd)} women without GND; "
+                        f"{cited} CMIF references with a GND unknown to SNDB matched)")
+
+    # ================================================================
+    # TEST 21: Year Histograms
+    # ================================================================
+
+    def test_year_histograms(self, pipeline, output_data):
+        """Test per-woman year histograms and the timelines aggregated from them"""
+        print("\n[TEST 21] Year Histograms")
+        print("-" * 60)
+
+        # Histograms against plain per-woman year lists (incl. years outside the range)
+        letters = {'a': [1790, 1790, 1801, 1700], 'b': [1762, 1824, 1830, 1801], 'c': []}
+        histograms = YearHistograms((1762, 1824))
+        for woman_id, years in letters.items():
+            for year in years:
+                histograms.add(woman_id, year)
+        all_years = Counter(year for years in letters.values() for year in years)
+        self.assert_test(all(histograms.counts(woman_id) == Counter(years) for woman_id, years in letters.items())
+                         and histograms.years('a') == [1700, 1790, 1801],
+                        "Per-woman counts and distinct years equal raw year lists")
+        self.assert_test(histograms.totals() == all_years
+                         and histograms.timeline(['a']) == [{'year': year, 'count': count}
+                                                            for year, count in sorted(Counter(letters['a']).items())],
+                        "Timeline column sums include out-of-range years exactly")
+
+        histograms.clear('a')
+        self.assert_test(histograms.counts('a') == {} and histograms.totals() == Counter(letters['b'])
+                         and len(histograms.matrix) == len(histograms.rows) * histograms.width,
+                        f"Cleared rows stay allocated ({histograms.width} x 4 bytes per woman)")
+
+        # Pipeline: one row per woman with dated letters; meta timelines consistent
+        timeline = {entry['year']: entry['count'] for entry in output_data['meta']['timeline']}
+        by_role = Counter()
+        for role_timeline in output_data['meta']['timeline_by_role'].values():
+            by_role.update({entry['year']: entry['count'] for entry in role_timeline})
+        self.assert_test(by_role == timeline and set(output_data['meta']['timeline_by_role']) <= {'sender', 'mentioned', 'both'},
+                        f"Role timelines sum to the overall timeline ({sum(timeline.values())} letter matches)")
+
+        person_years = all(set(person['letter_years']) <= timeline.keys()
+                           for person in output_data['persons'] if 'letter_years' in person)
+        by_occupation = pipeline.timeline_by_occupation()
+        bounded = all(entry['count'] <= timeline[entry['year']]
+                      for occupation_timeline in by_occupation.values() for entry in occupation_timeline)
+        self.assert_test(person_years and bounded and len(by_occupation) > 0,
+                        f"Person years and {len(by_occupation)} occupation timelines within the overall timeline")
+
+    # ================================================================
+    # TEST 22: Sharded Output
+    # ================================================================
+
+    def test_sharded_output(self, output_data):
+        """Test index, meta and detail shards against the single-file output"""
+        print("\n[TEST 22] Sharded Output")
+        print("-" * 60)
+
+        shard_dir = Path(tempfile.mkdtemp(prefix='herdata_shards_'))
+        try:
+            sizes = write_shards(output_data, shard_dir, buckets=16)
+            with open(shard_dir / 'index.json', encoding='utf-8') as f:
+                index = json.load(f)
+            with open(shard_dir / 'meta.json', encoding='utf-8') as f:
+                meta = json.load(f)
+
+            persons = output_data['persons']
+            first_places = all(entry.get('places') == person.get('places', [])[:1] or 'places' not in person
+                                for entry, person in zip(index['persons'], persons))
+            self.assert_test([entry['id'] for entry in index['persons']] == [person['id'] for person in persons]
+                             and first_places and 'sndb_url' not in index['persons'][0],
+                            f"Index lists all {len(index['persons'])} persons with their first place")
+            self.assert_test(meta['timeline'] == output_data['meta']['timeline'] and meta['shards']['buckets'] == 16,
+                            f"Meta shard carries timeline and layout ({sizes['meta.json'] / 1024:.1f} KB)")
+
+            # Every person is in the bucket its ID hashes to, unchanged
+            details = {}
+            for bucket in range(16):
+                with open(shard_dir / shard_path(16, bucket), encoding='utf-8') as f:
+                    shard = json.load(f)['persons']
+                if any(shard_bucket(person_id, 16) != bucket for person_id in shard):
+                    break
+                details.update(shard)
+            largest = max(size for path, size in sizes.items() if path.startswith('persons/'))
+            self.assert_test(details == {person['id']: person for person in persons}
+                             and load_person(shard_dir, persons[0]['id']) == persons[0],
+                            f"Detail shards round-trip every person (largest {largest // 1024} KB)")
+
+            # Fewer buckets: stale detail shards are removed
+            write_shards(output_data, shard_dir, buckets=4)
+            single_file = len(json.dumps(output_data, ensure_ascii=False, indent=2).encode('utf-8'))
+            detail = max(path.stat().st_size for path in (shard_dir / 'persons').glob('*.json'))
+            self.assert_test(len(list((shard_dir / 'persons').glob('*.json'))) == 4
+                             and sizes['meta.json'] * 10 < single_file and detail * 2 < single_file,
+                            f"Timeline and detail pages load a fraction of the {single_file // 1024} KB single file")
+        finally:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+
+    # ================================================================
+    # TEST 23: Columnar Output
+    # ================================================================
+
+    def test_columnar_output(self, output_data):
+        """Test the dictionary-encoded columnar format against the JSON output"""
+        print("\n[TEST 23] Columnar Output")
+        print("-" * 60)
+
+        temp_dir = Path(tempfile.mkdtemp(prefix='herdata_columnar_'))
+        try:
+            columnar_file = temp_dir / 'persons.columnar.json'
+            size = write_columnar(output_data, columnar_file)
+            decoded = read_columnar(columnar_file)
+            self.assert_test(decoded == output_data,
+                            f"Round trip reproduces all {len(decoded['persons'])} persons and meta")
+
+            single_file = len(json.dumps(output_data, ensure_ascii=False, indent=2).encode('utf-8'))
+            with open(columnar_file, encoding='utf-8') as f:
+                data = json.load(f)
+            self.assert_test(size * 3 < single_file and data['schema']['version'] == 1
+                             and len(data['strings']['role']) <= 4,
+                            f"Columnar file {size // 1024} KB vs. {single_file // 1024} KB JSON, with schema header")
+
+            # Non-integer IDs, custom URLs and unknown fields still round-trip
+            sample = {'meta': {}, 'persons': [
+                {'id': 'A-7', 'name': 'Test', 'role': 'indirect', 'normierung': 'sndb', 'sndb_url': 'https://example.org/7',
+                 'relationships': [{'target': 'A-8'}]},
+                {'id': '0012', 'name': 'Test 2', 'role': 'sender', 'normierung': 'gnd', 'sndb_url': 'x', 'gnd': '1',
+                 'letter_years': [1790, 1801], 'dates': {'death': '1800'},
+                 'places': [{'name': 'Weimar', 'lat': None, 'lon': 11.3, 'type': 'Wirkungsort'}]}
+            ]}
+            encoded = json.loads(json.dumps(encode_columnar(sample)))
+            self.assert_test(decode_columnar(encoded) == sample and encoded['schema']['columns']['id']['type'] == 'string',
+                            "Edge cases round-trip (string IDs, URL exceptions, extra fields, missing coordinates)")
+
+            encoded['schema']['version'] = 99
+            try:
+                decode_columnar(encoded)
+                rejected = False
+            except ValueError:
+                rejected = True
+            self.assert_test(rejected, "Unknown schema version is rejected")
+
+            # The frontend decoder must follow format, version and columns
+            columnar_js = (Path(__file__).parent.parent / 'docs' / 'js' / 'columnar.js').read_text(encoding='utf-8')
+            js_format = re.search(r"const COLUMNAR_FORMAT = '([^']+)';", columnar_js).group(1)
+            js_version = int(re.search(r"const COLUMNAR_VERSION = (\d+);", columnar_js).group(1))
+            unread = [name for name in data['columns']
+                      if f"columns.{name}" not in columnar_js and f"'{name}'" not in columnar_js]
+            self.assert_test(js_format == COLUMNAR_FORMAT and js_version == COLUMNAR_VERSION and not unread,
+                            f"docs/js/columnar.js reads {js_format} version {js_version}", f"unread columns: {unread}")
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    # ================================================================
+    # TEST 24: Streaming JSON Writer
+    # ================================================================
+
+    def test_streaming_json_writer(self, pipeline, output_data):
+        """Test streamed persons.json against json.dump and the compact pipeline mode"""
+        print("\n[TEST 24] Streaming JSON Writer")
+        print("-" * 60)
+
+        temp_dir = Path(tempfile.mkdtemp(prefix='herdata_json_'))
+        try:
+            encoders = ['json'] + (['orjson'] if json_writer.orjson is not None else [])
+            output_file = temp_dir / 'persons.json'
+            identical = []
+            for compact in (False, True):
+                expected = (json.dumps(output_data, ensure_ascii=False, separators=(',', ':')) if compact
+                            else json.dumps(output_data, ensure_ascii=False, indent=2)).encode('utf-8')
+                for encoder in encoders:
+                    count = write_persons_json(output_file, output_data['meta'], iter(output_data['persons']),
+                                               compact=compact, encoder=encoder)
+                    identical.append(output_file.read_bytes() == expected and count == len(output_data['persons']))
+            # Small and large floats (orjson: 0.000041 / 1e-6, json: 4.1e-05 / 1e-06) and look-alikes in strings
+            edge = {'id': 'x 1e-6 0.00001 "2e5"',
+                    'network': {'betweenness': 4.1e-05, 'pagerank': -2.5e-07, 'degree': 1e16, 'size': 0.0001}}
+            for compact in (False, True):
+                expected = json.dumps({'meta': {}, 'persons': [edge]}, ensure_ascii=False,
+                                      **({'separators': (',', ':')} if compact else {'indent': 2})).encode('utf-8')
+                for encoder in encoders:
+                    write_persons_json(output_file, {}, iter([edge]), compact=compact, encoder=encoder)
+                    identical.append(output_file.read_bytes() == expected)
+            self.assert_test(all(identical),
+                            f"Streamed output byte-identical to json.dump (encoders: {', '.join(encoders)}; indent and compact)")
+
+            empty = []
+            for encoder in encoders:
+                write_persons_json(output_file, {}, iter([]), encoder=encoder)
+                with open(output_file, encoding='utf-8') as f:
+                    empty.append(json.load(f) == {'meta': {}, 'persons': []})
+            try:
+                write_persons_json(output_file, {}, [], encoder='simplejson')
+                rejected = False
+            except ValueError:
+                rejected = True
+            self.assert_test(all(empty) and rejected, "Empty person list is valid JSON; unknown encoder rejected")
+
+            # Compact pipeline output: same data, smaller file
+            data_dir = Path(__file__).parent.parent / 'data'
+            compact_file = temp_dir / 'persons_compact.json'
+            compact_run = HerDataPipeline(data_dir, compact_file, verbose=False, compact=True, keep_persons=True)
+            compact_data = compact_run.run()
+            with open(compact_file, encoding='utf-8') as f:
+                loaded = json.load(f)
+            indented_size = len(json.dumps(output_data, ensure_ascii=False, indent=2).encode('utf-8'))
+            self.assert_test(loaded == compact_data and loaded['persons'] == output_data['persons']
+                             and compact_file.stat().st_size < 0.8 * indented_size,
+                            f"Compact mode: {compact_file.stat().st_size // 1024} KB vs. {indented_size // 1024} KB indented")
+
+            # Without an output that needs them, person entries are streamed and not kept
+            def phase4_peak(keep_persons):
+                tracemalloc.start()
+                data = pipeline.phase4_generate_json(keep_persons=keep_persons)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                return data, peak
+
+            default_file, pipeline.output_file = pipeline.output_file, temp_dir / 'persons_streamed.json'
+            try:
+                streamed, streamed_peak = phase4_peak(False)
+                kept, kept_peak = phase4_peak(True)
+                with open(pipeline.output_file, encoding='utf-8') as f:
+                    written = json.load(f)['persons']
+            finally:
+                pipeline.output_file = default_file
+            self.assert_test('persons' not in streamed and not pipeline.keeps_persons() and written == output_data['persons']
+                             and kept['persons'] == written and streamed_peak < kept_peak / 2,
+                            f"Default run streams persons without keeping them: Phase 4 peak "
+                            f"{streamed_peak / 2**20:.1f} MB vs. {kept_peak / 2**20:.1f} MB")
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    # ================================================================
+    # TEST 25: Filter Bitmaps
+    # ================================================================
+
+    def test_filter_index(self, output_data):
+        """Test filter bitmaps against the applyFilters semantics of the map"""
+        print("\n[TEST 25] Filter Bitmaps")
+        print("-" * 60)
+
+        # Occupation groups must stay in sync with the frontend definition
+        app_js = (Path(__file__).parent.parent / 'docs' / 'js' / 'app.js').read_text(encoding='utf-8')
+        block = re.search(r'const OCCUPATION_GROUPS = \{(.*?)\};', app_js, re.S).group(1)
+        js_groups = {group: re.findall(r"'([^']+)'", names)
+                     for group, names in re.findall(r"'(\w+)': \[(.*?)\]", block, re.S)}
+        self.assert_test(js_groups == OCCUPATION_GROUPS,
+                        f"OCCUPATION_GROUPS matches docs/js/app.js ({len(js_groups)} groups)")
+
+        persons = output_data['persons']
+        temp_dir = Path(tempfile.mkdtemp(prefix='herdata_filters_'))
+        try:
+            size = write_filter_index(persons, temp_dir / 'filters.json', generated=output_data['meta']['generated'])
+            with open(temp_dir / 'filters.json', encoding='utf-8') as f:
+                data = json.load(f)
+            index = FilterIndex.from_json(data)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        # A file from another run (same person count, other data) must not be used by the map
+        loader = re.search(r'async function loadFilterIndex\(count, generated\) \{(.*?)\n\}', app_js, re.S)
+        self.assert_test(data['generated'] == output_data['meta']['generated']
+                         and loader is not None and 'data.generated !== generated' in loader.group(1),
+                        "Bitmaps carry meta.generated; app.js scans when it differs")
+
+        # Random filter combinations: bitmap query == per-person scan
+        rng = random.Random(15)
+        mismatches = 0
+        for _ in range(200):
+            roles = rng.sample(ROLE_VALUES, rng.randint(0, len(ROLE_VALUES)))
+            groups = rng.sample(GROUP_VALUES, rng.randint(0, len(GROUP_VALUES)))
+            first = rng.randint(1755, 1830)
+            years = None if rng.random() < 0.25 else (first, first + rng.randint(0, 40))
+            expected = [row for row, person in enumerate(persons) if matches_filter(person, roles, groups, years)]
+            mismatches += index.rows(index.query(roles, groups, years)) != expected
+        self.assert_test(mismatches == 0 and index.count == len(persons),
+                        f"200 random filters match the per-person scan ({size // 1024} KB of bitmaps)")
+
+        everyone = (1 << len(persons)) - 1
+        groups_disjoint = sum(bin(bits).count('1') for bits in index.groups.values()) == len(persons)
+        self.assert_test(index.query() == everyone and groups_disjoint
+                         and index.year_bits(1760, 1829) | index.undated == everyone,
+                        "Default filters select everyone; each person is in exactly one occupation group")
+
+        with_group = all(occupation_group(person) in GROUP_VALUES for person in persons)
+        self.assert_test(with_group and occupation_group({'occupations': [{'name': 'Näherin'}, {'name': 'Malerin'}]})
+                         == 'artistic' and occupation_group({}) == 'none',
+                        "Occupation group: first grouped occupation, else other/none")
+
+    # ================================================================
+    # TEST 26: Cluster Pyramid
+    # ================================================================
+
+    def test_cluster_pyramid(self, output_data):
+        """Test precomputed map clusters per zoom level"""
+        print("\n[TEST 26] Cluster Pyramid")
+        print("-" * 60)
+
+        persons = output_data['persons']
+        located = [row for row, person in enumerate(persons) if person.get('places')]
+        pyramid = ClusterPyramid.build(persons)
+        zooms = sorted(pyramid.levels)
+
+        lon, lat = unproject(*project(11.32903, 50.9803))
+        self.assert_test(abs(lon - 11.32903) < 1e-9 and abs(lat - 50.9803) < 1e-9,
+                        "Web Mercator projection round-trips")
+
+        conserved = all(sum(node['count'] for node in pyramid.levels[zoom]) == len(located)
+                        and all(sum(node['roles'].values()) == node['count'] for node in pyramid.levels[zoom])
+                        for zoom in zooms)
+        sizes = [len(pyramid.levels[zoom]) for zoom in zooms]
+        self.assert_test(conserved and sizes == sorted(sizes) and sizes[0] < sizes[-1] <= len(located),
+                        f"Every located person counted once per level ({' / '.join(map(str, sizes))} nodes, zoom {zooms[0]}-{zooms[-1]})")
+
+        # Nodes are merged within the radius of a seed node; the centroid is at most one radius from it
+        within_radius = True
+        for zoom in zooms[:-1]:
+            radius = CLUSTER_RADIUS / (TILE_EXTENT * 2 ** zoom)
+            for child, parent in enumerate(pyramid.parents[zoom + 1]):
+                child_x, child_y = project(pyramid.levels[zoom + 1][child]['lon'], pyramid.levels[zoom + 1][child]['lat'])
+                parent_x, parent_y = project(pyramid.levels[zoom][parent]['lon'], pyramid.levels[zoom][parent]['lat'])
+                within_radius &= ((child_x - parent_x) ** 2 + (child_y - parent_y) ** 2) ** 0.5 <= 2 * radius
+        self.assert_test(within_radius, "Merged nodes lie within two cluster radii of their parent centroid")
+
+        # JSON form: tree recounts a filtered subset
+        loaded = ClusterPyramid.from_json(json.loads(json.dumps(pyramid.to_json())))
+        senders = [row for row in located if persons[row]['role'] == 'sender']
+        recounted = all(sum(loaded.counts(zoom, senders)) == len(senders)
+                        and all(count <= node['roles'].get('sender', 0)
+                                for count, node in zip(loaded.counts(zoom, senders), loaded.levels[zoom]))
+                        for zoom in zooms)
+        self.assert_test(loaded.levels == pyramid.levels and loaded.counts(zooms[-1], located) == [
+                         node['count'] for node in pyramid.levels[zooms[-1]]] and recounted,
+                        f"Round trip and filtered recount ({len(senders)} senders with places)")
+
+        # A file from another run (same person count, other places) must not be used by the map
+        temp_dir = Path(tempfile.mkdtemp(prefix='herdata_clusters_'))
+        try:
+            write_clusters(persons, temp_dir / 'clusters.json', generated=output_data['meta']['generated'])
+            with open(temp_dir / 'clusters.json', encoding='utf-8') as f:
+                data = json.load(f)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        app_js = (Path(__file__).parent.parent / 'docs' / 'js' / 'app.js').read_text(encoding='utf-8')
+        loader = re.search(r'async function loadClusterPyramid\(count, generated\) \{(.*?)\n\}', app_js, re.S)
+        self.assert_test(data['generated'] == output_data['meta']['generated'] and data['leaves'] == pyramid.leaves
+                         and loader is not None and 'data.generated !== generated' in loader.group(1),
+                        "Pyramid file carries meta.generated; app.js clusters in the browser when it differs")
+
+    # ================================================================
+    # TEST 27: Spatial Index
+    # ================================================================
+
+    def test_spatial_index(self, pipeline):
+        """Test the location/radius/bbox index over place coordinates"""
+        print("\n[TEST 27] Spatial Index")
+        print("-" * 60)
+
+        index = pipeline.spatial_index
+        places = [(woman_id, location_key(place['lat'], place['lon']), place_index)
+                  for woman_id, woman_data in pipeline.women.items()
+                  for place_index, place in enumerate(woman_data['places'])]
+
+        # Exact location: every place finds its person, and only persons with a place there
+        exact = all(woman_id in index.at(*(value * 1e-4 for value in key)) for woman_id, key, _ in places)
+        busiest = max(index.locations, key=lambda key: len(index.persons(key)))
+        expected = {woman_id for woman_id, key, _ in places if key == busiest}
+        self.assert_test(exact and set(index.at(busiest[0] * 1e-4, busiest[1] * 1e-4)) == expected,
+                        f"Location lookup ({len(index)} locations, up to {len(expected)} women at one place)")
+
+        def brute_near(lat, lon, radius_km):
+            nearest = {}
+            for woman_id, key, _ in places:
+                distance = haversine_km(lat, lon, key[0] * 1e-4, key[1] * 1e-4)
+                if distance <= radius_km:
+                    nearest[woman_id] = min(distance, nearest.get(woman_id, distance))
+            return nearest
+
+        rng = random.Random(27)
+        checked = 0
+        near_ok = True
+        for _ in range(50):
+            _, (lat_key, lon_key), _ = rng.choice(places)
+            lat, lon, radius = lat_key * 1e-4 + rng.uniform(-0.5, 0.5), lon_key * 1e-4 + rng.uniform(-0.5, 0.5), rng.uniform(1, 200)
+            result = index.near(lat, lon, radius)
+            near_ok &= {woman_id: distance for distance, woman_id in result} == brute_near(lat, lon, radius)
+            near_ok &= result == sorted(result)
+            checked += len(result)
+        self.assert_test(near_ok, f"Radius queries match a full haversine scan (50 queries, {checked} hits)")
+
+        def brute_bbox(south, west, north, east):
+            return {woman_id for woman_id, key, _ in places
+                    if round(south / 1e-4) <= key[0] <= round(north / 1e-4)
+                    and round(west / 1e-4) <= key[1] <= round(east / 1e-4)}
+
+        bbox_ok = True
+        for _ in range(50):
+            _, (lat_key, lon_key), _ = rng.choice(places)
+            south, west = lat_key * 1e-4 - rng.uniform(0, 2), lon_key * 1e-4 - rng.uniform(0, 2)
+            north, east = south + rng.uniform(0, 4), west + rng.uniform(0, 4)
+            bbox_ok &= set(index.in_bbox(south, west, north, east)) == brute_bbox(south, west, north, east)
+        # Boxes crossing the antimeridian
+        wrapped = SpatialIndex()
+        wrapped.add('east', 10.0, 179.9)
+        wrapped.add('west', 10.0, -179.9)
+        wrapped.add('far', 10.0, 0.0)
+        bbox_ok &= set(wrapped.in_bbox(9.0, 179.0, 11.0, -179.0)) == {'east', 'west'}
+        bbox_ok &= [woman_id for _, woman_id in wrapped.near(10.0, 179.95, 50)] == ['east', 'west']
+        self.assert_test(bbox_ok, "Bounding box queries match a full scan (including the antimeridian)")
+
+        # Location table for the frontend: primary places only, 'lat,lon' keys with 4 decimals
+        with tempfile.TemporaryDirectory() as tmp:
+            size = write_locations(index, Path(tmp) / 'locations.json')
+            with open(Path(tmp) / 'locations.json', encoding='utf-8') as f:
+                table = json.load(f)['locations']
+        primary = Counter(key_label(key) for woman_id, key, place_index in places if place_index == 0)
+        self.assert_test({label: len(location['persons']) for label, location in table.items()} == primary
+                        and all(re.fullmatch(r'-?\d+\.\d{4},-?\d+\.\d{4}', label) for label in table),
+                        f"Location table: {len(table)} locations, {sum(primary.values())} women ({size / 1024:.0f} KB)")
+
+    # ================================================================
+    # TEST 28: Relationship Graph
+    # ================================================================
+
+    def test_relationship_graph(self, pipeline):
+        """Test the CSR relationship graph and the women's resolved relationships"""
+        print("\n[TEST 28] Relationship Graph")
+        print("-" * 60)
+
+        graph = pipeline.relationship_graph
+        vocabulary = graph.vocabulary
+        relations = list(read_relations(pipeline.tables['relationships']))
+
+        # Reference adjacency: both directions of every row, without duplicates
+        adjacency = {}
+        for id1, id2, label1, label2 in relations:
+            adjacency.setdefault(id1, set()).add((id2, label1))
+            adjacency.setdefault(id2, set()).add((id1, label2))
+        self.assert_test(len(graph) == len(adjacency) and graph.edge_count == sum(map(len, adjacency.values()))
+                        and all(set(graph.neighbors(person_id)) == edges for person_id, edges in adjacency.items()),
+                        f"CSR holds all {len(relations)} relationships in both directions "
+                        f"({len(graph)} persons, {graph.edge_count} edges)")
+
+        def brute_k_hop(person_id, k):
+            hops = {person_id: 0}
+            frontier = [person_id]
+            for step in range(1, k + 1):
+                next_frontier = []
+                for source in frontier:
+                    for target, _ in adjacency.get(source, ()):
+                        if target not in hops:
+                            hops[target] = step
+                            next_frontier.append(target)
+                frontier = next_frontier
+            del hops[person_id]
+            return hops
+
+        rng = random.Random(28)
+        sample = rng.sample(sorted(adjacency), 50)
+        family = {agrelon_id for agrelon_id, relation in vocabulary.items() if relation['category'] == 'Verwandtschaft'}
+        k_hop_ok = all(graph.k_hop(person_id, k) == brute_k_hop(person_id, k) for person_id in sample for k in (1, 2, 3))
+        filtered_ok = all(set(graph.neighbors(person_id, family)) == {edge for edge in adjacency[person_id] if edge[1] in family}
+                          for person_id in sample)
+        self.assert_test(k_hop_ok and filtered_ok and graph.k_hop('no such id', 2) == {},
+                        f"k-hop and typed neighbour queries match a reference search ({len(sample)} persons)")
+
+        # Women: names resolved through pers_koerp_main, types through AGRELON (inverse types are symmetric)
+        with_relationships = [woman_data for woman_data in pipeline.women.values() if woman_data['relationships']]
+        resolved = all(relationship['name'] == pipeline.person_name(relationship['id'])
+                       and relationship['type'] == vocabulary[relationship['agrelon']]['type']
+                       and relationship['category'] == vocabulary[relationship['agrelon']]['category']
+                       for woman_data in with_relationships for relationship in woman_data['relationships'])
+        inverse = all(vocabulary[relation['inverse']]['inverse'] == agrelon_id for agrelon_id, relation in vocabulary.items())
+        self.assert_test(resolved and inverse and len(vocabulary) == 44 and
+                         len(with_relationships) == sum(1 for woman_id in pipeline.women if woman_id in adjacency),
+                        f"{len(with_relationships)} women with resolved relationships, {len(vocabulary)} AGRELON types")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            size = write_relationships(pipeline.women, vocabulary, Path(tmp) / 'relationships.json')
+            with open(Path(tmp) / 'relationships.json', encoding='utf-8') as f:
+                data = json.load(f)
+        written = sum(len(entries) for entries in data['persons'].values())
+        self.assert_test(graph.nbytes() <= 6 * graph.edge_count + 4 * (len(graph) + 1)
+                         and written == sum(len(woman_data['relationships']) for woman_data in with_relationships)
+                         and set(data['types']) <= set(vocabulary),
+                        f"Compact storage ({graph.nbytes() // 1024} KB arrays, {size // 1024} KB relationships.json)")
+
+    # ================================================================
+    # TEST 29: Network Metrics
+    # ================================================================
+
+    def test_network_metrics(self, pipeline, output_data):
+        """Test degree, components, PageRank and betweenness over the relationship graph"""
+        print("\n[TEST 29] Network Metrics")
+        print("-" * 60)
+
+        graph = pipeline.relationship_graph
+        metrics = pipeline.network_metrics
+        neighbours = {person_id: {target for target, _ in graph.neighbors(person_id)} for person_id in graph.ids}
+
+        # Reference components by breadth-first search
+        component_of = {}
+        for person_id in graph.ids:
+            if person_id in component_of:
+                continue
+            component_of[person_id] = person_id
+            stack = [person_id]
+            while stack:
+                for target in neighbours[stack.pop()]:
+                    if target not in component_of:
+                        component_of[target] = person_id
+                        stack.append(target)
+        reference = Counter(component_of.values())
+        same_partition = all((metrics.components[graph.nodes[a]] == metrics.components[graph.nodes[b]]) ==
+                             (component_of[a] == component_of[b])
+                             for a, b in zip(graph.ids, graph.ids[1:] + graph.ids[:1]))
+        self.assert_test(metrics.degree == [len(neighbours[person_id]) for person_id in graph.ids]
+                         and metrics.component_sizes == sorted(reference.values(), reverse=True) and same_partition,
+                        f"Degrees and {len(reference)} components match a reference search "
+                        f"(largest {metrics.component_sizes[0]} persons)")
+
+        # PageRank (scaled to mean 1) is a fixed point of the damped iteration
+        n = len(graph)
+        ranks = dict(zip(graph.ids, metrics.pagerank))
+        residual = max(abs(ranks[person_id] - (1 - network_metrics.DAMPING) - network_metrics.DAMPING *
+                           sum(ranks[target] / len(neighbours[target]) for target in neighbours[person_id]))
+                       for person_id in graph.ids)
+        backends_agree = True
+        if 'numpy' in network_metrics.available_backends():
+            other = NetworkMetrics.build(graph, 'numpy' if metrics.backend == 'python' else 'python')
+            backends_agree = other.components == metrics.components and other.degree == metrics.degree and \
+                max(abs(a - b) for a, b in zip(other.pagerank, metrics.pagerank)) < 1e-6 and \
+                max(abs(a - b) for a, b in zip(other.betweenness, metrics.betweenness)) < 1e-12
+        self.assert_test(abs(sum(metrics.pagerank) - n) < 1e-6 and residual < 1e-4 and backends_agree,
+                        f"PageRank converged (residual {residual:.1e}, backend {metrics.backend}, "
+                        f"{len(network_metrics.available_backends())} backend(s) compared)")
+
+        # Exact betweenness when every node is a source: path a-b-c-d plus a star around e
+        small = NetworkMetrics.build(RelationshipGraph.build([
+            ('a', 'b', '1010', '1010'), ('b', 'c', '1010', '1010'), ('c', 'd', '1010', '1010'),
+            ('e', 'f', '1010', '1010'), ('e', 'g', '1010', '1010'), ('e', 'h', '1010', '1010')]))
+        exact = dict(zip(small.graph.ids, small.betweenness))
+        pairs = 7 * 6 / 2
+        leaves = all(metrics.betweenness[node] == 0 for node in range(n) if metrics.degree[node] == 1)
+        self.assert_test(abs(exact['b'] - 2 / pairs) < 1e-12 and abs(exact['e'] - 3 / pairs) < 1e-12
+                         and exact['a'] == 0 and leaves and min(metrics.betweenness) >= 0,
+                        "Betweenness matches exact values on a small graph; leaves have none")
+
+        # Women carry their metrics; the 10x graph builds within budget
+        women_ok = all(woman_data['network'] == metrics.person(woman_id) for woman_id, woman_data in pipeline.women.items())
+        top = metrics.ranking('pagerank', pipeline.women, limit=5)
+        results = benchmark(list(read_relations(pipeline.tables['relationships'])), graph.vocabulary)
+        result = results[metrics.backend]
+        self.assert_test(women_ok and top == sorted(top, key=lambda entry: -entry[0])
+                         and result['persons'] == 10 * n and result['total_s'] <= BENCHMARK_BUDGET_S,
+                        f"Metrics on women; 10x graph ({result['persons']} persons) built in "
+                        f"{result['total_s']:.2f} s (budget {BENCHMARK_BUDGET_S:.0f} s)")
+
+        # persons.json carries the metrics of every woman with relationships
+        entries = {person['id']: person.get('network') for person in output_data['persons']}
+        expected = {woman_id: metrics.person(woman_id) for woman_id in pipeline.women}
+        written = all(entry == ({key: value for key, value in expected[woman_id].items()
+                                 if key not in ('component', 'betweenness') or (key == 'betweenness' and value)}
+                                if expected[woman_id] else None)
+                      for woman_id, entry in entries.items())
+        self.assert_test(written and len(entries) == len(pipeline.women),
+                        f"Network metrics in persons.json ({sum(1 for entry in entries.values() if entry)} women)")
+
+    # ================================================================
+    # TEST 30: Full-Text Index
+    # ================================================================
+
+    def test_text_index(self, pipeline):
+        """Test the inverted index over register entries against a scan of the texts"""
+        print("\n[TEST 30] Full-Text Index")
+        print("-" * 60)
+
+        index = pipeline.text_index
+        texts = {woman_id: pipeline.register_entries(woman_id) for woman_id in pipeline.women}
+        tokens = {woman_id: [tokenize(text) for text in entries] for woman_id, entries in texts.items()}
+        tokens = {woman_id: token_lists for woman_id, token_lists in tokens.items() if any(token_lists)}
+
+        def scan(matches):
+            return [woman_id for woman_id, token_lists in tokens.items()
+                    if any(matches(text_tokens) for text_tokens in token_lists)]
+
+        def contains(text_tokens, phrase):
+            return any(text_tokens[i:i + len(phrase)] == phrase for i in range(len(text_tokens)))
+
+        # Term, prefix and phrase queries against a scan over the folded texts
+        rng = random.Random(30)
+        all_tokens = [token for token_lists in tokens.values() for text_tokens in token_lists for token in text_tokens]
+        terms = rng.sample(index.terms, 40) + ['weimar', 'malerin']
+        prefixes = [term[:3] for term in rng.sample(index.terms, 20)] + ['weim']
+        phrases = [all_tokens[i:i + 2] for i in rng.sample(range(len(all_tokens) - 1), 20)] + [['in', 'weimar']]
+        mismatches = [term for term in terms if index.term(term) != scan(lambda text_tokens: term in text_tokens)]
+        mismatches += [prefix for prefix in prefixes
+                       if index.prefix(prefix) != scan(lambda text_tokens: any(t.startswith(prefix) for t in text_tokens))]
+        mismatches += [phrase for phrase in phrases
+                       if index.phrase(' '.join(phrase)) != scan(lambda text_tokens: contains(text_tokens, phrase))]
+        self.assert_test(len(index) == len(tokens) and not mismatches,
+                        f"{len(terms)} term, {len(prefixes)} prefix, {len(phrases)} phrase queries match a scan "
+                        f"of {len(tokens)} women's register entries" + (f" (differ: {mismatches[:3]})" if mismatches else ""))
+
+        # Folding, query syntax, phrases within one text only
+        small = TextIndex.build([('1', ['Malerin in Weimar', 'Tochter des Hofrats']),
+                                 ('2', ['MALERIN, später in Gotha']),
+                                 ('3', ['weimar in', 'Sachsen-Weimar-Eisenach'])])
+        self.assert_test(small.term('Malerin') == ['1', '2'] and small.search('malerin weim*') == ['1']
+                         and small.phrase('weimar tochter') == [] and small.phrase('weimar in') == ['3']
+                         and small.search('"in weimar" tochter') == ['1'] and small.search('Sachsen-Weimar') == ['3']
+                         and small.search('spaeter') == [] and small.search('später') == ['2'],
+                        "Case/diacritic folding, AND of term/prefix/phrase parts, no phrases across texts")
+
+        # Varints, delta-encoded postings and JSON round trip
+        values = [0, 1, 127, 128, 16383, 16384, 2 ** 32 - 1]
+        encoded = bytearray()
+        encode_varints(values, encoded)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'text_index.json'
+            size = write_text_index(index, path)
+            restored = TextIndex.from_json(json.loads(path.read_text(encoding='utf-8')))
+        raw = sum(len(text.encode('utf-8')) for entries in texts.values() for text in entries)
+        same = restored.terms == index.terms and restored.postings == index.postings and \
+            restored.offsets == index.offsets and all(restored.term(term) == index.term(term) for term in terms)
+        self.assert_test(decode_varints(encoded) == values and same and len(index.postings) < raw / 2,
+                        f"Round trip; {len(index.terms)} terms, postings {len(index.postings) / 1024:.0f} KB "
+                        f"for {raw / 1024:.0f} KB of text (file {size / 1024:.0f} KB)")
+
+        # Query latency over a mix of query types
+        queries = terms + [prefix + '*' for prefix in prefixes] + [f'"{" ".join(phrase)}"' for phrase in phrases]
+        timings = []
+        for query in queries * 5:
+            start = time.perf_counter()
+            index.search(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p99 = timings[int(len(timings) * 0.99)]
+        self.assert_test(p99 < 10, f"{len(timings)} queries: median {timings[len(timings) // 2]:.2f} ms, "
+                                   f"p99 {p99:.2f} ms (budget 10 ms)")
+
+    # ================================================================
+    # TEST 31: Name Search
+    # ================================================================
+
+    def test_name_search(self, pipeline):
+        """Test the prefix/trigram name index against a scan of all name forms"""
+        print("\n[TEST 31] Name Search")
+        print("-" * 60)
+
+        index = pipeline.name_search
+        forms = {woman_id: [name for name in dict.fromkeys(map(name_search.normalize, pipeline.name_forms(woman_id))) if name]
+                 for woman_id in pipeline.women}
+        forms = {woman_id: names for woman_id, names in forms.items() if names}
+
+        def best_similarity(query, names):
+            grams = name_search.trigrams(query)
+            return max(len(grams & name_search.trigrams(name)) / len(grams | name_search.trigrams(name)) for name in names)
+
+        # Prefix, substring and similarity lookups against a scan over all name forms
+        rng = random.Random(31)
+        queries = []
+        for name in rng.sample(index.names, 30):
+            query = name[:rng.randint(2, len(name))].strip()
+            if len(query) > 3 and rng.random() < 0.5:
+                position = rng.randrange(len(query))
+                query = query[:position] + rng.choice('aeiouyz') + query[position + 1:]  # Typo
+            queries.append(query)
+        mismatches = []
+        for query in queries:
+            words = {woman_id for woman_id, names in forms.items()
+                     if any(name[match.start():].startswith(query) for name in names for match in re.finditer(r'[a-z0-9]+', name))}
+            contained = {woman_id for woman_id, names in forms.items() if any(query in name for name in names)}
+            scores = {woman_id: best_similarity(query, names) for woman_id, names in forms.items()}
+            similar = {woman_id: round(score, 4) for woman_id, score in scores.items() if score >= name_search.SIMILARITY_THRESHOLD}
+            if (set(index.complete(query, limit=None)) != words or set(index.substring(query)) != contained
+                    or dict((woman_id, score) for score, woman_id in index.similar(query, limit=None)) != similar):
+                mismatches.append(query)
+        self.assert_test(len(index) == len(forms) and not mismatches,
+                        f"{len(queries)} prefix/substring/similarity queries match a scan of "
+                        f"{len(index.names)} name forms" + (f" (differ: {mismatches[:3]})" if mismatches else ""))
+
+        # Folding, multi-word prefixes, typo tolerance
+        small = NameSearch.build([('1', ['Charlotte von Stein', 'Charlotte', 'von Stein']),
+                                  ('2', ['Christiane Vulpius', 'Christiane', 'Vulpius', 'Vulpius, Christiane']),
+                                  ('3', ['Sophie von La Roche'])])
+        self.assert_test(small.complete('VULP') == ['2'] and small.complete('von st') == ['1']
+                         and small.complete('la ro') == ['3'] and small.substring('lpiu') == ['2']
+                         and small.search('Charlote von Stien')[0] == '1' and small.search('Vulpious') == ['2']
+                         and small.complete('Göthe') == [] and sorted(small.complete('ch', limit=None)) == ['1', '2'],
+                        "Folding, word-start prefixes across words, substrings, typo-tolerant search")
+
+        # Compact JSON round trip
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'name_search.json'
+            size = write_name_search(index, path)
+            restored = NameSearch.from_json(json.loads(path.read_text(encoding='utf-8')))
+        same = restored.postings == index.postings and restored.prefix_names == index.prefix_names and \
+            restored.prefix_starts == index.prefix_starts and restored.sizes == index.sizes and \
+            all(restored.search(query) == index.search(query) for query in queries)
+        self.assert_test(same, f"Round trip; {len(index.names)} name forms, {len(index.postings)} trigrams "
+                               f"({size / 1024:.0f} KB)")
+
+        # p99 latency on all persons of pers_koerp_main
+        start = time.perf_counter()
+        everyone = NameSearch.build((person_id, pipeline.name_forms(person_id)) for person_id in pipeline.tables['names'].keys())
+        build_s = time.perf_counter() - start
+        queries = []
+        for name in rng.sample(everyone.names, 500):
+            query = name[:rng.randint(2, len(name))]
+            if rng.random() < 0.3:
+                position = rng.randrange(len(query))
+                query = query[:position] + rng.choice('aeiouyz') + query[position + 1:]
+            queries.append(query)
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            everyone.search(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p99 = timings[int(len(timings) * 0.99)]
+        self.assert_test(p99 < 50, f"{len(everyone)} persons ({len(everyone.names)} name forms, built in {build_s:.2f} s): "
+                                   f"median {timings[len(timings) // 2]:.2f} ms, p99 {p99:.2f} ms (budget 50 ms)")
+
+    # ================================================================
+    # TEST 32: Place Authorities
+    # ================================================================
+
+    def test_place_authorities(self, pipeline):
+        """Test the geo_links authority index, place merging and CMIF place lookups"""
+        print("\n[TEST 32] Place Authorities")
+        print("-" * 60)
+
+        authorities = pipeline.place_authorities
+
+        # URL normalization; both hash indexes hold the same links
+        examples = {
+            ('https://www.geonames.org/2661881/aarau.html', '2661881', 'GeoNames'): 'geonames:2661881',
+            ('http://www.geonames.org/3027258/champagne.html', None, 'GeoNames'): 'geonames:3027258',
+            ('https://d-nb.info/gnd/4000018-7', None, 'GND'): 'gnd:4000018-7',
+            ('https://gov.genealogy.net/item/show/ALTERGJO60VS', None, 'GOV'): 'gov:ALTERGJO60VS',
+            ('https://www.getty.edu/vow/TGNFullDisplay?find=&english=Y&subjectid=7163694', '716394',
+             'Getty Thesaurus of Geographic Names'): 'tgn:7163694',
+            ('https://de.wikipedia.org/wiki/Aarau', None, 'Wikipedia'): None,
+            ('http://www.geonames.org/2812482', None, None): 'geonames:2812482'
+        }
+        normalized = all(authority_key(*link) == key for link, key in examples.items())
+        consistent = all(place_id in authorities.key_places[key]
+                         for place_id, keys in authorities.place_keys.items() for key in keys) and \
+            all(key in authorities.place_keys[place_id]
+                for key, place_ids in authorities.key_places.items() for place_id in place_ids)
+        self.assert_test(normalized and consistent,
+                        f"Authority keys normalized; {len(authorities)} places <-> {len(authorities.key_places)} "
+                        f"authority IDs indexed both ways")
+
+        # CMIF placeName@ref (GeoNames URLs) resolve to SNDB places with that GeoNames ID
+        cmif_refs = Counter(elem.get('ref') for _, elem in ET.iterparse(pipeline.data_dir / 'ra-cmif.xml')
+                            if elem.tag == f"{{{NS['tei']}}}placeName" and elem.get('ref'))
+        resolved = {ref: authorities.place_for(ref) for ref in cmif_refs}
+        matching = all(authority_key(ref) in authorities.keys(place_id) for ref, place_id in resolved.items() if place_id)
+        resolved_letters = sum(count for ref, count in cmif_refs.items() if resolved[ref])
+        self.assert_test(cmif_refs and matching and resolved_letters / sum(cmif_refs.values()) > 0.9,
+                        f"CMIF place refs: {sum(1 for place_id in resolved.values() if place_id)} of {len(cmif_refs)} "
+                        f"resolved ({resolved_letters} of {sum(cmif_refs.values())} placeName elements)")
+
+        # Transitive merge into the first place (ID order) with coordinates
+        small = PlaceAuthorities.build([
+            ('10', 'https://www.geonames.org/1/a.html', '1', 'GeoNames'),
+            ('7', 'https://d-nb.info/gnd/1-1', '1-1', 'GND'),
+            ('11', 'https://www.geonames.org/1/a.html', None, 'GeoNames'),
+            ('11', 'https://d-nb.info/gnd/1-1', '1-1', 'GND'),
+            ('12', 'https://de.wikipedia.org/wiki/A', None, 'Wikipedia'),
+            ('13', 'https://d-nb.info/gnd/2-2', '2-2', 'GND')
+        ], has_coords=lambda place_id: place_id != '7')
+        self.assert_test(small.groups == {'10': ['7', '10', '11']} and small.canonical('7') == '10'
+                         and small.canonical('13') == '13' and small.place_for('gnd:1-1') == '10'
+                         and small.place_for('http://geonames.org/1') == '10' and small.place_for('geonames:9') is None
+                         and small.keys('11') == ['gnd:1-1', 'geonames:1'] and '12' not in small.place_keys,
+                        "Places sharing authority IDs merge transitively; other links never merge")
+
+        # A new shared GeoNames ID moves a woman's place to the canonical place, in incremental runs too
+        tmp_dir = Path(tempfile.mkdtemp())
+        try:
+            data_dir = tmp_dir / 'data'
+            shutil.copytree(pipeline.data_dir, data_dir, ignore=shutil.ignore_patterns('.cache'))
+            woman_id, place_id = next((woman_id, link['SNDB_ID']) for woman_id in pipeline.women
+                                      for link in pipeline.tables['places'].records(woman_id)
+                                      if link.get('SNDB_ID') and pipeline.place_coords(link['SNDB_ID']))
+            target = next(place_id_ for place_id_ in sorted(authorities.place_keys, key=lambda p: (len(p), p))
+                          if authorities.keys(place_id_)[0].startswith('geonames:') and pipeline.place_coords(place_id_)
+                          and pipeline.place_name(place_id_) != pipeline.place_name(place_id))
+            geonames_id = authorities.keys(target)[0].split(':')[1]
+
+            def build(incremental):
+                output_file = tmp_dir / ('incremental.json' if incremental else 'full.json')
+                run = HerDataPipeline(data_dir, output_file, verbose=False, workers=1, keep_persons=True)
+                output_data = run.run(incremental=incremental)
+                output_data['meta'].pop('generated')
+                return run, output_data
+
+            build(True)
+            links_file = data_dir / 'SNDB' / 'geo_links.xml'
+            links_file.write_text(links_file.read_text(encoding='utf-8').replace('</GEO_LINKS>', (
+                f'   <ITEM num="0">\n      <ID>{place_id}</ID>\n      <LFDNR>0</LFDNR>\n'
+                f'      <URL>https://www.geonames.org/{geonames_id}/</URL>\n      <QUELLE>GeoNames</QUELLE>\n'
+                f'   </ITEM>\n</GEO_LINKS>')), encoding='utf-8')
+            run, incremental_output = build(True)
+            moved = run.place_authorities.canonical(place_id) == target and \
+                run.place_name(target) in [place['name'] for place in run.women[woman_id]['places']]
+            self.assert_test(moved and incremental_output == build(False)[1],
+                            f"Merged place {place_id} -> {target}: incremental equals full build "
+                            f"({run.stats['incremental']['affected_women']} women recomputed)")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # ================================================================
+    # TEST 33: Stage Graph
+    # ================================================================
+
+    def test_stage_graph(self, pipeline, output_data):
+        """Test the stage DAG: dependency order, concurrency, cached stages and plug-in stages"""
+        print("\n[TEST 33] Stage Graph")
+        print("-" * 60)
+
+        # Pipeline stages ran after the producers of their inputs; bad declarations are rejected
+        stages = pipeline.stages
+        position = {name: i for i, name in enumerate(stages.order())}
+        ordered = all(position[stages.producers[artifact]] < position[name]
+                      for name, stage in stages.stages.items() for artifact in stage.inputs)
+
+        def rejected(declare):
+            graph = StageGraph()
+            try:
+                declare(graph)
+                graph.order()
+            except ValueError:
+                return True
+            return False
+
+        invalid = [
+            lambda graph: (graph.add('a', None, outputs=('x',)), graph.add('b', None, outputs=('x',))),
+            lambda graph: graph.add('a', None, inputs=('missing',)),
+            lambda graph: (graph.add('a', None, inputs=('y',), outputs=('x',)),
+                           graph.add('b', None, inputs=('x',), outputs=('y',)))
+        ]
+        self.assert_test(ordered and set(stages.timings) == set(stages.stages) and all(map(rejected, invalid)),
+                        f"{len(stages)} pipeline stages ran in dependency order; duplicate outputs, "
+                        f"missing inputs and cycles rejected")
+
+        # Independent stages overlap: wall time follows the critical path
+        log = []
+
+        def sleeper(name, seconds):
+            def stage():
+                time.sleep(seconds)
+                log.append(name)
+            return stage
+
+        graph = StageGraph()
+        for name in 'abcd':
+            graph.add(name, sleeper(name, 0.1), outputs=(name,))
+        graph.add('join', sleeper('join', 0.05), inputs=tuple('abcd'), outputs=('joined',))
+        start = time.perf_counter()
+        graph.run(workers=4)
+        elapsed = time.perf_counter() - start
+        seconds, path = graph.critical_path()
+        self.assert_test(log[-1] == 'join' and elapsed < 0.3 and len(path) == 2 and path[1] == 'join'
+                         and 0.14 <= seconds < 0.3,
+                        f"4 x 0.1 s stages + join in {elapsed:.2f} s on 4 threads "
+                        f"(critical path {' > '.join(path)}: {seconds:.2f} s)")
+
+        # Concurrent stages start process pools without forking the threaded scheduler process
+        sndb_file = pipeline.data_dir / 'SNDB' / 'pers_koerp_orte.xml'
+        ranges, _ = element_ranges(sndb_file, 'ITEM', 3)
+        graph = StageGraph()
+        for name in 'abc':
+            graph.add(name, lambda: sum(map(len, map_ranges(scan_sndb_range, sndb_file, ranges, None, workers=3))),
+                      outputs=(name,))
+        results = graph.run(workers=3)
+        with chunked_reader.process_pool(1) as pool:
+            method = pool._mp_context.get_start_method()
+        self.assert_test(method != 'fork' and set(results.values()) == {len(list(scan_sndb_items(sndb_file)))},
+                        f"3 concurrent stages with process pools ({method} start method)")
+
+        # Cached stages are skipped while their sources are unchanged
+        tmp_dir = Path(tempfile.mkdtemp())
+        try:
+            source = tmp_dir / 'source.txt'
+            source.write_text('1')
+            calls = []
+            restored = []
+
+            def run_cached():
+                graph = StageGraph(StageCache(tmp_dir / '.cache'))
+                graph.add('count', lambda: calls.append(source.read_text()) or len(calls), outputs=('count',),
+                          sources=(source,), params=('v1',), cache=True, restore=restored.append)
+                return graph.run(workers=1)['count'], graph.cached
+
+            first, second = run_cached(), run_cached()
+            source.write_text('2')
+            third = run_cached()
+            self.assert_test(first == (1, []) and second == (1, ['count']) and third == (2, [])
+                             and restored == [1] and calls == ['1', '2'],
+                            "Cached stage restored while its source is unchanged, re-run after a change")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        # A plug-in stage runs before Phase 3 validation; the cached graph gives the same output
+        output_file = pipeline.output_file.parent / 'persons_stages_test.json'
+        try:
+            run = HerDataPipeline(pipeline.data_dir, output_file, verbose=False, keep_persons=True)
+            run.add_stage('birth_decades', lambda: run.stats.setdefault('birth_decades', Counter(
+                (woman['dates'].get('birth') or '')[:3] for woman in run.women.values())),
+                inputs=('women',), outputs=('birth_decades',))
+            rerun = run.run()
+            finished = list(run.stages.timings)
+            same = {**rerun, 'meta': {**rerun['meta'], 'generated': None}} == \
+                {**output_data, 'meta': {**output_data['meta'], 'generated': None}}
+            self.assert_test(same and finished.index('birth_decades') < finished.index('phase3_check')
+                             and 'relationship_graph' in run.stages.cached and 'network_metrics' in run.stages.cached
+                             and sum(run.stats['birth_decades'].values()) == len(run.women),
+                            f"Plug-in stage before validation; cached stages: {', '.join(run.stages.cached)}; "
+                            f"output unchanged")
+
+            # The phase methods run their stage subsets in order
+            run = HerDataPipeline(pipeline.data_dir, output_file, verbose=False, keep_persons=True)
+            women = run.phase1_identify_women()
+            phase1 = set(run.stages.timings)
+            run.phase2_match_letters()
+            run.phase3_enrich_data()
+            phased = run.phase4_generate_json()
+            same = {**phased, 'meta': {**phased['meta'], 'generated': None}} == \
+                {**output_data, 'meta': {**output_data['meta'], 'generated': None}}
+            self.assert_test(same and women is run.women and phase1 == {'phase1_tables', 'women', 'name_search'}
+                             and 'phase3_check' in run.phase_stages(3),
+                            f"Phase methods run their stages ({len(run.phase_stages(3))} in Phase 3); output unchanged")
+        finally:
+            if output_file.exists():
+                output_file.unlink()
+
+    # ================================================================
+    # TEST 34: Run Profile
+    # ================================================================
+
+    def test_run_profile(self, pipeline, output_data):
+        """Test --profile: stage metrics, input throughput, cache hit rates and cProfile dumps"""
+        print("\n[TEST 34] Run Profile")
+        print("-" * 60)
+
+        tmp_dir = Path(tempfile.mkdtemp())
+        try:
+            output_file = tmp_dir / 'persons.json'
+            run = HerDataPipeline(pipeline.data_dir, output_file, verbose=False, keep_persons=True,
+                                  profile_file=output_file.with_suffix('.metrics.json'), cprofile_dir=tmp_dir / 'profiles')
+            profiled = run.run()
+            metrics = json.loads(output_file.with_suffix('.metrics.json').read_text(encoding='utf-8'))
+
+            # One entry per stage, in the order they ran; output unchanged
+            stages = metrics['stages']
+            same = {**profiled, 'meta': {**profiled['meta'], 'generated': None}} == \
+                {**output_data, 'meta': {**output_data['meta'], 'generated': None}}
+            self.assert_test(same and list(stages) == list(run.stages.timings)
+                             and all(0 <= stage['cpu_s'] <= stage['wall_s'] * 1.05 + 0.01 and (stage['alloc_peak_mb'] or 0) >= 0
+                                     for stage in stages.values())
+                             and metrics['totals']['alloc_peak_mb'] >= max(stage['alloc_peak_mb'] or 0 for stage in stages.values()),
+                            f"{len(stages)} stages with wall/CPU time and allocation peaks "
+                            f"(run: {metrics['totals']['wall_s']:.2f} s, peak {metrics['totals']['alloc_peak_mb']} MB)")
+
+            # Records per input file: table rows and letters; bytes of the export or cache entry read
+            inputs = metrics['inputs']
+            sndb_dir = run.data_dir / 'SNDB'
+            tables_ok = all(inputs[filename]['records'] == len(run.tables[name])
+                            and inputs[filename]['bytes_read'] == (
+                                (sndb_dir / filename).stat().st_size if inputs[filename]['source'] == 'parsed'
+                                else run.cache.entry_path(SNDB_TABLES[name][0], sndb_dir / filename).stat().st_size)
+                            for name, (_, filename) in SNDB_TABLES.items())
+            letters = inputs['ra-cmif.xml']
+            self.assert_test(tables_ok and letters['records'] == len(list(iter_cmif_letters(run.data_dir / 'ra-cmif.xml')))
+                             and letters['bytes_read'] == (run.data_dir / 'ra-cmif.xml').stat().st_size
+                             and letters['records_per_s'] > 0,
+                            f"{len(inputs)} input files with records/s (CMIF: {letters['records_per_s']} letters/s, "
+                            f"{letters['mb_per_s']} MB/s)")
+
+            # The earlier runs filled both caches
+            caches = metrics['caches']
+            self.assert_test(caches['tables']['hit_rate'] == 1.0 and caches['stages']['hit_rate'] == 1.0
+                             and caches['tables']['hits'] == len(SNDB_TABLES),
+                            f"Cache hit rates: tables {caches['tables']['hits']}/{len(SNDB_TABLES)}, "
+                            f"stages {caches['stages']['hits']}/{caches['stages']['hits'] + caches['stages']['misses']}")
+
+            # cProfile dump per stage; the letters stage spends its time matching letters
+            dumps = sorted(path.stem for path in (tmp_dir / 'profiles').glob('*.prof'))
+            functions = {function for _, _, function in pstats.Stats(str(tmp_dir / 'profiles' / 'letters.prof')).stats}
+            self.assert_test(dumps == sorted(stages) and 'match_letter' in functions,
+                            f"{len(dumps)} cProfile dumps ({len(functions)} functions in letters.prof)")
+
+            # A failing stage still stops tracing and writes the metrics of the stages before it
+            def fail():
+                raise RuntimeError('stage failed')
+
+            failing = HerDataPipeline(pipeline.data_dir, tmp_dir / 'failing.json', verbose=False,
+                                      profile_file=tmp_dir / 'failing.metrics.json')
+            failing.add_stage('fail', fail, inputs=('women',), outputs=('failed',))
+            try:
+                failing.run()
+                raised = False
+            except RuntimeError:
+                raised = True
+            partial = json.loads((tmp_dir / 'failing.metrics.json').read_text(encoding='utf-8'))
+            self.assert_test(raised and not tracemalloc.is_tracing() and 'women' in partial['stages']
+                             and 'wall_s' in partial['totals'],
+                            f"Failed run stops profiling ({len(partial['stages'])} stages in its metrics)")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # ================================================================
+    # TEST 35: Synthetic Corpus
+    # ================================================================
+
+    def test_synthetic_corpus(self, pipeline):
+        """Test the scaled corpus generator: scale 1 identity, determinism, referential integrity"""
+        print("\n[TEST 35] Synthetic Corpus")
+        print("-" * 60)
+
+        data_dir = pipeline.data_dir
+        sources = sorted((data_dir / 'SNDB').glob('*.xml')) + [data_dir / 'ra-cmif.xml']
+        tmp_dir = Path(tempfile.mkdtemp())
+
+        def corpus_bytes(corpus_dir):
+            return [(corpus_dir / source.relative_to(data_dir)).read_bytes() for source in sources]
+
+        def column(corpus_dir, export, field):
+            fields = read_dtd_fields(corpus_dir / 'SNDB' / export)
+            return [row[fields.index(field)] for row in scan_sndb_items(corpus_dir / 'SNDB' / export)]
+
+        def dangling(corpus_dir):
+            """References to persons and places missing from the corpus"""
+            places = set(column(corpus_dir, 'geo_main.xml', 'ID'))
+            persons = set(column(corpus_dir, 'pers_koerp_indiv.xml', 'ID'))
+            return (sum(1 for place_id in column(corpus_dir, 'pers_koerp_orte.xml', 'SNDB_ID')
+                        if place_id and place_id not in places)
+                    + sum(1 for field in ('ID1', 'ID2') for person_id in column(corpus_dir, 'pers_koerp_beziehungen.xml', field)
+                          if person_id not in persons))
+
+        def duplicate_gnds(corpus_dir):
+            gnds = [gnd for gnd in column(corpus_dir, 'pers_koerp_indiv.xml', 'GND') if gnd]
+            return len(gnds) - len(set(gnds))
+
+        def cmif_refs(corpus_dir):
+            text = (corpus_dir / 'ra-cmif.xml').read_text(encoding='utf-8')
+            return (set(re.findall(r'd-nb\.info/gnd/([0-9X-]+)', text)),
+                    set(re.findall(r'geonames\.org/(\d+)', text)))
+
+        try:
+            # Scale 1 is the real data, byte for byte
+            CorpusGenerator(data_dir, 1, seed=7).write(tmp_dir / 'x1')
+            identical = sum(1 for source, copy in zip(sources, corpus_bytes(tmp_dir / 'x1'))
+                            if source.read_bytes() == copy)
+            self.assert_test(identical == len(sources), f"Scale 1 reproduces {identical}/{len(sources)} files")
+
+            # Same seed: same bytes; another seed: other draws
+            for name, seed in (('a', 7), ('b', 7), ('c', 8)):
+                CorpusGenerator(data_dir, 1.5, seed=seed).write(tmp_dir / name)
+            first = corpus_bytes(tmp_dir / 'a')
+            self.assert_test(first == corpus_bytes(tmp_dir / 'b') and first != corpus_bytes(tmp_dir / 'c'),
+                            f"Deterministic under a seed ({sum(map(len, first)) / 1e6:.1f} MB at scale 1.5)")
+
+            # Scale 2.5: counts scale; references, GNDs and CMIF refs stay inside the corpus
+            generator = CorpusGenerator(data_dir, 2.5, seed=7)
+            manifest = generator.write(tmp_dir / 'x25')
+            scaled_dir = tmp_dir / 'x25'
+            ratios = [manifest['items'][export] / len(column(data_dir, export, 'ID'))
+                      for export in ('pers_koerp_indiv.xml', 'geo_main.xml')]
+            ratios.append(manifest['letters'] / sum(1 for _ in iter_cmif_letters(data_dir / 'ra-cmif.xml')))
+            gnds, geonames = cmif_refs(scaled_dir)
+            original_gnds, original_geonames = cmif_refs(data_dir)
+            person_gnds = set(column(scaled_dir, 'pers_koerp_indiv.xml', 'GND'))
+            linked = (scaled_dir / 'SNDB' / 'geo_links.xml').read_text(encoding='utf-8')
+            self.assert_test(all(2.4 <= ratio <= 2.6 for ratio in ratios)
+                             and dangling(scaled_dir) <= generator.replicas * dangling(data_dir)
+                             and duplicate_gnds(scaled_dir) <= generator.replicas * duplicate_gnds(data_dir)
+                             and all(gnd in person_gnds for gnd in gnds - original_gnds)
+                             and all(f"geonames.org/{place}" in linked for place in geonames - original_geonames),
+                            f"Scale 2.5: {', '.join(f'{ratio:.2f}x' for ratio in ratios)} persons/places/letters, "
+                            f"no new dangling references")
+
+            # The pipeline runs on the scaled corpus, with proportionally more women
+            scaled = HerDataPipeline(scaled_dir, scaled_dir / 'persons.json', verbose=False, use_cache=False, scale=2.5,
+                                      keep_persons=True)
+            output = scaled.run()
+            self.assert_test(len(output['persons']) == len(scaled.women)
+                             and 2.4 <= len(scaled.women) / len(pipeline.women) <= 2.6,
+                            f"Pipeline at scale 2.5: {len(scaled.women)} women ({len(pipeline.women)} at scale 1)")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
     # ================================================================
     # Run All Tests
     # ================================================================
@@ -526,6 +2192,33 @@ class HerDataTester:
         self.test_edge_cases(output_data)
         self.test_data_completeness(output_data)
 
+        # Test 11+: Loader and index components
+        self.test_streaming_reader()
+        self.test_streaming_cmif_reader()
+        self.test_parallel_table_loading()
+        self.test_table_cache()
+        self.test_incremental_rebuild()
+        self.test_sndb_table()
+        self.test_fast_scanner()
+        self.test_cmif_backends()
+        self.test_chunked_parsing()
+        self.test_name_index(pipeline)
+        self.test_year_histograms(pipeline, output_data)
+        self.test_sharded_output(output_data)
+        self.test_columnar_output(output_data)
+        self.test_streaming_json_writer(pipeline, output_data)
+        self.test_filter_index(output_data)
+        self.test_cluster_pyramid(output_data)
+        self.test_spatial_index(pipeline)
+        self.test_relationship_graph(pipeline)
+        self.test_network_metrics(pipeline, output_data)
+        self.test_text_index(pipeline)
+        self.test_name_search(pipeline)
+        self.test_place_authorities(pipeline)
+        self.test_stage_graph(pipeline, output_data)
+        self.test_run_profile(pipeline, output_data)
+        self.test_synthetic_corpus(pipeline)
+
         # Final report
         self.print_summary()
 
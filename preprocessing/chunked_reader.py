@@ -0,0 +1,174 @@
+"""
+Chunked Reader: Parallel parsing of large XML exports in byte ranges
+
+A file is split into byte ranges that start at an element boundary
+(<ITEM> for SNDB, <correspDesc> for CMIF) and contain only complete
+elements, so every range can be parsed on its own in a worker process.
+Partial results are returned in file order and merged by the caller:
+
+    ranges, namespaces = element_ranges('ra-cmif.xml', 'correspDesc', 4)
+    results = map_ranges(parse_range, 'ra-cmif.xml', ranges, namespaces, workers=4)
+
+Streaming callers use iter_ranges() over ranges of at most about
+RANGE_MAX_BYTES (see range_count): results are yielded in file order as
+they complete, with a bounded number of ranges in flight, so memory
+depends on the number of workers, not on the size of the file.
+
+Boundaries are found by byte search, which is safe for the generated SNDB
+and CMIF exports (element tags never occur inside comments or CDATA).
+"""
+
+import io
+import math
+import mmap
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+CHUNK_MIN_BYTES = 4 << 20  # Smaller files are parsed in one piece
+RANGE_MAX_BYTES = 1 << 20  # Range size for streaming callers (iter_ranges)
+RANGES_IN_FLIGHT = 2       # Ranges submitted per worker ahead of the consumer
+
+NAMESPACE_DECL = re.compile(rb'\sxmlns(:[\w.-]+)?\s*=\s*(?:"[^"]*"|\'[^\']*\')')
+TAG_END = (b' ', b'\t', b'\r', b'\n', b'>', b'/')
+
+
+def process_pool(workers):
+    """ProcessPoolExecutor whose workers do not fork the calling process
+
+    The pipeline starts pools from stage threads (see stage_graph), and
+    forking a process with other threads running can deadlock the child
+    on a lock held by one of them. Workers come from a forkserver (a
+    single-threaded process started once) or, where that is not
+    available, are spawned.
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+
+def chunk_count(xml_file, workers=None):
+    """Number of ranges to split a file into (1 = parse in one piece)
+
+    One range per worker, but only for files of at least CHUNK_MIN_BYTES.
+    workers=None uses the CPU count.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or os.path.getsize(xml_file) < CHUNK_MIN_BYTES:
+        return 1
+    return workers
+
+
+def range_count(xml_file, workers=None):
+    """Number of ranges for streaming a file with iter_ranges (1 = parse in one piece)
+
+    At least one per worker (chunk_count), and ranges of at most about
+    RANGE_MAX_BYTES, so only a few ranges' results are held at a time.
+    """
+    chunks = chunk_count(xml_file, workers)
+    if chunks <= 1:
+        return 1
+    return max(chunks, math.ceil(os.path.getsize(xml_file) / RANGE_MAX_BYTES))
+
+
+def find_element(data, open_tag, start, end=None):
+    """Offset of the next <tag start tag at or after start (-1 if none)"""
+    pos = start
+    while True:
+        pos = data.find(open_tag, pos, end if end is not None else len(data))
+        if pos < 0 or data[pos + len(open_tag):pos + len(open_tag) + 1] in TAG_END:
+            return pos
+        pos += 1
+
+
+def element_ranges(xml_file, tag, chunks):
+    """Split a file into at most chunks byte ranges of whole <tag> elements
+
+    Returns (ranges, namespaces): [(start, end)] in file order, and the
+    xmlns declarations in scope before the first element (needed to parse
+    a range on its own, see read_chunk).
+    """
+    open_tag = b'<' + tag.encode('ascii')
+    close_tag = b'</' + tag.encode('ascii') + b'>'
+
+    with open(xml_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return [], b''
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            first = find_element(data, open_tag, 0)
+            if first < 0:
+                return [], b''
+
+            last = data.rfind(close_tag)
+            end = last + len(close_tag) if last > first else data.rfind(b'</')
+
+            # Innermost declaration wins per prefix
+            declarations = {}
+            for match in NAMESPACE_DECL.finditer(data, 0, first):
+                declarations[match.group(1)] = match.group(0)
+            namespaces = b''.join(declarations.values())
+
+            starts = [first]
+            step = (end - first) // chunks
+            for i in range(1, chunks):
+                pos = find_element(data, open_tag, max(first + i * step, starts[-1] + 1), end)
+                if pos < 0:
+                    break
+                starts.append(pos)
+
+    return list(zip(starts, starts[1:] + [end])), namespaces
+
+
+def read_chunk(xml_file, start, end, namespaces=b''):
+    """One byte range as a standalone document (file object)
+
+    The elements are wrapped in a synthetic CHUNK root that re-declares the
+    original namespaces, so tags resolve exactly as in the full file.
+    """
+    with open(xml_file, 'rb') as f:
+        f.seek(start)
+        body = f.read(end - start)
+    return io.BytesIO(b'<?xml version="1.0" encoding="UTF-8"?>\n<CHUNK' + namespaces + b'>'
+                      + body + b'</CHUNK>')
+
+
+def iter_ranges(function, xml_file, ranges, *args, workers=None):
+    """Yield function(xml_file, start, end, *args) for every range, in range order
+
+    function must be module-level (it runs in a worker process). At most
+    RANGES_IN_FLIGHT ranges per worker are submitted ahead of the one
+    being yielded; workers <= 1 runs in this process.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(ranges))
+
+    if workers <= 1:
+        for start, end in ranges:
+            yield function(xml_file, start, end, *args)
+        return
+
+    remaining = iter(ranges)
+    with process_pool(workers) as pool:
+        pending = deque()
+        for start, end in remaining:
+            pending.append(pool.submit(function, xml_file, start, end, *args))
+            if len(pending) == workers * RANGES_IN_FLIGHT:
+                break
+        while pending:
+            result = pending.popleft().result()
+            next_range = next(remaining, None)
+            if next_range is not None:
+                pending.append(pool.submit(function, xml_file, *next_range, *args))
+            yield result
+            del result  # Not held while the consumer waits for the next range
+
+
+def map_ranges(function, xml_file, ranges, *args, workers=None):
+    """Apply function(xml_file, start, end, *args) to every range
+
+    Results are returned as a list in range order (see iter_ranges).
+    """
+    return list(iter_ranges(function, xml_file, ranges, *args, workers=workers))
@@ -0,0 +1,285 @@
+"""
+CMIF Reader: Streaming access to TEI-CMIF letter metadata
+
+Each correspDesc is turned into a compact letter record as soon as its end
+tag is read, then detached from the tree. Memory use therefore depends on
+the size of a single letter, not on the size of the CMIF file.
+
+Letter record:
+    {
+        'year': 1795 | None,                       # from first sent date@when
+        'sender': {'ref': '...', 'name': '...'} | None,
+        'mentions': [{'ref': '...', 'name': '...'}, ...]
+    }
+
+Parser backends: lxml (precompiled XPath) or the standard library
+ElementTree. Both answer the same named lookups (CMIF_PATHS) with
+identical results. lxml is faster for lookups on a parsed tree, ElementTree
+for streaming (iterparse), so the default depends on the use:
+
+    backend = get_backend()                # 'lxml' if available, else 'etree'
+    backend = get_backend(streaming=True)  # 'etree' (iter_cmif_letters)
+    root = backend.parse('ra-cmif.xml')
+    for corresp in backend.findall(root, 'correspDesc'):
+        sent = backend.find(corresp, 'sent')
+"""
+
+import time
+import xml.etree.ElementTree as ET
+
+from chunked_reader import chunk_count, element_ranges, iter_ranges, range_count, read_chunk
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # optional: the ElementTree backend is used instead
+    lxml_etree = None
+
+NS = {'tei': 'http://www.tei-c.org/ns/1.0'}
+TEI = '{http://www.tei-c.org/ns/1.0}'
+CORRESP_DESC = TEI + 'correspDesc'
+CORRESP_ACTION = TEI + 'correspAction'
+PERS_NAME = TEI + 'persName'
+DATE = TEI + 'date'
+NOTE = TEI + 'note'
+REF = TEI + 'ref'
+
+# Named lookups (valid as ElementPath and as XPath 1.0)
+CMIF_PATHS = {
+    'correspDesc': './/tei:correspDesc',
+    'sent': './/tei:correspAction[@type="sent"]',
+    'persName': './/tei:persName',
+    'placeName': './/tei:placeName',
+    'date': './/tei:date',
+    'note': './/tei:note',
+    'mentionsPerson': './/tei:ref[@type="cmif:mentionsPerson"]',
+    'mentionsBibl': './/tei:ref[@type="cmif:mentionsBibl"]',
+    'mentionsOrg': './/tei:ref[@type="cmif:mentionsOrg"]',
+    'hasLanguage': './/tei:ref[@type="cmif:hasLanguage"]',
+    'isAvailableAsTEIfile': './/tei:ref[@type="cmif:isAvailableAsTEIfile"]',
+    'isPublishedWith': './/tei:ref[@type="cmif:isPublishedWith"]',
+    'hasTextBase': './/tei:ref[@type="cmif:hasTextBase"]'
+}
+
+
+def parse_year(when):
+    """Extract year from ISO date string (None if not parseable)"""
+    if when:
+        try:
+            return int(when[:4])
+        except ValueError:
+            pass
+    return None
+
+
+def source(xml_file):
+    """Path or open file object as accepted by both parsers"""
+    return xml_file if hasattr(xml_file, 'read') else str(xml_file)
+
+
+def letter_record(backend, corresp):
+    """Letter record of one correspDesc element, via the backend's lookups"""
+    sender = year = None
+    sent_action = backend.find(corresp, 'sent')
+    if sent_action is not None:
+        sender_elem = backend.find(sent_action, 'persName')
+        if sender_elem is not None:
+            sender = {'ref': sender_elem.get('ref', ''), 'name': sender_elem.text}
+        date_elem = backend.find(sent_action, 'date')
+        if date_elem is not None:
+            year = parse_year(date_elem.get('when'))
+
+    mentions = []
+    note = backend.find(corresp, 'note')
+    if note is not None:
+        mentions = [{'ref': ref.get('target', ''), 'name': ref.text}
+                    for ref in backend.findall(note, 'mentionsPerson')]
+
+    return {'year': year, 'sender': sender, 'mentions': mentions}
+
+
+class ElementTreeBackend:
+    """Standard library backend (ElementPath lookups)"""
+
+    name = 'etree'
+
+    def parse(self, xml_file):
+        return ET.parse(source(xml_file)).getroot()
+
+    def find(self, elem, query):
+        return elem.find(CMIF_PATHS[query], NS)
+
+    def findall(self, elem, query):
+        return elem.findall(CMIF_PATHS[query], NS)
+
+    def iter_letters(self, xml_file):
+        """Single pass over start/end events; no per-letter path lookups"""
+        context = ET.iterparse(source(xml_file), events=('start', 'end'))
+
+        stack = []
+        corresp = None
+        sent_action = note = None
+        sender_elem = date_elem = None
+        mention_elems = []
+
+        for event, elem in context:
+            tag = elem.tag
+
+            if event == 'start':
+                stack.append(elem)
+
+                if tag == CORRESP_DESC:
+                    corresp = elem
+                    sent_action = note = None
+                    sender_elem = date_elem = None
+                    mention_elems = []
+                elif corresp is None:
+                    continue
+                elif tag == CORRESP_ACTION:
+                    if sent_action is None and elem.get('type') == 'sent':
+                        sent_action = elem
+                elif tag == PERS_NAME:
+                    if sender_elem is None and sent_action is not None and sent_action in stack:
+                        sender_elem = elem
+                elif tag == DATE:
+                    if date_elem is None and sent_action is not None and sent_action in stack:
+                        date_elem = elem
+                elif tag == NOTE:
+                    if note is None:
+                        note = elem
+                elif tag == REF:
+                    if note is not None and note in stack and elem.get('type') == 'cmif:mentionsPerson':
+                        mention_elems.append(elem)
+                continue
+
+            stack.pop()
+            if tag != CORRESP_DESC:
+                continue
+
+            # End of letter: all text is available now
+            sender = None
+            if sender_elem is not None:
+                sender = {'ref': sender_elem.get('ref', ''), 'name': sender_elem.text}
+
+            yield {
+                'year': parse_year(date_elem.get('when')) if date_elem is not None else None,
+                'sender': sender,
+                'mentions': [{'ref': ref.get('target', ''), 'name': ref.text} for ref in mention_elems]
+            }
+
+            # Detach processed letter from its parent so the tree stays small
+            if stack:
+                stack[-1].remove(elem)
+            corresp = None
+
+
+class LxmlBackend:
+    """lxml backend: every lookup is compiled once as an XPath object"""
+
+    name = 'lxml'
+
+    def __init__(self):
+        if lxml_etree is None:
+            raise ImportError("lxml backend requested but lxml is not installed")
+        self.xpaths = {query: lxml_etree.XPath(path, namespaces=NS) for query, path in CMIF_PATHS.items()}
+
+    def parse(self, xml_file):
+        return lxml_etree.parse(source(xml_file)).getroot()
+
+    def find(self, elem, query):
+        result = self.xpaths[query](elem)
+        return result[0] if result else None
+
+    def findall(self, elem, query):
+        return self.xpaths[query](elem)
+
+    def iter_letters(self, xml_file):
+        """iterparse restricted to correspDesc; processed letters are freed"""
+        for _, corresp in lxml_etree.iterparse(source(xml_file), events=('end',), tag=CORRESP_DESC):
+            yield letter_record(self, corresp)
+            corresp.clear()
+            while corresp.getprevious() is not None:
+                del corresp.getparent()[0]
+
+
+BACKENDS = {'etree': ElementTreeBackend, 'lxml': LxmlBackend}
+
+
+def available_backends():
+    """Names of the backends usable in this environment"""
+    return ['etree', 'lxml'] if lxml_etree is not None else ['etree']
+
+
+def get_backend(name=None, streaming=False):
+    """Backend instance by name
+
+    Default: etree for streaming (see benchmark_backends: lxml's iterparse
+    is slower), else lxml when installed.
+    """
+    if name is None:
+        name = 'lxml' if lxml_etree is not None and not streaming else 'etree'
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown CMIF backend {name!r} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+
+def parse_cmif_range(xml_file, start, end, namespaces, backend_name):
+    """Worker: letter records of one correspDesc-aligned byte range"""
+    return list(get_backend(backend_name).iter_letters(read_chunk(xml_file, start, end, namespaces)))
+
+
+def iter_cmif_letters(xml_file, backend=None, workers=1):
+    """Yield one letter record per correspDesc in a single pass
+
+    Mirrors the lookups of the tree-based matcher: the first
+    correspAction[@type="sent"] provides sender (first persName) and year
+    (first date@when); mentions are the cmif:mentionsPerson refs of the
+    first note. backend is a name or instance (default: etree, see
+    get_backend).
+
+    workers > 1 (or None = CPU count) splits large files into
+    correspDesc-aligned byte ranges that are parsed in worker processes;
+    records are still yielded in file order, range by range, with only a
+    few ranges in flight (see chunked_reader.iter_ranges).
+    """
+    if backend is None or isinstance(backend, str):
+        backend = get_backend(backend, streaming=True)
+
+    chunks = range_count(xml_file, workers)
+    if chunks <= 1:
+        yield from backend.iter_letters(xml_file)
+        return
+
+    ranges, namespaces = element_ranges(xml_file, 'correspDesc', chunks)
+    for letters in iter_ranges(parse_cmif_range, xml_file, ranges, namespaces, backend.name,
+                               workers=chunk_count(xml_file, workers)):
+        yield from letters
+
+
+def benchmark_backends(xml_file, backends=None):
+    """Throughput per backend: {name: {'letters', 'stream_s', 'parse_s', 'letters_per_s'}}
+
+    stream_s times iter_letters (phase 2 of the pipeline); parse_s times a
+    full parse plus every CMIF_PATHS lookup on each letter (the analyzer).
+    """
+    results = {}
+    for name in backends or available_backends():
+        backend = get_backend(name)
+
+        start = time.perf_counter()
+        letters = sum(1 for _ in backend.iter_letters(xml_file))
+        stream_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        root = backend.parse(xml_file)
+        for corresp in backend.findall(root, 'correspDesc'):
+            for query in CMIF_PATHS:
+                backend.findall(corresp, query)
+        parse_s = time.perf_counter() - start
+
+        results[name] = {
+            'letters': letters,
+            'stream_s': round(stream_s, 3),
+            'parse_s': round(parse_s, 3),
+            'letters_per_s': round(letters / stream_s) if stream_s else None
+        }
+    return results
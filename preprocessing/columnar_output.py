@@ -0,0 +1,285 @@
+"""
+Columnar Output: Dictionary-encoded, column-oriented form of persons.json
+
+Instead of one object per person, every field is one column of length N
+(number of persons). Repeated strings (roles, years, place names and
+types, occupations) are stored once in string tables and referenced by
+integer code (-1 = field absent); list fields (letter years, places,
+occupations) are flattened into value columns plus a per-person length
+column (person i owns the next lengths[i] values; letter years are
+delta-encoded within each person):
+
+    {
+      "schema":  {"format": "herdata-columnar", "version": 1, "count": N, "columns": {...}},
+      "meta":    {... same as persons.json ...},
+      "strings": {"role": [...], "year": [...], "place_name": [...], ...},
+      "columns": {"id": [...deltas...], "role": [0, 2, ...], "place_coords": "<base64>", ...}
+    }
+
+Numeric IDs are delta-encoded, sndb_url is a template over the ID, and
+place coordinates are a packed little-endian float64 array (lat, lon per
+place; base64), which a browser can wrap in a Float64Array without
+parsing. Fields this schema does not know are kept per row in "extra".
+
+    data = encode_columnar(output_data)
+    decode_columnar(data) == output_data   # exact round trip
+"""
+
+import base64
+import json
+import math
+import sys
+from array import array
+from pathlib import Path
+
+COLUMNAR_FORMAT = 'herdata-columnar'
+COLUMNAR_VERSION = 1
+
+# Column encodings (written to the schema header)
+COLUMNS = {
+    'id': {'type': 'int', 'encoding': 'delta'},  # 'string' list if IDs are not canonical integers
+    'name': {'type': 'string'},
+    'role': {'type': 'code', 'table': 'role'},
+    'normierung': {'type': 'code', 'table': 'normierung'},
+    'sndb_url': {'type': 'template', 'placeholder': '{id}'},
+    'gnd': {'type': 'string', 'nullable': True},
+    'roles': {'type': 'code', 'table': 'roles', 'nullable': True},
+    'letter_count': {'type': 'int', 'absent': 0},
+    'mention_count': {'type': 'int', 'absent': 0},
+    'letter_years': {'type': 'list', 'lengths': 'letter_years_lengths', 'values': 'int', 'encoding': 'delta'},
+    'birth': {'type': 'code', 'table': 'year', 'nullable': True, 'field': 'dates.birth'},
+    'death': {'type': 'code', 'table': 'year', 'nullable': True, 'field': 'dates.death'},
+    'places': {'type': 'list', 'lengths': 'places_lengths',
+               'values': {'place_name': 'code', 'place_type': 'code', 'place_coords': 'float64le[2] base64'}},
+    'occupations': {'type': 'list', 'lengths': 'occupations_lengths',
+                    'values': {'occupation': 'code', 'occupation_type': 'code'}}
+}
+
+# Person fields in persons.json order (see HerDataPipeline.build_person_entry)
+PERSON_FIELDS = ('id', 'name', 'role', 'normierung', 'sndb_url', 'gnd', 'roles', 'letter_count',
+                 'letter_years', 'mention_count', 'dates', 'places', 'occupations')
+
+SNDB_URL_TEMPLATE = 'https://ores.klassik-stiftung.de/ords/f?p=900:2:::::P2_ID:{id}'
+
+ABSENT = -1
+
+
+class StringTable:
+    """Distinct values in first-seen order with their integer codes"""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.codes = {self.key(value): code for code, value in enumerate(self.values)}
+
+    @staticmethod
+    def key(value):
+        return tuple(value) if isinstance(value, list) else value
+
+    def code(self, value):
+        """Code of a value, added on first use; None -> ABSENT"""
+        if value is None:
+            return ABSENT
+        key = self.key(value)
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def value(self, code):
+        return None if code == ABSENT else self.values[code]
+
+
+def pack_floats(values):
+    """Base64 of a little-endian float64 array (None -> NaN)"""
+    packed = array('d', (math.nan if value is None else value for value in values))
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return base64.b64encode(packed.tobytes()).decode('ascii')
+
+
+def unpack_floats(text):
+    """Inverse of pack_floats (NaN -> None)"""
+    packed = array('d')
+    packed.frombytes(base64.b64decode(text))
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return [None if math.isnan(value) else value for value in packed]
+
+
+def integer_ids(persons):
+    """True if every ID is a canonical integer string (delta encoding is exact)"""
+    return all(isinstance(person['id'], str) and person['id'].isdigit() and str(int(person['id'])) == person['id']
+               for person in persons)
+
+
+def encode_columnar(output_data):
+    """Columnar structure of a persons.json structure ({'meta', 'persons'})"""
+    persons = output_data['persons']
+    tables = {name: StringTable() for name in ('role', 'normierung', 'roles', 'year', 'place_name', 'place_type',
+                                               'occupation', 'occupation_type')}
+    columns = {name: [] for name in ('name', 'role', 'normierung', 'gnd', 'roles', 'letter_count', 'mention_count',
+                                     'letter_years', 'birth', 'death', 'place_name', 'place_type',
+                                     'occupation', 'occupation_type')}
+    lengths = {name: [] for name in ('letter_years', 'places', 'occupations')}
+    coords = []
+    sndb_urls = {}
+    extra = {}
+
+    delta_ids = integer_ids(persons)
+    ids = []
+    previous = 0
+    for row, person in enumerate(persons):
+        if delta_ids:
+            ids.append(int(person['id']) - previous)
+            previous = int(person['id'])
+        else:
+            ids.append(person['id'])
+
+        columns['name'].append(person['name'])
+        columns['role'].append(tables['role'].code(person['role']))
+        columns['normierung'].append(tables['normierung'].code(person['normierung']))
+        if person['sndb_url'] != SNDB_URL_TEMPLATE.format(id=person['id']):
+            sndb_urls[str(row)] = person['sndb_url']
+        columns['gnd'].append(person.get('gnd'))
+        columns['roles'].append(tables['roles'].code(person.get('roles')))
+        columns['letter_count'].append(person.get('letter_count', 0))
+        columns['mention_count'].append(person.get('mention_count', 0))
+
+        letter_years = person.get('letter_years', [])
+        columns['letter_years'].extend(year - before for year, before in zip(letter_years, [0] + letter_years))
+        lengths['letter_years'].append(len(letter_years))
+
+        dates = person.get('dates', {})
+        columns['birth'].append(tables['year'].code(dates.get('birth')))
+        columns['death'].append(tables['year'].code(dates.get('death')))
+
+        for place in person.get('places', []):
+            columns['place_name'].append(tables['place_name'].code(place['name']))
+            columns['place_type'].append(tables['place_type'].code(place['type']))
+            coords.extend((place['lat'], place['lon']))
+        lengths['places'].append(len(person.get('places', [])))
+
+        for occupation in person.get('occupations', []):
+            columns['occupation'].append(tables['occupation'].code(occupation['name']))
+            columns['occupation_type'].append(tables['occupation_type'].code(occupation['type']))
+        lengths['occupations'].append(len(person.get('occupations', [])))
+
+        unknown = {key: value for key, value in person.items() if key not in PERSON_FIELDS}
+        if unknown:
+            extra[str(row)] = unknown
+
+    columns['id'] = ids
+    columns['sndb_url'] = {'template': SNDB_URL_TEMPLATE, 'exceptions': sndb_urls}
+    columns['place_coords'] = pack_floats(coords)
+    for name, values in lengths.items():
+        columns[f"{name}_lengths"] = values
+    columns['extra'] = extra
+
+    schema_columns = dict(COLUMNS)
+    if not delta_ids:
+        schema_columns['id'] = {'type': 'string'}
+    return {
+        'schema': {
+            'format': COLUMNAR_FORMAT,
+            'version': COLUMNAR_VERSION,
+            'count': len(persons),
+            'columns': schema_columns
+        },
+        'meta': output_data['meta'],
+        'strings': {name: table.values for name, table in tables.items()},
+        'columns': columns
+    }
+
+
+def decode_columnar(data):
+    """persons.json structure ({'meta', 'persons'}) of a columnar structure"""
+    schema = data.get('schema', {})
+    if schema.get('format') != COLUMNAR_FORMAT or schema.get('version') != COLUMNAR_VERSION:
+        raise ValueError(f"Unsupported columnar data: {schema.get('format')} version {schema.get('version')}")
+
+    tables = {name: StringTable(values) for name, values in data['strings'].items()}
+    columns = data['columns']
+    coords = unpack_floats(columns['place_coords'])
+
+    ids = columns['id']
+    if schema['columns']['id'].get('encoding') == 'delta':
+        absolute = []
+        previous = 0
+        for delta in ids:
+            previous += delta
+            absolute.append(str(previous))
+        ids = absolute
+
+    offsets = {}
+    for name in ('letter_years', 'places', 'occupations'):
+        offsets[name] = [0]
+        for length in columns[f"{name}_lengths"]:
+            offsets[name].append(offsets[name][-1] + length)
+
+    def span(name, row):
+        return range(offsets[name][row], offsets[name][row + 1])
+
+    persons = []
+    for row in range(schema['count']):
+        person = {
+            'id': ids[row],
+            'name': columns['name'][row],
+            'role': tables['role'].value(columns['role'][row]),
+            'normierung': tables['normierung'].value(columns['normierung'][row]),
+            'sndb_url': columns['sndb_url']['exceptions'].get(str(row),
+                                                              columns['sndb_url']['template'].format(id=ids[row]))
+        }
+        if columns['gnd'][row] is not None:
+            person['gnd'] = columns['gnd'][row]
+        if columns['roles'][row] != ABSENT:
+            person['roles'] = list(tables['roles'].value(columns['roles'][row]))
+        if columns['letter_count'][row]:
+            person['letter_count'] = columns['letter_count'][row]
+
+        letter_years = []
+        for i in span('letter_years', row):
+            letter_years.append(columns['letter_years'][i] + (letter_years[-1] if letter_years else 0))
+        if letter_years:
+            person['letter_years'] = letter_years
+        if columns['mention_count'][row]:
+            person['mention_count'] = columns['mention_count'][row]
+
+        dates = {}
+        for field in ('birth', 'death'):
+            if columns[field][row] != ABSENT:
+                dates[field] = tables['year'].value(columns[field][row])
+        if dates:
+            person['dates'] = dates
+
+        places = [{'name': tables['place_name'].value(columns['place_name'][i]),
+                   'lat': coords[2 * i],
+                   'lon': coords[2 * i + 1],
+                   'type': tables['place_type'].value(columns['place_type'][i])}
+                  for i in span('places', row)]
+        if places:
+            person['places'] = places
+
+        occupations = [{'name': tables['occupation'].value(columns['occupation'][i]),
+                        'type': tables['occupation_type'].value(columns['occupation_type'][i])}
+                       for i in span('occupations', row)]
+        if occupations:
+            person['occupations'] = occupations
+
+        person.update(columns['extra'].get(str(row), {}))
+        persons.append(person)
+
+    return {'meta': data['meta'], 'persons': persons}
+
+
+def write_columnar(output_data, path):
+    """Write the columnar form as compact UTF-8 JSON; returns the file size in bytes"""
+    content = json.dumps(encode_columnar(output_data), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    Path(path).write_bytes(content)
+    return len(content)
+
+
+def read_columnar(path):
+    """persons.json structure decoded from a columnar file"""
+    with open(path, encoding='utf-8') as f:
+        return decode_columnar(json.load(f))
@@ -0,0 +1,198 @@
+"""
+Filter Index: Precomputed bitmaps for the map filters
+
+One bitmap per filter value, with bit i standing for the i-th person of
+persons.json (and of shards/index.json, which has the same order):
+
+    roles       - sender / mentioned / both / indirect
+    groups      - occupation group (see occupation_group)
+    years       - persons with at least one letter in that year
+    decades     - persons with at least one letter in that decade
+    undated     - persons without letter years (never excluded by the year filter)
+
+A filter combination is then a few ORs and ANDs instead of a scan over all
+persons. The semantics follow applyFilters() in docs/js/app.js:
+
+    index = FilterIndex.build(output_data['persons'])
+    rows = index.rows(index.query(roles=['sender'], groups=['literary'], years=(1790, 1800)))
+
+Bitmaps are Python ints; on disk they are base64 little-endian bytes.
+The file carries meta.generated of the persons.json it was built with, so
+the map can tell a file left over from another run and scan instead.
+"""
+
+import base64
+import json
+from collections import defaultdict
+from pathlib import Path
+
+FILTER_INDEX_VERSION = 1
+
+ROLE_VALUES = ('sender', 'mentioned', 'both', 'indirect')
+
+# Occupation groups of the map filter (same as OCCUPATION_GROUPS in docs/js/app.js)
+OCCUPATION_GROUPS = {
+    'artistic': ['Schauspielerin', 'Malerin', 'Tänzerin', 'Stempelschneiderin', 'Gemmenschneiderin',
+                 'Bildhauerin', 'Miniaturmalerin', 'Radiererin', 'Stecherin', 'Kupferstecherin', 'Zeichnerin'],
+    'literary': ['Schriftstellerin', 'Übersetzerin', 'Dichterin'],
+    'musical': ['Sängerin', 'Pianistin', 'Komponistin', 'Organistin', 'Harfenistin'],
+    'court': ['Hofdame', 'Oberhofmeisterin', 'Stiftsdame', 'Kammerfrau', 'Prinzessin', 'Fürstin', 'Herzogin'],
+    'education': ['Erzieherin', 'Pädagogin', 'Lehrerin']
+}
+GROUP_VALUES = tuple(OCCUPATION_GROUPS) + ('other', 'none')
+
+
+def occupation_group(person):
+    """Group of the first occupation that belongs to one; 'other' if none does, 'none' without occupations"""
+    occupations = person.get('occupations')
+    if not occupations:
+        return 'none'
+    for occupation in occupations:
+        for group, names in OCCUPATION_GROUPS.items():
+            if occupation['name'] in names:
+                return group
+    return 'other'
+
+
+def matches_filter(person, roles, groups, years=None):
+    """Reference check of one person (a direct port of applyFilters)"""
+    role_match = any(role in person.get('roles', []) or person['role'] == role for role in roles)
+    group_match = occupation_group(person) in groups
+    year_match = True
+    if years and person.get('letter_years'):
+        year_match = any(years[0] <= year <= years[1] for year in person['letter_years'])
+    return role_match and group_match and year_match
+
+
+def bitmap(rows, count):
+    """Bitmap (int) with the given row bits set"""
+    bits = bytearray((count + 7) // 8)
+    for row in rows:
+        bits[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def encode_bitmap(bits, count):
+    """Base64 of a bitmap over count persons (little-endian bytes)"""
+    return base64.b64encode(bits.to_bytes((count + 7) // 8, 'little')).decode('ascii')
+
+
+def decode_bitmap(text):
+    """Inverse of encode_bitmap"""
+    return int.from_bytes(base64.b64decode(text), 'little')
+
+
+class FilterIndex:
+    """Role, occupation group, year and decade bitmaps over the persons list"""
+
+    def __init__(self, count):
+        self.count = count
+        self.roles = dict.fromkeys(ROLE_VALUES, 0)
+        self.groups = dict.fromkeys(GROUP_VALUES, 0)
+        self.years = {}
+        self.decades = {}
+        self.undated = 0
+
+    @classmethod
+    def build(cls, persons):
+        """Index over a persons list (output entries, in output order)"""
+        rows = {'roles': defaultdict(list), 'groups': defaultdict(list), 'years': defaultdict(list),
+                'decades': defaultdict(list)}
+        undated = []
+        for row, person in enumerate(persons):
+            for role in ROLE_VALUES:
+                if person['role'] == role or role in person.get('roles', []):
+                    rows['roles'][role].append(row)
+            rows['groups'][occupation_group(person)].append(row)
+
+            letter_years = person.get('letter_years')
+            if not letter_years:
+                undated.append(row)
+            for year in letter_years or []:
+                rows['years'][year].append(row)
+            for decade in {year - year % 10 for year in letter_years or []}:
+                rows['decades'][decade].append(row)
+
+        index = cls(len(persons))
+        for kind, values in rows.items():
+            getattr(index, kind).update({value: bitmap(value_rows, index.count) for value, value_rows in values.items()})
+        index.undated = bitmap(undated, index.count)
+        return index
+
+    def select(self, bitmaps, values):
+        """OR of the bitmaps of the given values"""
+        bits = 0
+        for value in values:
+            bits |= bitmaps.get(value, 0)
+        return bits
+
+    def year_bits(self, first, last):
+        """Persons with a letter in [first, last]: whole decades, then single years at the edges"""
+        bits = 0
+        year = first
+        while year <= last:
+            if year % 10 == 0 and year + 9 <= last:
+                bits |= self.decades.get(year, 0)
+                year += 10
+            else:
+                bits |= self.years.get(year, 0)
+                year += 1
+        return bits
+
+    def query(self, roles=ROLE_VALUES, groups=GROUP_VALUES, years=None):
+        """Bitmap of persons passing the filters (years: (first, last) or None)"""
+        bits = self.select(self.roles, roles) & self.select(self.groups, groups)
+        if years:
+            bits &= self.year_bits(*years) | self.undated
+        return bits
+
+    def rows(self, bits):
+        """Row numbers (persons list positions) set in a bitmap"""
+        rows = []
+        while bits:
+            low = bits & -bits
+            rows.append(low.bit_length() - 1)
+            bits ^= low
+        return rows
+
+    def to_json(self):
+        """JSON-serializable form (bitmaps as base64)"""
+        def encode_all(bitmaps):
+            return {str(value): encode_bitmap(bits, self.count) for value, bits in sorted(bitmaps.items())}
+
+        return {
+            'version': FILTER_INDEX_VERSION,
+            'count': self.count,
+            'bit_order': 'little',
+            'roles': encode_all(self.roles),
+            'groups': encode_all(self.groups),
+            'years': encode_all(self.years),
+            'decades': encode_all(self.decades),
+            'undated': encode_bitmap(self.undated, self.count)
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        """Index read back from to_json() output"""
+        if data.get('version') != FILTER_INDEX_VERSION:
+            raise ValueError(f"Unsupported filter index version: {data.get('version')}")
+        index = cls(data['count'])
+        index.roles = {value: decode_bitmap(text) for value, text in data['roles'].items()}
+        index.groups = {value: decode_bitmap(text) for value, text in data['groups'].items()}
+        index.years = {int(value): decode_bitmap(text) for value, text in data['years'].items()}
+        index.decades = {int(value): decode_bitmap(text) for value, text in data['decades'].items()}
+        index.undated = decode_bitmap(data['undated'])
+        return index
+
+
+def write_filter_index(persons, path, generated=None):
+    """Build the index for a persons list and write it as compact JSON; returns the file size in bytes
+
+    generated is meta.generated of the persons file, stored to detect stale files.
+    """
+    data = FilterIndex.build(persons).to_json()
+    if generated is not None:
+        data['generated'] = generated
+    content = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    Path(path).write_bytes(content)
+    return len(content)
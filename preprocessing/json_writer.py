@@ -0,0 +1,95 @@
+"""
+JSON Writer: Streaming serialization of persons.json
+
+The output is written one person at a time instead of serializing the
+whole structure in one json.dump call, so persons can come from a
+generator and only one encoded entry is held at once:
+
+    write_persons_json('persons.json', meta, persons)                # indent=2 layout
+    write_persons_json('persons.json', meta, persons, compact=True)  # no whitespace
+
+orjson is used when installed (one C call per person); otherwise the
+standard library json module. Both produce the same bytes as
+json.dump(..., ensure_ascii=False, indent=2) (or compact separators).
+"""
+
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ENCODERS = ('orjson', 'json')
+
+WRITE_BUFFER = 1 << 20  # File buffer for the many small writes
+
+# Bytes around the encoded values (match json.dump with indent=2 / compact separators)
+LAYOUTS = {
+    'indent': {'head': b'{\n  "meta": ', 'persons': b',\n  "persons": [', 'first': b'\n    ',
+               'separator': b',\n    ', 'tail': b'\n  ]\n}', 'empty_tail': b']\n}'},
+    'compact': {'head': b'{"meta":', 'persons': b',"persons":[', 'first': b'',
+                'separator': b',', 'tail': b']}', 'empty_tail': b']}'}
+}
+
+
+# orjson writes floats below 1e-4 and exponents differently from json.dumps (float repr):
+# 0.000041 / 1e-6 / 1e16 against 4.1e-05 / 1e-06 / 1e+16
+FLOAT_HINT = re.compile(rb'0\.0000|\de')
+FLOAT = re.compile(rb'"(?:[^"\\]|\\.)*"|(-?(?:0\.0000\d+|\d+(?:\.\d+)?e-?\d+))')
+
+
+def repr_float(match):
+    if match.group(1) is None:  # A string literal: left as is
+        return match.group(0)
+    return repr(float(match.group(1))).encode('ascii')
+
+
+def default_encoder():
+    """Fastest available encoder name"""
+    return 'orjson' if orjson is not None else 'json'
+
+
+def encode(value, compact=False, encoder=None, level=0):
+    """One value as UTF-8 JSON bytes, indented as if nested level deep (unless compact)"""
+    encoder = encoder or default_encoder()
+    if encoder == 'orjson':
+        if orjson is None:
+            raise ValueError("orjson encoder requested but orjson is not installed")
+        data = orjson.dumps(value, option=None if compact else orjson.OPT_INDENT_2)
+        if FLOAT_HINT.search(data):
+            data = FLOAT.sub(repr_float, data)
+    elif encoder == 'json':
+        if compact:
+            data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        else:
+            data = json.dumps(value, ensure_ascii=False, indent=2).encode('utf-8')
+    else:
+        raise ValueError(f"Unknown JSON encoder '{encoder}' (available: {', '.join(ENCODERS)})")
+
+    # Encoded strings never contain raw newlines, so every newline starts an indented line
+    if level and not compact:
+        data = data.replace(b'\n', b'\n' + b'  ' * level)
+    return data
+
+
+def write_persons_json(path, meta, persons, compact=False, encoder=None):
+    """Write {"meta": meta, "persons": [...]} streaming persons from any iterable
+
+    Returns the number of persons written.
+    """
+    encoder = encoder or default_encoder()
+    layout = LAYOUTS['compact' if compact else 'indent']
+
+    count = 0
+    with open(path, 'wb', buffering=WRITE_BUFFER) as f:
+        f.write(layout['head'])
+        f.write(encode(meta, compact, encoder, level=1))
+        f.write(layout['persons'])
+        for person in persons:
+            f.write(layout['separator'] if count else layout['first'])
+            f.write(encode(person, compact, encoder, level=2))
+            count += 1
+        f.write(layout['tail'] if count else layout['empty_tail'])
+    return count
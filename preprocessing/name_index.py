@@ -0,0 +1,224 @@
+"""
+Name Index: Normalized and fuzzy person-name lookup for CMIF matching
+
+Lookup order for a CMIF name:
+
+1. exact      - lowercased display name (the original fallback)
+2. normalized - diacritics folded, ß -> ss, punctuation, titles and name
+                particles dropped, name parts sorted; covers variant forms
+                (pers_koerp_main rows with LFDNR > 0) as well
+3. fuzzy      - best string similarity among names that share phonetic
+                blocks (Kölner Phonetik per name part) with the query
+
+Blocking keeps fuzzy lookups sub-linear: a query is only compared with
+names sharing the phonetic code of at least one name part, never with
+the whole index. Other persons (men, unknown SEXUS) are indexed as
+competitors: a normalized or fuzzy hit counts only if the best candidate
+is a woman and no other person is (about) as close, so 'Johann
+Schopenhauer' never resolves to Johanna. Results are memoized per query
+name, since CMIF names repeat.
+
+    index = NameIndex()
+    index.add('w1', 'Charlotte von Stein')
+    index.add('m1', 'Josias von Stein', woman=False)
+    index.lookup('Stein, Charlotte v.')   # -> 'w1' (normalized)
+    index.lookup('Charlote von Stein')    # -> 'w1' (fuzzy)
+    index.lookup('Josias Stein')          # -> None (a man)
+"""
+
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+FUZZY_THRESHOLD = 0.88  # Minimum SequenceMatcher ratio of normalized keys
+FUZZY_MARGIN = 0.03     # Runner-up (another person) must score this much lower
+
+# Dropped during normalization: forms of address, ranks, marital markers, particles
+STOPWORDS = {
+    'frau', 'fraulein', 'demoiselle', 'madame', 'mme', 'mad', 'mademoiselle', 'mlle', 'dame', 'lady',
+    'grafin', 'reichsgrafin', 'furstin', 'prinzessin', 'erbprinzessin', 'herzogin', 'grossherzogin',
+    'erbgrossherzogin', 'markgrafin', 'landgrafin', 'konigin', 'kaiserin', 'baronin', 'freifrau',
+    'freiin', 'edle', 'hofratin', 'geheimratin', 'dr', 'prof', 'geb', 'verh', 'verw', 'gesch', 'gen',
+    'von', 'v', 'van', 'de', 'du', 'da', 'di', 'zu', 'zur', 'vom', 'der', 'den', 'la', 'le'
+}
+
+NAME_PART = re.compile(r'[a-z]+')
+
+# Kölner Phonetik
+PHONETIC_CODES = {
+    'a': '0', 'e': '0', 'i': '0', 'j': '0', 'o': '0', 'u': '0', 'y': '0',
+    'b': '1', 'f': '3', 'v': '3', 'w': '3', 'g': '4', 'k': '4', 'q': '4',
+    'l': '5', 'm': '6', 'n': '6', 'r': '7', 's': '8', 'z': '8'
+}
+C_HARD_INITIAL = set('ahkloqrux')  # c -> 4 at the start before these
+C_HARD = set('ahkoqux')            # c -> 4 before these (unless after s/z)
+C_HARD_AFTER_DT = set('csz')       # d/t -> 8 before these
+SZ = set('sz')
+CKQ = set('ckq')
+
+
+def fold(text):
+    """Lowercase ASCII form: diacritics removed, ß -> ss"""
+    text = text.lower().replace('ß', 'ss')
+    return ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+
+
+def name_parts(name):
+    """Folded name parts without titles and particles"""
+    return [part for part in NAME_PART.findall(fold(name or '')) if part not in STOPWORDS]
+
+
+def normalize_name(name):
+    """Order-independent key: sorted name parts ('' if nothing is left)"""
+    return ' '.join(sorted(name_parts(name)))
+
+
+def phonetic_code(word):
+    """Kölner Phonetik code of one folded name part"""
+    digits = []
+    for i, char in enumerate(word):
+        before = word[i - 1] if i > 0 else ''
+        after = word[i + 1] if i + 1 < len(word) else ''
+        if char == 'h':
+            continue
+        if char == 'p':
+            code = '3' if after == 'h' else '1'
+        elif char in 'dt':
+            code = '8' if after in C_HARD_AFTER_DT else '2'
+        elif char == 'c':
+            if i == 0:
+                code = '4' if after in C_HARD_INITIAL else '8'
+            else:
+                code = '4' if after in C_HARD and before not in SZ else '8'
+        elif char == 'x':
+            code = '8' if before in CKQ else '48'
+        else:
+            code = PHONETIC_CODES.get(char, '')
+        digits.append(code)
+
+    # Collapse repeats, then drop vowels except at the start
+    collapsed = []
+    for digit in ''.join(digits):
+        if not collapsed or collapsed[-1] != digit:
+            collapsed.append(digit)
+    return ''.join(digit for i, digit in enumerate(collapsed) if digit != '0' or i == 0)
+
+
+def block_codes(key):
+    """Distinct phonetic codes of a normalized key's parts"""
+    return {phonetic_code(part) for part in key.split()} - {''}
+
+
+def lookup_keys(name):
+    """Index keys a lookup of this name depends on (for incremental re-matching)"""
+    keys = {('name', name.lower())}
+    keys |= {('block', code) for code in block_codes(normalize_name(name))}
+    return keys
+
+
+class NameIndex:
+    """Exact, normalized and blocked fuzzy lookup of woman IDs by name"""
+
+    def __init__(self):
+        self.exact = {}                 # lowercased display name -> woman ID
+        self.normalized = {}            # normalized key -> {person IDs} (women and competitors)
+        self.women = set()              # person IDs that are women
+        self.blocks = defaultdict(set)  # phonetic code -> {normalized keys}
+        self.hits = Counter()           # lookups resolved per tier
+        self.memo = {}                  # query name -> (tier, woman ID)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['memo'] = {}
+        return state
+
+    def add(self, person_id, name, variant=False, woman=True):
+        """Index a display name (or a variant form, which skips the exact tier)
+
+        woman=False indexes a competitor: never returned, but it makes
+        normalized and fuzzy hits on similar women's names ambiguous.
+        """
+        if not name:
+            return
+        self.memo.clear()
+        if woman:
+            self.women.add(person_id)
+            if not variant:
+                self.exact[name.lower()] = person_id
+        key = normalize_name(name)
+        if key:
+            self.normalized.setdefault(key, set()).add(person_id)
+            for code in block_codes(key):
+                self.blocks[code].add(key)
+
+    def __len__(self):
+        return len(self.normalized)
+
+    def candidates(self, key):
+        """Indexed keys sharing a phonetic block with key"""
+        candidates = set()
+        for code in block_codes(key):
+            candidates |= self.blocks.get(code, set())
+        return candidates
+
+    def lookup(self, name):
+        """Woman ID for a CMIF name, or None if no tier gives an unambiguous match"""
+        if not name:
+            return None
+        if name not in self.memo:
+            self.memo[name] = self.resolve(name)
+        tier, woman_id = self.memo[name]
+        if tier:
+            self.hits[tier] += 1
+        return woman_id
+
+    def resolve(self, name):
+        """(tier, woman ID) for a name; (None, None) if there is no unambiguous match"""
+        woman_id = self.exact.get(name.lower())
+        if woman_id is not None:
+            return 'exact', woman_id
+
+        key = normalize_name(name)
+        person_ids = self.normalized.get(key)
+        if person_ids:
+            person_id = next(iter(person_ids))
+            if len(person_ids) == 1 and person_id in self.women:
+                return 'normalized', person_id
+            return None, None  # Same normalized name for several persons, or a competitor's name
+
+        # Fuzzy: only multi-part names, only within shared blocks
+        if ' ' not in key:
+            return None, None
+        scores = {}
+        matcher = SequenceMatcher(None, b=key)  # seq2 is preprocessed once
+        for candidate in sorted(self.candidates(key)):
+            matcher.set_seq1(candidate)
+            if matcher.real_quick_ratio() < FUZZY_THRESHOLD or matcher.quick_ratio() < FUZZY_THRESHOLD:
+                continue
+            score = matcher.ratio()
+            if score >= FUZZY_THRESHOLD:
+                for candidate_id in self.normalized[candidate]:
+                    scores[candidate_id] = max(score, scores.get(candidate_id, 0.0))
+        if not scores:
+            return None, None
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        if ranked[0][0] not in self.women:
+            return None, None
+        if len(ranked) > 1 and ranked[1][1] > ranked[0][1] - FUZZY_MARGIN:
+            return None, None
+        return 'fuzzy', ranked[0][0]
+
+    def changed_lookup_keys(self, old):
+        """Lookup keys whose result may differ between an older index and this one"""
+        keys = set()
+        for name in old.exact.keys() | self.exact.keys():
+            if old.exact.get(name) != self.exact.get(name):
+                keys.add(('name', name))
+        for key in old.normalized.keys() | self.normalized.keys():
+            old_persons = {(person_id, person_id in old.women) for person_id in old.normalized.get(key, ())}
+            persons = {(person_id, person_id in self.women) for person_id in self.normalized.get(key, ())}
+            if old_persons != persons:
+                keys |= {('block', code) for code in block_codes(key)}
+        return keys
@@ -0,0 +1,231 @@
+"""
+Name Search: Prefix and trigram search over person names
+
+Every person has several name forms: the display name, VORNAMEN and
+NACHNAME on their own, and the variant forms (pers_koerp_main rows with
+LFDNR > 0). Each form is folded (see name_index.fold) and reduced to its
+words ('Vulpius, Christiane' -> 'vulpius christiane'). Two structures
+answer queries without scanning all names:
+
+    prefix array   - (name, word start) pairs sorted by the text from the
+                     word start on; all names with a word starting with the
+                     query are one contiguous range (binary search)
+    trigrams       - name numbers per trigram of ' name '; substring
+                     lookups intersect the postings of the query's trigrams,
+                     typo-tolerant lookups rank names by shared trigrams
+                     (Jaccard similarity of the trigram sets)
+
+    index = NameSearch.build([('43779', ['Christiane Vulpius', 'Christiane', 'Vulpius']), ...])
+    index.complete('vulp')          # person IDs, names with a word starting with 'vulp'
+    index.substring('lpiu')         # ... names containing 'lpiu'
+    index.similar('Vulpious')       # [(similarity, person ID)], best first
+    index.search('christ vulp')     # prefix hits first, then similar names
+
+to_json() stores the same index for the static site (trigram postings as
+delta-encoded varints, see text_index); docs/js/name-search.js queries it.
+"""
+
+import base64
+import json
+import re
+from array import array
+from collections import Counter, defaultdict
+from itertools import chain
+from pathlib import Path
+
+from name_index import fold
+from text_index import decode_varints, encode_varints
+
+NAME_SEARCH_VERSION = 1
+
+WORD = re.compile(r'[a-z0-9]+')
+SIMILARITY_THRESHOLD = 0.3  # Minimum Jaccard similarity of trigram sets
+DEFAULT_LIMIT = 10
+
+
+def normalize(name):
+    """Folded words of a name joined by single spaces"""
+    return ' '.join(WORD.findall(fold(name or '')))
+
+
+def trigrams(text, padded=True):
+    """Distinct trigrams of a normalized text (padded: with word boundary at both ends)"""
+    if padded:
+        text = f" {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameSearch:
+    """Sorted word-start prefix array plus trigram postings over name forms"""
+
+    def __init__(self):
+        self.ids = []                  # person number -> person ID
+        self.names = []                # name number -> normalized name form
+        self.owners = array('I')       # name number -> person number
+        self.sizes = array('H')        # name number -> number of distinct trigrams
+        self.prefix_names = array('I')  # prefix array: name number ...
+        self.prefix_starts = array('H')  # ... and word start, sorted by names[n][start:]
+        self.postings = {}             # trigram -> array of name numbers (ascending)
+
+    @classmethod
+    def build(cls, persons):
+        """Index over (person ID, [name forms]) pairs; duplicate forms of a person count once"""
+        index = cls()
+        postings = defaultdict(list)
+        for person_id, forms in persons:
+            forms = [name for name in dict.fromkeys(map(normalize, forms)) if name]
+            if not forms:
+                continue
+            person = len(index.ids)
+            index.ids.append(person_id)
+            for name in forms:
+                number = len(index.names)
+                index.names.append(name)
+                index.owners.append(person)
+                name_trigrams = trigrams(name)
+                index.sizes.append(len(name_trigrams))
+                for trigram in name_trigrams:
+                    postings[trigram].append(number)
+
+        starts = [(number, match.start()) for number, name in enumerate(index.names)
+                  for match in WORD.finditer(name)]
+        starts.sort(key=lambda entry: (index.names[entry[0]][entry[1]:], entry[0]))
+        index.prefix_names = array('I', (number for number, _ in starts))
+        index.prefix_starts = array('H', (start for _, start in starts))
+        index.postings = {trigram: array('I', numbers) for trigram, numbers in sorted(postings.items())}
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def suffix(self, position):
+        return self.names[self.prefix_names[position]][self.prefix_starts[position]:]
+
+    def lower_bound(self, value, low=0):
+        """First position whose suffix is not less than value (bisect_left has key= only from 3.10)"""
+        high = len(self.prefix_names)
+        while low < high:
+            middle = (low + high) // 2
+            if self.suffix(middle) < value:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def prefix_range(self, prefix):
+        """Positions in the prefix array whose text starts with prefix"""
+        start = self.lower_bound(prefix)
+        return range(start, self.lower_bound(prefix + '\uffff', start))
+
+    def persons(self, name_numbers, limit=None):
+        """Distinct person IDs of name numbers, in the given order"""
+        result = []
+        seen = set()
+        for number in name_numbers:
+            person = self.owners[number]
+            if person not in seen:
+                seen.add(person)
+                result.append(self.ids[person])
+                if limit and len(result) == limit:
+                    break
+        return result
+
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        """Person IDs with a name form containing a word that starts with prefix (may span words)"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        return self.persons((self.prefix_names[position] for position in self.prefix_range(prefix)), limit)
+
+    def substring(self, text, limit=None):
+        """Person IDs with a name form containing text (in name order)"""
+        text = normalize(text)
+        if not text:
+            return []
+        if len(text) < 3:  # Shorter than a trigram: every name containing it has a trigram containing it
+            candidates = set(chain.from_iterable(numbers for trigram, numbers in self.postings.items() if text in trigram))
+        else:
+            lists = sorted((self.postings.get(trigram, ()) for trigram in trigrams(text, padded=False)), key=len)
+            candidates = set(lists[0]).intersection(*lists[1:])
+        return self.persons((number for number in sorted(candidates) if text in self.names[number]), limit)
+
+    def similar(self, text, limit=DEFAULT_LIMIT, threshold=SIMILARITY_THRESHOLD):
+        """[(similarity, person ID)] of the best name form per person, best first"""
+        text = normalize(text)
+        if not text:
+            return []
+        query = trigrams(text)
+        shared = Counter(chain.from_iterable(self.postings.get(trigram, ()) for trigram in query))
+        minimum = threshold * len(query)  # |union| >= |query|, so fewer shared trigrams cannot reach threshold
+        best = {}
+        for number, count in shared.items():
+            if count < minimum:
+                continue
+            score = count / (len(query) + self.sizes[number] - count)
+            person = self.owners[number]
+            if score >= threshold and score > best.get(person, 0.0):
+                best[person] = score
+        ranked = sorted(best.items(), key=lambda entry: (-entry[1], entry[0]))
+        return [(round(score, 4), self.ids[person]) for person, score in ranked[:limit]]
+
+    def search(self, text, limit=DEFAULT_LIMIT):
+        """Person IDs for a search box: word-prefix hits first, then similar names"""
+        result = self.complete(text, limit)
+        if len(result) < limit:
+            result += [person_id for _, person_id in self.similar(text, limit + len(result))
+                       if person_id not in result]
+        return result[:limit]
+
+    def to_json(self):
+        """JSON-serializable form (prefix array and trigram postings as varints, base64)"""
+        prefix = bytearray()
+        encode_varints(chain.from_iterable(zip(self.prefix_names, self.prefix_starts)), prefix)
+        postings = bytearray()
+        lengths = []
+        for numbers in self.postings.values():
+            start = len(postings)
+            encode_varints((number - before for number, before in zip(numbers, chain((0,), numbers))), postings)
+            lengths.append(len(postings) - start)
+        return {
+            'version': NAME_SEARCH_VERSION,
+            'ids': self.ids,
+            'names': self.names,
+            'owners': list(self.owners),
+            'prefix': base64.b64encode(prefix).decode('ascii'),
+            'trigrams': list(self.postings),
+            'lengths': lengths,
+            'postings': base64.b64encode(postings).decode('ascii')
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        """Index read back from to_json() output"""
+        if data.get('version') != NAME_SEARCH_VERSION:
+            raise ValueError(f"Unsupported name search version: {data.get('version')}")
+        index = cls()
+        index.ids = data['ids']
+        index.names = data['names']
+        index.owners = array('I', data['owners'])
+        index.sizes = array('H', (len(trigrams(name)) for name in index.names))
+        prefix = decode_varints(base64.b64decode(data['prefix']))
+        index.prefix_names = array('I', prefix[0::2])
+        index.prefix_starts = array('H', prefix[1::2])
+        postings = base64.b64decode(data['postings'])
+        start = 0
+        for trigram, length in zip(data['trigrams'], data['lengths']):
+            deltas = decode_varints(postings, start, start + length)
+            numbers = array('I')
+            number = 0
+            for delta in deltas:
+                number += delta
+                numbers.append(number)
+            index.postings[trigram] = numbers
+            start += length
+        return index
+
+
+def write_name_search(index, path):
+    """Write the index as compact JSON; returns the file size in bytes"""
+    content = json.dumps(index.to_json(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    Path(path).write_bytes(content)
+    return len(content)
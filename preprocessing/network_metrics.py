@@ -0,0 +1,386 @@
+"""
+Network Metrics: Position of every person in the SNDB relationship graph
+
+Computed over the whole relationship graph (see relationship_graph), as
+an undirected simple graph (several AGRELON types between two persons
+count as one link):
+
+    degree        - number of linked persons
+    component     - connected component (0 = largest), with its size
+    pagerank      - PageRank (damping 0.85), 1.0 = average person
+    betweenness   - normalized betweenness, estimated from sampled sources (Brandes)
+
+PageRank stands in for eigenvector centrality: the graph falls apart into
+many family trees, where the power iteration for eigenvector centrality
+needs thousands of steps (tiny spectral gaps) and the damped PageRank
+iteration converges in under 100.
+
+Backends: numpy (whole-array operations, used when installed) or the
+standard library (the same iterations over the CSR arrays, one slice sum
+per node). Both produce the same values. Betweenness runs one
+breadth-first search per sampled source: with numpy level-synchronous
+(each BFS level and its back-propagation are array operations over the
+edges leaving the level), otherwise node by node (Brandes):
+
+    metrics = NetworkMetrics.build(graph)
+    metrics.person('43779')     # {'degree': 16, 'degree_by_category': {...}, 'pagerank': 3.0037, ...}
+    metrics.ranking('pagerank', women_ids, limit=10)
+
+benchmark() times graph and metric build on the graph scaled by copying
+it (default 10x).
+"""
+
+import random
+import time
+from array import array
+from collections import Counter, deque
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:  # optional: the standard library backend is used instead
+    np = None
+
+from relationship_graph import RelationshipGraph
+
+BACKENDS = ('numpy', 'python')
+
+DAMPING = 0.85
+TOLERANCE = 1e-10         # per node, summed absolute change between iterations
+MAX_ITERATIONS = 200
+BETWEENNESS_SAMPLES = 1000  # BFS sources for the betweenness estimate
+BENCHMARK_FACTOR = 10
+BENCHMARK_BUDGET_S = 15.0  # graph + metrics build on the scaled graph
+
+
+def available_backends():
+    """Names of the backends usable in this environment"""
+    return ['numpy', 'python'] if np is not None else ['python']
+
+
+def default_backend():
+    return 'numpy' if np is not None else 'python'
+
+
+def simple_adjacency(graph):
+    """CSR offsets/targets of a RelationshipGraph with parallel edges merged"""
+    offsets = array('I', [0])
+    targets = array('I')
+    for node in range(len(graph)):
+        previous = None
+        for target in graph.targets[graph.offsets[node]:graph.offsets[node + 1]]:
+            if target != previous:  # targets are sorted within a node
+                targets.append(target)
+                previous = target
+        offsets.append(len(targets))
+    return offsets, targets
+
+
+def converged(new, old):
+    return sum(abs(a - b) for a, b in zip(new, old)) < len(new) * TOLERANCE
+
+
+# ============================================================
+# Standard library backend
+# ============================================================
+
+def python_components(offsets, targets):
+    """Smallest node of each node's component (union-find)"""
+    parent = list(range(len(offsets) - 1))
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for node in range(len(parent)):
+        for target in targets[offsets[node]:offsets[node + 1]]:
+            root, other = find(node), find(target)
+            if root != other:
+                parent[max(root, other)] = min(root, other)
+    return [find(node) for node in range(len(parent))]
+
+
+def python_pagerank(offsets, targets):
+    n = len(offsets) - 1
+    degree = [end - start for start, end in zip(offsets, offsets[1:])]
+    bounds = list(zip(offsets, offsets[1:]))
+    rank = [1.0 / n] * n
+    for _ in range(MAX_ITERATIONS):
+        share = [value / count if count else 0.0 for value, count in zip(rank, degree)]
+        dangling = sum(value for value, count in zip(rank, degree) if not count)
+        base = (1 - DAMPING) / n + DAMPING * dangling / n
+        # Sum over each node's edge slice as a difference of prefix sums over all edges
+        prefix = [0.0, *accumulate(map(share.__getitem__, targets))]
+        new = [base + DAMPING * (prefix[end] - prefix[start]) for start, end in bounds]
+        done = converged(new, rank)
+        rank = new
+        if done:
+            break
+    return rank
+
+
+# ============================================================
+# NumPy backend
+# ============================================================
+
+def numpy_arrays(offsets, targets):
+    offsets = np.frombuffer(offsets, dtype=np.uint32).astype(np.int64)
+    targets = np.frombuffer(targets, dtype=np.uint32).astype(np.int64)
+    degree = np.diff(offsets)
+    sources = np.repeat(np.arange(len(degree)), degree)
+    return degree, sources, targets
+
+
+def numpy_components(offsets, targets):
+    degree, sources, targets = numpy_arrays(offsets, targets)
+    labels = np.arange(len(degree))
+    while True:
+        new = labels.copy()
+        np.minimum.at(new, sources, labels[targets])
+        new = new[new]  # pointer jumping
+        if np.array_equal(new, labels):
+            return labels.tolist()
+        labels = new
+
+
+def numpy_adjacency(graph):
+    """simple_adjacency() with array operations: repeated (node, target) pairs are dropped"""
+    offsets = np.asarray(graph.offsets, dtype=np.int64)
+    targets = np.asarray(graph.targets, dtype=np.int64)
+    sources = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    keep = np.ones(len(targets), dtype=bool)
+    keep[1:] = (targets[1:] != targets[:-1]) | (sources[1:] != sources[:-1])  # targets are sorted within a node
+    degree = np.bincount(sources[keep], minlength=len(offsets) - 1)
+    simple_offsets = np.concatenate(([0], np.cumsum(degree)))
+    return array('I', simple_offsets.astype(np.uint32).tobytes()), array('I', targets[keep].astype(np.uint32).tobytes())
+
+
+def numpy_pagerank(offsets, targets):
+    degree, sources, targets = numpy_arrays(offsets, targets)
+    n = len(degree)
+    rank = np.full(n, 1.0 / n)
+    for _ in range(MAX_ITERATIONS):
+        share = np.divide(rank, degree, out=np.zeros(n), where=degree > 0)
+        base = (1 - DAMPING) / n + DAMPING * rank[degree == 0].sum() / n
+        new = base + DAMPING * np.bincount(sources, weights=share[targets], minlength=n)
+        done = np.abs(new - rank).sum() < n * TOLERANCE
+        rank = new
+        if done:
+            break
+    return rank.tolist()
+
+
+def numpy_betweenness(offsets, targets, sources):
+    """Unnormalized betweenness sums over the given BFS sources, one array operation per BFS level"""
+    offsets = np.frombuffer(offsets, dtype=np.uint32).astype(np.int64)
+    targets = np.frombuffer(targets, dtype=np.uint32).astype(np.int64)
+    n = len(offsets) - 1
+    centrality = np.zeros(n)
+    distance = np.full(n, -1, dtype=np.int64)
+    paths = np.zeros(n)
+    dependency = np.zeros(n)
+    for source in sources:
+        distance[source] = 0
+        paths[source] = 1.0
+        frontier = np.array([source])
+        visited = [frontier]
+        levels = []  # (node, target) edges from each level to the next
+        depth = 0
+        while True:
+            # All edges leaving the frontier: slices of the CSR arrays, gathered in one index array
+            starts = offsets[frontier]
+            counts = offsets[frontier + 1] - starts
+            total = int(counts.sum())
+            if not total:
+                break
+            edge_starts = np.repeat(starts - np.cumsum(counts) + counts, counts)
+            nodes = np.repeat(frontier, counts)
+            reached = targets[edge_starts + np.arange(total)]
+            new = reached[distance[reached] < 0]
+            if not len(new):
+                break
+            depth += 1
+            frontier = np.unique(new)
+            distance[frontier] = depth
+            on_path = distance[reached] == depth
+            nodes, reached = nodes[on_path], reached[on_path]
+            np.add.at(paths, reached, paths[nodes])
+            levels.append((nodes, reached))
+            visited.append(frontier)
+
+        for nodes, reached in reversed(levels):
+            np.add.at(dependency, nodes, paths[nodes] / paths[reached] * (1 + dependency[reached]))
+        dependency[source] = 0.0
+        centrality += dependency
+
+        # Reset only what this search touched
+        touched = np.concatenate(visited)
+        distance[touched] = -1
+        paths[touched] = 0.0
+        dependency[touched] = 0.0
+    return centrality.tolist()
+
+
+def python_betweenness(offsets, targets, sources):
+    """Unnormalized betweenness sums over the given BFS sources (Brandes)"""
+    centrality = [0.0] * (len(offsets) - 1)
+    for source in sources:
+        distance = {source: 0}
+        paths = {source: 1}
+        predecessors = {source: []}
+        order = []
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for target in targets[offsets[node]:offsets[node + 1]]:
+                if target not in distance:
+                    distance[target] = distance[node] + 1
+                    paths[target] = 0
+                    predecessors[target] = []
+                    queue.append(target)
+                if distance[target] == distance[node] + 1:
+                    paths[target] += paths[node]
+                    predecessors[target].append(node)
+
+        dependency = dict.fromkeys(order, 0.0)
+        for node in reversed(order):
+            for predecessor in predecessors[node]:
+                dependency[predecessor] += paths[predecessor] / paths[node] * (1 + dependency[node])
+            if node != source:
+                centrality[node] += dependency[node]
+    return centrality
+
+
+ALGORITHMS = {
+    'python': (python_components, python_pagerank, python_betweenness),
+    'numpy': (numpy_components, numpy_pagerank, numpy_betweenness)
+}
+
+
+def sampled_betweenness(offsets, targets, samples=BETWEENNESS_SAMPLES, seed=0, backend='python'):
+    """Normalized betweenness estimated from BFS of sampled sources (Brandes)"""
+    n = len(offsets) - 1
+    nodes = range(n)
+    sources = nodes if samples >= n else random.Random(seed).sample(nodes, samples)
+    centrality = ALGORITHMS[backend][2](offsets, targets, sources)
+
+    # Scale the sample to all sources, count each undirected path once, normalize by (n-1)(n-2)/2 pairs
+    scale = n / len(sources) / ((n - 1) * (n - 2)) if n > 2 and len(sources) else 0.0
+    return [value * scale for value in centrality]
+
+
+class NetworkMetrics:
+    """Degree, component, PageRank and betweenness per graph node"""
+
+    def __init__(self, graph, backend=None):
+        self.graph = graph
+        self.backend = backend or default_backend()
+        self.degree = []
+        self.components = []       # node -> component (0 = largest)
+        self.component_sizes = []  # component -> persons
+        self.pagerank = []
+        self.betweenness = []
+
+    @classmethod
+    def build(cls, graph, backend=None, samples=BETWEENNESS_SAMPLES, seed=0):
+        """Metrics for every person of a RelationshipGraph"""
+        metrics = cls(graph, backend)
+        if metrics.backend not in ALGORITHMS:
+            raise ValueError(f"Unknown network backend {metrics.backend!r} (choose from {', '.join(BACKENDS)})")
+        if metrics.backend == 'numpy' and np is None:
+            raise ValueError("numpy backend requested but numpy is not installed")
+        if not len(graph):
+            return metrics
+
+        components, pagerank, _ = ALGORITHMS[metrics.backend]
+        n = len(graph)
+        if metrics.backend == 'numpy':
+            offsets, targets = numpy_adjacency(graph)
+            metrics.degree = np.diff(np.frombuffer(offsets, dtype=np.uint32)).tolist()
+        else:
+            offsets, targets = simple_adjacency(graph)
+            metrics.degree = [offsets[node + 1] - offsets[node] for node in range(n)]
+
+        # Components numbered by size (largest first), ties by smallest member
+        roots = components(offsets, targets)
+        sizes = Counter(roots)
+        numbering = {root: number for number, root in enumerate(sorted(sizes, key=lambda root: (-sizes[root], root)))}
+        metrics.components = [numbering[root] for root in roots]
+        metrics.component_sizes = [sizes[root] for root in sorted(sizes, key=numbering.get)]
+
+        metrics.pagerank = [value * n for value in pagerank(offsets, targets)]
+        metrics.betweenness = sampled_betweenness(offsets, targets, samples, seed, metrics.backend)
+        return metrics
+
+    def degree_by_category(self, node):
+        """{AGRELON category: links} of one node (every typed edge counts)"""
+        graph = self.graph
+        categories = Counter(graph.relation(graph.label_ids[label]).get('category') or 'unbekannt'
+                             for _, label in graph.edges(node))
+        return dict(sorted(categories.items()))
+
+    def person(self, person_id):
+        """Metrics of one person (None if the person has no relationships)"""
+        node = self.graph.nodes.get(person_id)
+        if node is None:
+            return None
+        component = self.components[node]
+        return {
+            'degree': self.degree[node],
+            'degree_by_category': self.degree_by_category(node),
+            'component': component,
+            'component_size': self.component_sizes[component],
+            'pagerank': round(self.pagerank[node], 4),
+            'betweenness': round(self.betweenness[node], 6)
+        }
+
+    def ranking(self, metric, person_ids=None, limit=None):
+        """[(value, person ID)] by one metric, highest first (optionally among given persons)"""
+        values = getattr(self, metric)
+        nodes = self.graph.nodes
+        if person_ids is None:
+            candidates = range(len(self.graph))
+        else:
+            candidates = [nodes[person_id] for person_id in person_ids if person_id in nodes]
+        ranked = sorted(((values[node], self.graph.ids[node]) for node in candidates),
+                        key=lambda entry: (-entry[0], entry[1]))
+        return ranked[:limit] if limit else ranked
+
+
+def scale_relations(relations, factor):
+    """relations copied factor times under new IDs ('<id>-<copy>'), copies chained by one link each"""
+    relations = list(relations)
+    scaled = []
+    for copy in range(factor):
+        suffix = f"-{copy}" if copy else ''
+        scaled.extend((id1 + suffix, id2 + suffix, label1, label2) for id1, id2, label1, label2 in relations)
+        if copy and relations:
+            anchor = relations[0][0]
+            scaled.append((anchor + suffix, anchor + (f"-{copy - 1}" if copy > 1 else ''), '1010', '1010'))
+    return scaled
+
+
+def benchmark(relations, vocabulary=None, factor=BENCHMARK_FACTOR, backends=None):
+    """Build times on the graph scaled by factor: {backend: {'persons', 'edges', 'graph_s', 'metrics_s', 'total_s'}}"""
+    scaled = scale_relations(relations, factor)
+    results = {}
+    for backend in backends or available_backends():
+        start = time.perf_counter()
+        graph = RelationshipGraph.build(scaled, vocabulary)
+        graph_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        NetworkMetrics.build(graph, backend)
+        metrics_s = time.perf_counter() - start
+
+        results[backend] = {
+            'persons': len(graph),
+            'edges': graph.edge_count,
+            'graph_s': round(graph_s, 3),
+            'metrics_s': round(metrics_s, 3),
+            'total_s': round(graph_s + metrics_s, 3)
+        }
+    return results
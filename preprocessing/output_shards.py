@@ -0,0 +1,103 @@
+"""
+Output Shards: Split persons.json into an index, meta and detail shards
+
+Pages load only what they render instead of the full persons.json:
+
+    shards/index.json          - list view and map: one compact entry per
+                                 person (first place only, occupation group)
+    shards/meta.json           - output meta (counts, timeline) plus the
+                                 shard layout (version, bucket count)
+    shards/persons/NN.json     - full person entries, hash-bucketed by ID
+
+A detail page computes the bucket of its ID with the same hash as
+shard_bucket() (32-bit FNV-1a over the UTF-8 ID; the bucket count is in
+meta.json) and fetches one small file. The single-file persons.json is
+written as before; shards are an additional output.
+"""
+
+import json
+from pathlib import Path
+
+from filter_index import occupation_group
+
+SHARD_VERSION = 1
+DEFAULT_BUCKETS = 64
+
+FNV_OFFSET = 0x811c9dc5
+FNV_PRIME = 0x01000193
+
+# Person fields copied into index entries as-is (places/occupations are reduced)
+INDEX_FIELDS = ('id', 'name', 'role', 'gnd', 'letter_count', 'mention_count', 'letter_years', 'dates')
+
+
+def shard_bucket(person_id, buckets=DEFAULT_BUCKETS):
+    """Detail shard number of a person ID (32-bit FNV-1a, stable across runs and in JS)"""
+    value = FNV_OFFSET
+    for byte in str(person_id).encode('utf-8'):
+        value = ((value ^ byte) * FNV_PRIME) & 0xffffffff
+    return value % buckets
+
+
+def shard_path(buckets, bucket):
+    """Relative path of a detail shard (zero-padded to the bucket count's width)"""
+    return f"persons/{bucket:0{len(str(buckets - 1))}d}.json"
+
+
+def index_entry(person):
+    """Compact index entry: what the map and list views need"""
+    entry = {field: person[field] for field in INDEX_FIELDS if field in person}
+    if person.get('places'):
+        entry['places'] = person['places'][:1]  # Map marker position
+    entry['occupation_group'] = occupation_group(person)  # Map filter group, computed once here
+    return entry
+
+
+def write_json(path, data):
+    """Compact UTF-8 JSON; returns the file size in bytes"""
+    content = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    path.write_bytes(content)
+    return len(content)
+
+
+def write_shards(output_data, shard_dir, buckets=DEFAULT_BUCKETS):
+    """Write index, meta and detail shards for a persons.json structure
+
+    Detail shards left over from a run with more buckets are removed.
+    Returns {relative path: size in bytes}.
+    """
+    if buckets < 1:
+        raise ValueError(f"Need at least one detail bucket, got {buckets}")
+    shard_dir = Path(shard_dir)
+    (shard_dir / 'persons').mkdir(parents=True, exist_ok=True)
+
+    shards = [{} for _ in range(buckets)]
+    for person in output_data['persons']:
+        shards[shard_bucket(person['id'], buckets)][person['id']] = person
+
+    sizes = {
+        'index.json': write_json(shard_dir / 'index.json', {
+            'version': SHARD_VERSION,
+            'persons': [index_entry(person) for person in output_data['persons']]
+        }),
+        'meta.json': write_json(shard_dir / 'meta.json', dict(output_data['meta'], shards={
+            'version': SHARD_VERSION,
+            'buckets': buckets
+        }))
+    }
+    for bucket, persons in enumerate(shards):
+        path = shard_path(buckets, bucket)
+        sizes[path] = write_json(shard_dir / path, {'version': SHARD_VERSION, 'persons': persons})
+
+    for stale in (shard_dir / 'persons').glob('*.json'):
+        if f"persons/{stale.name}" not in sizes:
+            stale.unlink()
+    return sizes
+
+
+def load_person(shard_dir, person_id):
+    """Full entry of one person read from its detail shard (None if absent)"""
+    shard_dir = Path(shard_dir)
+    with open(shard_dir / 'meta.json', encoding='utf-8') as f:
+        buckets = json.load(f)['shards']['buckets']
+    with open(shard_dir / shard_path(buckets, shard_bucket(person_id, buckets)), encoding='utf-8') as f:
+        return json.load(f)['persons'].get(person_id)
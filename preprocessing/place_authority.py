@@ -0,0 +1,131 @@
+"""
+Place Authority: SNDB places by normalized authority ID (GeoNames, GND, ...)
+
+geo_links links every SNDB place to external resources (URL, NORM_ID,
+QUELLE). Links to authority files are normalized to 'scheme:id' keys
+(from the URL where its form is known, else from NORM_ID), so the same
+place is found from an SNDB place ID, a GeoNames URL in CMIF
+placeName@ref or a GND URL with one dict lookup in each direction:
+
+    authorities = PlaceAuthorities.build(links, has_coords)
+    authorities.keys('77200')                             # ['geonames:2661881', 'gnd:4000018-7']
+    authorities.place_for('http://www.geonames.org/2661881')   # '77200'
+    authorities.canonical('77200')                        # merged place ID
+
+SNDB places sharing an authority key are one place: they are merged
+(transitively) into a canonical place, the first of them in ID order with
+coordinates. Links to other resources (Wikipedia, regional portals) are
+not authority keys and never merge places.
+"""
+
+import re
+from collections import defaultdict
+
+from relationship_graph import id_order
+
+# QUELLE -> scheme of the authority keys
+SOURCES = {
+    'GeoNames': 'geonames',
+    'GND': 'gnd',
+    'GOV': 'gov',
+    'Wikidata': 'wikidata',
+    'Getty Thesaurus of Geographic Names': 'tgn'
+}
+
+# scheme -> ID in the resource URL
+URL_PATTERNS = {
+    'geonames': re.compile(r'geonames\.org/(\d+)'),
+    'gnd': re.compile(r'd-nb\.info/gnd/([0-9X-]+)'),
+    'gov': re.compile(r'gov\.genealogy\.net/(?:item/show/)?([A-Z0-9_]+)'),
+    'wikidata': re.compile(r'wikidata\.org/(?:wiki|entity)/(Q\d+)'),
+    'tgn': re.compile(r'(?:vocab\.getty\.edu/(?:page/)?tgn/|TGNFullDisplay\?.*subjectid=)(\d+)')
+}
+
+
+def authority_key(url, norm_id=None, source=None):
+    """'scheme:id' of an authority URL (None for other resources)
+
+    With QUELLE given, only that scheme is considered; the URL wins over
+    NORM_ID, which is missing or mistyped in some rows.
+    """
+    if source is None:
+        schemes = list(URL_PATTERNS)
+    elif source in SOURCES:
+        schemes = [SOURCES[source]]
+    else:
+        return None
+    for scheme in schemes:
+        match = URL_PATTERNS[scheme].search(url or '')
+        if match:
+            return f"{scheme}:{match.group(1)}"
+        if norm_id and source:
+            return f"{scheme}:{norm_id}"
+    return None
+
+
+def read_place_links(table):
+    """(place ID, URL, NORM_ID, QUELLE) rows of a geo_links SNDBTable"""
+    for row in range(len(table)):
+        yield tuple(table.get(row, field) for field in ('ID', 'URL', 'NORM_ID', 'QUELLE'))
+
+
+class PlaceAuthorities:
+    """Hash indexes SNDB place ID <-> authority key, plus merged places"""
+
+    def __init__(self):
+        self.place_keys = defaultdict(list)    # place ID -> [authority keys]
+        self.key_places = defaultdict(list)    # authority key -> [place IDs]
+        self.canonical_ids = {}                # place ID -> canonical place ID (merged places only)
+        self.groups = {}                       # canonical place ID -> [place IDs] (merged places only)
+
+    @classmethod
+    def build(cls, links, has_coords=lambda place_id: True):
+        """Index over (place ID, URL, NORM_ID, QUELLE) rows; has_coords picks canonical places"""
+        authorities = cls()
+        for place_id, url, norm_id, source in links:
+            key = authority_key(url, norm_id, source)
+            if place_id and key and key not in authorities.place_keys.get(place_id, ()):
+                authorities.place_keys[place_id].append(key)
+                authorities.key_places[key].append(place_id)
+
+        # Places sharing a key: connected components over (place, key) links
+        seen = set()
+        for place_id in sorted(authorities.place_keys, key=id_order):
+            if place_id in seen:
+                continue
+            group = []
+            stack = [place_id]
+            seen.add(place_id)
+            while stack:
+                current = stack.pop()
+                group.append(current)
+                for key in authorities.place_keys[current]:
+                    for other in authorities.key_places[key]:
+                        if other not in seen:
+                            seen.add(other)
+                            stack.append(other)
+            if len(group) > 1:
+                group.sort(key=id_order)
+                canonical = next((member for member in group if has_coords(member)), group[0])
+                authorities.groups[canonical] = group
+                for member in group:
+                    authorities.canonical_ids[member] = canonical
+        return authorities
+
+    def __len__(self):
+        return len(self.place_keys)
+
+    def canonical(self, place_id):
+        """Canonical place ID of a place (the place itself unless merged)"""
+        return self.canonical_ids.get(place_id, place_id)
+
+    def keys(self, place_id):
+        """Authority keys of a place and of all places merged with it"""
+        members = self.groups.get(self.canonical(place_id), [place_id])
+        return list(dict.fromkeys(key for member in members for key in self.place_keys.get(member, ())))
+
+    def place_for(self, ref):
+        """Canonical SNDB place ID of an authority URL or 'scheme:id' key (None if unknown)"""
+        key = ref if ref in self.key_places else authority_key(ref)
+        places = self.key_places.get(key)
+        return self.canonical(places[0]) if places else None
@@ -0,0 +1,192 @@
+"""
+Point Clusters: Precomputed hierarchical map clusters per zoom level
+
+Builds the same kind of cluster pyramid as MapLibre's client-side
+clustering (supercluster), once at build time. Each person with a place
+is a point at the coordinates of her first place. Points are merged level
+by level, from max_zoom down to min_zoom: a node absorbs all unmerged nodes
+of the level below within the cluster radius (40 px at 512 px tiles, as
+clusterRadius in docs/js/app.js). Neighbours are found through a uniform
+grid with one radius per cell, so every level is linear in its node count.
+
+    pyramid = ClusterPyramid.build(output_data['persons'])
+    pyramid.levels[5]               # [{'lon', 'lat', 'count', 'roles': {...}}, ...]
+    pyramid.counts(5, rows)         # node counts for a filtered subset of persons
+
+The pyramid is stored as a tree (leaf node of every person at max_zoom,
+parent node of every node at the next lower zoom), so the frontend can
+recount any filtered subset without re-clustering. Like filters.json, the
+file carries meta.generated of its persons.json, so the map can tell a
+file left over from another run.
+"""
+
+import json
+import math
+from collections import defaultdict
+from pathlib import Path
+
+CLUSTER_VERSION = 1
+
+CLUSTER_RADIUS = 40  # px (clusterRadius in docs/js/app.js)
+TILE_EXTENT = 512    # px per tile
+MIN_ZOOM = 0
+MAX_ZOOM = 10        # clusterMaxZoom in docs/js/app.js: above, all points are shown individually
+
+ROLE_VALUES = ('sender', 'mentioned', 'both', 'indirect')
+
+
+def project(lon, lat):
+    """Web Mercator position in [0, 1] x [0, 1]"""
+    sin = math.sin(math.radians(lat))
+    y = 0.5 - 0.25 * math.log((1 + sin) / (1 - sin)) / math.pi
+    return lon / 360 + 0.5, min(max(y, 0.0), 1.0)
+
+
+def unproject(x, y):
+    """Inverse of project: (lon, lat)"""
+    lat = math.degrees(2 * math.atan(math.exp((1 - 2 * y) * math.pi)) - math.pi / 2)
+    return (x - 0.5) * 360, lat
+
+
+def cluster_level(nodes, radius):
+    """Merge nodes [(x, y, count, roles)] within radius of each other
+
+    Returns (merged nodes, parent index of every input node).
+    """
+    grid = defaultdict(list)
+    for i, (x, y, _, _) in enumerate(nodes):
+        grid[int(x / radius), int(y / radius)].append(i)
+
+    merged = []
+    parents = [-1] * len(nodes)
+    radius2 = radius * radius
+    for i, (x, y, count, roles) in enumerate(nodes):
+        if parents[i] >= 0:
+            continue
+        parent = parents[i] = len(merged)
+
+        cell_x, cell_y = int(x / radius), int(y / radius)
+        weight_x, weight_y = x * count, y * count
+        total = count
+        roles = dict(roles)
+        for cx in (cell_x - 1, cell_x, cell_x + 1):
+            for cy in (cell_y - 1, cell_y, cell_y + 1):
+                for j in grid.get((cx, cy), ()):
+                    if parents[j] >= 0:
+                        continue
+                    other_x, other_y, other_count, other_roles = nodes[j]
+                    if (other_x - x) ** 2 + (other_y - y) ** 2 <= radius2:
+                        parents[j] = parent
+                        weight_x += other_x * other_count
+                        weight_y += other_y * other_count
+                        total += other_count
+                        for role, role_count in other_roles.items():
+                            roles[role] = roles.get(role, 0) + role_count
+        merged.append((weight_x / total, weight_y / total, total, roles))
+    return merged, parents
+
+
+class ClusterPyramid:
+    """Cluster nodes per zoom level with the tree linking them"""
+
+    def __init__(self, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, radius=CLUSTER_RADIUS, extent=TILE_EXTENT):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.radius = radius
+        self.extent = extent
+        self.levels = {}   # zoom -> [{'lon', 'lat', 'count', 'roles'}]
+        self.leaves = []   # person row -> node at max_zoom (-1 without place)
+        self.parents = {}  # zoom -> node at zoom -> node at zoom - 1
+
+    @classmethod
+    def build(cls, persons, **options):
+        """Pyramid over the first place of every person (output entries, in output order)"""
+        pyramid = cls(**options)
+        nodes = []
+        rows = []
+        for row, person in enumerate(persons):
+            places = person.get('places')
+            if places and places[0].get('lat') is not None and places[0].get('lon') is not None:
+                x, y = project(places[0]['lon'], places[0]['lat'])
+                nodes.append((x, y, 1, {person['role']: 1}))
+                rows.append(row)
+
+        pyramid.leaves = [-1] * len(persons)
+        for zoom in range(pyramid.max_zoom, pyramid.min_zoom - 1, -1):
+            nodes, parents = cluster_level(nodes, pyramid.radius / (pyramid.extent * 2 ** zoom))
+            if zoom == pyramid.max_zoom:
+                for row, node in zip(rows, parents):
+                    pyramid.leaves[row] = node
+            else:
+                pyramid.parents[zoom + 1] = parents
+            pyramid.levels[zoom] = [pyramid.node_entry(*node) for node in nodes]
+        return pyramid
+
+    @staticmethod
+    def node_entry(x, y, count, roles):
+        lon, lat = unproject(x, y)
+        return {'lon': round(lon, 5), 'lat': round(lat, 5), 'count': count,
+                'roles': {role: roles[role] for role in ROLE_VALUES if roles.get(role)}}
+
+    def nodes(self, zoom, rows):
+        """Node of each given person row at a zoom level (rows without place are skipped)"""
+        nodes = [self.leaves[row] for row in rows if self.leaves[row] >= 0]
+        for level in range(self.max_zoom, zoom, -1):
+            parents = self.parents[level]
+            nodes = [parents[node] for node in nodes]
+        return nodes
+
+    def counts(self, zoom, rows):
+        """Member count per node of a zoom level for a subset of person rows"""
+        counts = [0] * len(self.levels[zoom])
+        for node in self.nodes(zoom, rows):
+            counts[node] += 1
+        return counts
+
+    def to_json(self):
+        """Column-per-field form of the levels plus the tree"""
+        def level_columns(nodes):
+            columns = {field: [node[field] for node in nodes] for field in ('lon', 'lat', 'count')}
+            for role in ROLE_VALUES:
+                columns[role] = [node['roles'].get(role, 0) for node in nodes]
+            return columns
+
+        return {
+            'version': CLUSTER_VERSION,
+            'min_zoom': self.min_zoom,
+            'max_zoom': self.max_zoom,
+            'radius': self.radius,
+            'extent': self.extent,
+            'leaves': self.leaves,
+            'parents': {str(zoom): parents for zoom, parents in sorted(self.parents.items())},
+            'levels': {str(zoom): level_columns(nodes) for zoom, nodes in sorted(self.levels.items())}
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        """Pyramid read back from to_json() output"""
+        if data.get('version') != CLUSTER_VERSION:
+            raise ValueError(f"Unsupported cluster pyramid version: {data.get('version')}")
+        pyramid = cls(data['min_zoom'], data['max_zoom'], data['radius'], data['extent'])
+        pyramid.leaves = data['leaves']
+        pyramid.parents = {int(zoom): parents for zoom, parents in data['parents'].items()}
+        for zoom, columns in data['levels'].items():
+            pyramid.levels[int(zoom)] = [
+                {'lon': lon, 'lat': lat, 'count': count,
+                 'roles': {role: columns[role][i] for role in ROLE_VALUES if columns[role][i]}}
+                for i, (lon, lat, count) in enumerate(zip(columns['lon'], columns['lat'], columns['count']))
+            ]
+        return pyramid
+
+
+def write_clusters(persons, path, generated=None):
+    """Build the pyramid for a persons list and write it as compact JSON; returns the file size in bytes
+
+    generated is meta.generated of the persons file, stored to detect stale files.
+    """
+    data = ClusterPyramid.build(persons).to_json()
+    if generated is not None:
+        data['generated'] = generated
+    content = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    Path(path).write_bytes(content)
+    return len(content)
@@ -0,0 +1,181 @@
+"""
+Relationship Graph: SNDB person relationships in compressed sparse row form
+
+pers_koerp_beziehungen links two persons with one AGRELON relation type
+per direction (ID1 -> ID2: AGRELON_ID1, ID2 -> ID1: AGRELON_ID2), typed
+through the vocabulary in nsl_agrelon. The graph holds every relationship
+of the SNDB, not only those of women. Persons are numbered in ID order,
+and the edges of node i are the slice offsets[i]:offsets[i + 1] of two
+flat arrays (target node, AGRELON label code), so neighbours are one
+slice and k-hop queries a breadth-first search over the arrays:
+
+    graph = RelationshipGraph.build(relations, vocabulary)
+    graph.neighbors('43779')        # [('2475', '4100'), ...] (person ID, AGRELON ID)
+    graph.k_hop('43779', 2)         # {person ID: hops} within 2 steps
+    graph.relation('4100')          # {'type': 'hat Ehepartner', 'category': 'Verwandtschaft', 'inverse': '4100'}
+
+Per edge this costs 4 bytes (target) plus 2 bytes (label), per person 4
+bytes (offset) plus the ID lookup.
+"""
+
+import json
+from array import array
+from collections import deque
+from pathlib import Path
+
+RELATIONSHIP_VERSION = 1
+
+
+def read_vocabulary(table):
+    """{AGRELON ID: {'type', 'category', 'inverse'}} from an nsl_agrelon SNDBTable (keyed by IDENT)"""
+    vocabulary = {}
+    for ident in table.keys():
+        record = table.first(ident)
+        vocabulary[ident] = {
+            'type': record.get('BEZIEHUNG'),
+            'category': record.get('KATEGORIE'),
+            'inverse': record.get('CORRIDENT')
+        }
+    return vocabulary
+
+
+def read_relations(table):
+    """(ID1, ID2, AGRELON_ID1, AGRELON_ID2) rows of a pers_koerp_beziehungen SNDBTable"""
+    for row in range(len(table)):
+        yield tuple(table.get(row, field) for field in ('ID1', 'ID2', 'AGRELON_ID1', 'AGRELON_ID2'))
+
+
+def id_order(person_id):
+    """Sort key: numeric order for SNDB IDs, lexicographic within the same length"""
+    return len(person_id), person_id
+
+
+class RelationshipGraph:
+    """Directed, labelled adjacency in CSR form (both directions of every relationship)"""
+
+    def __init__(self, vocabulary=None):
+        self.vocabulary = vocabulary or {}
+        self.ids = []           # node -> person ID (sorted by id_order)
+        self.nodes = {}         # person ID -> node
+        self.label_ids = [None]  # label code -> AGRELON ID (code 0 = unknown)
+        self.offsets = array('I', [0])
+        self.targets = array('I')
+        self.labels = array('H')
+
+    @classmethod
+    def build(cls, relations, vocabulary=None):
+        """Graph over (ID1, ID2, AGRELON_ID1, AGRELON_ID2) tuples
+
+        A missing AGRELON ID is taken from the inverse of the other
+        direction; duplicate edges and self-links are dropped.
+        """
+        graph = cls(vocabulary)
+        label_codes = {None: 0}
+        edges = set()
+        for id1, id2, label1, label2 in relations:
+            if not id1 or not id2 or id1 == id2:
+                continue
+            label1 = label1 or graph.relation(label2).get('inverse')
+            label2 = label2 or graph.relation(label1).get('inverse')
+            for label in (label1, label2):
+                if label not in label_codes:
+                    label_codes[label] = len(graph.label_ids)
+                    graph.label_ids.append(label)
+            edges.add((id1, id2, label_codes[label1]))
+            edges.add((id2, id1, label_codes[label2]))
+
+        graph.ids = sorted({person_id for edge in edges for person_id in edge[:2]}, key=id_order)
+        graph.nodes = {person_id: node for node, person_id in enumerate(graph.ids)}
+
+        # Edges sorted by (source, target, label) fill the CSR arrays in order
+        counts = array('I', bytes(4 * (len(graph.ids) + 1)))
+        for source, target, label in sorted((graph.nodes[source], graph.nodes[target], label)
+                                            for source, target, label in edges):
+            counts[source + 1] += 1
+            graph.targets.append(target)
+            graph.labels.append(label)
+        for node in range(len(graph.ids)):
+            counts[node + 1] += counts[node]
+        graph.offsets = counts
+        return graph
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, person_id):
+        return person_id in self.nodes
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def nbytes(self):
+        """Size of the CSR arrays in bytes (without the ID lookup)"""
+        return sum(len(values) * values.itemsize for values in (self.offsets, self.targets, self.labels))
+
+    def relation(self, agrelon_id):
+        """Vocabulary entry of an AGRELON ID ({} if unknown)"""
+        return self.vocabulary.get(agrelon_id, {})
+
+    def edges(self, node):
+        """(target node, label code) of one node"""
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return zip(self.targets[start:end], self.labels[start:end])
+
+    def degree(self, person_id):
+        node = self.nodes.get(person_id)
+        return 0 if node is None else self.offsets[node + 1] - self.offsets[node]
+
+    def neighbors(self, person_id, relations=None):
+        """[(person ID, AGRELON ID)] of one person, in ID order (relations: AGRELON IDs to keep)"""
+        node = self.nodes.get(person_id)
+        if node is None:
+            return []
+        return [(self.ids[target], self.label_ids[label]) for target, label in self.edges(node)
+                if relations is None or self.label_ids[label] in relations]
+
+    def k_hop(self, person_id, k, relations=None):
+        """{person ID: hops} of all persons reachable in 1..k steps"""
+        start = self.nodes.get(person_id)
+        if start is None:
+            return {}
+        allowed = None
+        if relations is not None:
+            allowed = {code for code, agrelon_id in enumerate(self.label_ids) if agrelon_id in relations}
+
+        hops = {start: 0}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            if hops[node] == k:
+                continue
+            for target, label in self.edges(node):
+                if target not in hops and (allowed is None or label in allowed):
+                    hops[target] = hops[node] + 1
+                    queue.append(target)
+        del hops[start]
+        return {self.ids[node]: distance for node, distance in hops.items()}
+
+
+def write_relationships(women, vocabulary, path):
+    """Write the resolved relationships of all women with the AGRELON types used
+
+    {"version", "types": {AGRELON ID: {type, category, inverse}},
+     "persons": {woman ID: [{"id", "name", "agrelon"}]},
+     "network": {woman ID: {degree, ..., pagerank, betweenness}}} as compact JSON;
+    returns the file size in bytes.
+    """
+    persons = {}
+    network = {woman_id: woman_data['network'] for woman_id, woman_data in women.items() if woman_data.get('network')}
+    used = set()
+    for woman_id, woman_data in women.items():
+        if woman_data.get('relationships'):
+            persons[woman_id] = [{'id': relationship['id'], 'name': relationship['name'],
+                                  'agrelon': relationship['agrelon']}
+                                 for relationship in woman_data['relationships']]
+            used.update(relationship['agrelon'] for relationship in woman_data['relationships'])
+    types = {agrelon_id: vocabulary[agrelon_id] for agrelon_id in sorted(used, key=str) if agrelon_id in vocabulary}
+    data = {'version': RELATIONSHIP_VERSION, 'types': types, 'persons': persons, 'network': network}
+    content = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    Path(path).write_bytes(content)
+    return len(content)
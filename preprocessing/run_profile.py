@@ -0,0 +1,159 @@
+"""
+Run Profile: Per-stage metrics of a pipeline run (build_herdata.py --profile)
+
+Collects, for every stage of the run (see stage_graph):
+
+    wall_s, cpu_s          - wall clock and CPU time of the stage's thread
+    alloc_peak_mb          - peak Python allocations above the stage start
+                             (tracemalloc; None before Python 3.9, which has no reset_peak)
+    alloc_net_mb           - allocations still held when the stage ends
+
+and, for every input file, records, bytes read (source file or cache
+entry), seconds and records per second. The run totals add peak RSS of
+the process and of worker processes, and the hit rates of the table and
+stage caches. to_json() is the machine-readable form written next to the
+output; with cprofile_dir, each stage is also profiled with cProfile
+(one <stage>.prof per stage, for pstats or snakeviz).
+
+    profile = RunProfile(cprofile_dir)
+    profile.start()
+    with profile.stage('women'):
+        ...
+    profile.record_input('pers_koerp_main.xml', records=24000, seconds=0.3, bytes_read=9800000)
+    profile.stop()
+    write_profile(profile, path, caches={'tables': table_cache})
+
+Stage attribution is exact when stages run one at a time; the pipeline
+runs them that way while profiling (table parsing still uses workers).
+"""
+
+import cProfile
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+PROFILE_VERSION = 1
+MB = 1024 * 1024
+
+
+def peak_rss_mb():
+    """{'self': MB, 'children': MB} peak resident set size (None without the resource module)"""
+    if resource is None:
+        return None
+    unit = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss: bytes on macOS, KB elsewhere
+    return {who: round(resource.getrusage(flag).ru_maxrss * unit / MB, 1)
+            for who, flag in (('self', resource.RUSAGE_SELF), ('children', resource.RUSAGE_CHILDREN))}
+
+
+def hit_rate(cache):
+    """{hits, misses, hit_rate} of a cache with hits/misses counters"""
+    lookups = cache.hits + cache.misses
+    return {
+        'hits': cache.hits,
+        'misses': cache.misses,
+        'hit_rate': round(cache.hits / lookups, 3) if lookups else None
+    }
+
+
+class RunProfile:
+    """Stage and input metrics of one run"""
+
+    def __init__(self, cprofile_dir=None):
+        self.cprofile_dir = Path(cprofile_dir) if cprofile_dir else None
+        self.stages = {}   # stage name -> metrics (in completion order)
+        self.inputs = {}   # input file name -> metrics
+        self.totals = {}
+        self.started = None
+        self.alloc_peak = 0  # Run peak so far (reset_peak also resets the run's peak)
+
+    def start(self):
+        """Start tracing allocations and the run clocks"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.started = (time.perf_counter(), time.process_time())
+
+    def stop(self):
+        """Stop tracing; records run totals"""
+        wall, cpu = self.started
+        _, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, self.alloc_peak)
+        tracemalloc.stop()
+        self.totals = {
+            'wall_s': round(time.perf_counter() - wall, 3),
+            'cpu_s': round(time.process_time() - cpu, 3),
+            'alloc_peak_mb': round(peak / MB, 1),
+            'rss_peak_mb': peak_rss_mb()
+        }
+
+    @contextmanager
+    def stage(self, name):
+        """Measure one stage (and dump its cProfile stats if enabled)"""
+        stage_peak = hasattr(tracemalloc, 'reset_peak')
+        if stage_peak:
+            tracemalloc.reset_peak()
+        start_alloc, _ = tracemalloc.get_traced_memory()
+        profiler = cProfile.Profile() if self.cprofile_dir else None
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu
+            end_alloc, peak = tracemalloc.get_traced_memory()
+            self.alloc_peak = max(self.alloc_peak, peak)
+            self.stages[name] = {
+                'wall_s': round(wall, 4),
+                'cpu_s': round(cpu, 4),
+                'alloc_peak_mb': round((peak - start_alloc) / MB, 2) if stage_peak else None,
+                'alloc_net_mb': round((end_alloc - start_alloc) / MB, 2)
+            }
+            if profiler:
+                self.cprofile_dir.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(self.cprofile_dir / f"{name}.prof")
+
+    def record_input(self, name, records, seconds, bytes_read, source='parsed'):
+        """Throughput of one input file (source: 'parsed' or 'cache')"""
+        self.inputs[name] = {
+            'source': source,
+            'records': records,
+            'bytes_read': bytes_read,
+            'seconds': round(seconds, 4),
+            'records_per_s': round(records / seconds) if seconds > 0 else None,
+            'mb_per_s': round(bytes_read / MB / seconds, 1) if seconds > 0 else None
+        }
+
+    def to_json(self, caches=None, critical_path=None):
+        """JSON-serializable metrics; caches maps names to objects with hits/misses counters"""
+        data = {
+            'version': PROFILE_VERSION,
+            'totals': self.totals,
+            'stages': self.stages,
+            'inputs': self.inputs,
+            'caches': {name: hit_rate(cache) for name, cache in (caches or {}).items() if cache is not None}
+        }
+        if critical_path:
+            seconds, path = critical_path
+            data['critical_path'] = {'seconds': round(seconds, 3), 'stages': path}
+        if self.cprofile_dir:
+            data['cprofile_dir'] = str(self.cprofile_dir)
+        return data
+
+
+def write_profile(profile, path, caches=None, critical_path=None):
+    """Write the metrics JSON; returns the file size in bytes"""
+    content = json.dumps(profile.to_json(caches, critical_path), indent=2).encode('utf-8')
+    Path(path).write_bytes(content)
+    return len(content)
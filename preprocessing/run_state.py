@@ -0,0 +1,51 @@
+"""
+Run State: Record state of the previous pipeline run for incremental rebuilds
+
+The state holds what is needed to diff new inputs against the last run:
+source fingerprints, one digest per record key for every SNDB table, the
+compact CMIF letter records with their matches, and the previous women
+records and person entries. It is pickled next to the table cache.
+"""
+
+import hashlib
+import pickle
+from pathlib import Path
+
+STATE_VERSION = 6
+
+
+def digest(value):
+    """Stable short digest of a table value (repr is deterministic for our tables)"""
+    return hashlib.blake2b(repr(value).encode('utf-8'), digest_size=8).digest()
+
+
+def table_digests(table):
+    """{key: digest} for a dict-shaped table"""
+    return {key: digest(value) for key, value in table.items()}
+
+
+def changed_keys(old, new):
+    """Keys that were added, removed or map to a different value (None is a value)"""
+    return {key for key in old.keys() | new.keys() if key not in old or key not in new or old[key] != new[key]}
+
+
+def load_state(state_file):
+    """Load run state, or None if missing, unreadable or from another version"""
+    try:
+        with open(state_file, 'rb') as f:
+            state = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, AttributeError, ImportError):
+        return None  # Import/AttributeError (incl. ModuleNotFoundError): a pickled class was moved or removed
+    if not isinstance(state, dict) or state.get('version') != STATE_VERSION:
+        return None
+    return state
+
+
+def save_state(state_file, state):
+    """Atomically write run state"""
+    state_file = Path(state_file)
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = state_file.with_suffix('.tmp')
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(dict(state, version=STATE_VERSION), f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_file.replace(state_file)
@@ -0,0 +1,230 @@
+"""
+SNDB Reader: Streaming access to flat SNDB XML exports
+
+All SNDB exports share the same shape: a root element with one <ITEM>
+per record, each holding a handful of leaf elements. Readers:
+
+- iter_sndb_items: walks the file with iterparse and clears every ITEM
+  after use, so peak memory stays flat regardless of export size.
+- scan_sndb_items: matches the memory-mapped bytes against one regular
+  expression per export and yields value tuples; several times faster.
+  Input that does not have the flat shape is read through ElementTree.
+- scan_sndb_chunks: splits large exports into ITEM-aligned byte ranges
+  and scans them in parallel worker processes.
+"""
+
+import mmap
+import os
+import re
+import xml.etree.ElementTree as ET
+
+from chunked_reader import chunk_count, element_ranges, iter_ranges, process_pool
+
+ITEM_DTD = re.compile(r'<!ELEMENT\s+ITEM\s*\(([^)]*)\)\s*>')
+ENCODING_DECL = re.compile(r'<\?xml[^>]*encoding\s*=\s*["\']([\w.-]+)["\']')
+ENTITY_PATTERN = re.compile(r'&(#x[0-9a-fA-F]+|#[0-9]+|amp|lt|gt|quot|apos);')
+ENTITIES = {'amp': '&', 'lt': '<', 'gt': '>', 'quot': '"', 'apos': "'"}
+
+
+def iter_sndb_items(xml_file, fields=None):
+    """Yield one SNDB record at a time as {FIELD: text}
+
+    Missing leaf elements are absent from the record, so callers use
+    record.get('X', default) where they previously checked find('X').
+    If fields is given, only those columns are kept.
+    """
+    keep = set(fields) if fields else None
+    context = ET.iterparse(str(xml_file), events=('start', 'end'))
+
+    # First event is the start of the root element
+    _, root = next(context)
+
+    for event, elem in context:
+        if event != 'end' or elem.tag != 'ITEM':
+            continue
+
+        if keep is None:
+            record = {child.tag: child.text for child in elem}
+        else:
+            record = {child.tag: child.text for child in elem if child.tag in keep}
+
+        yield record
+
+        # Drop the processed ITEM (and its reference from root)
+        elem.clear()
+        root.clear()
+
+
+def read_header(xml_file, size=4096):
+    """First bytes of an export decoded as text (XML declaration and inline DTD)"""
+    with open(xml_file, 'rb') as f:
+        return f.read(size).decode('utf-8', errors='replace')
+
+
+def dtd_fields(header):
+    """ITEM field names declared in an inline DTD (None if absent)"""
+    match = ITEM_DTD.search(header)
+    if not match:
+        return None
+    return tuple(field.strip().rstrip('?*+') for field in match.group(1).split(','))
+
+
+def read_dtd_fields(xml_file):
+    """Field names declared for ITEM in the export's inline DTD (None if absent)"""
+    return dtd_fields(read_header(xml_file))
+
+
+def item_pattern(dtd, fields):
+    """Regex matching one flat ITEM with leaves in DTD order (each optional)
+
+    Only the requested fields are captured, so groups come out in DTD order.
+    """
+    parts = [rb'<ITEM\b[^>]*>\s*']
+    for field in dtd:
+        tag = re.escape(field.encode('ascii'))
+        value = rb'([^<]*)' if field in fields else rb'[^<]*'
+        parts.append(rb'(?:<' + tag + rb'>' + value + rb'</' + tag + rb'>\s*)?')
+    parts.append(rb'</ITEM\s*>')
+    return re.compile(b''.join(parts))
+
+
+def replace_entity(match):
+    name = match.group(1)
+    if name.startswith('#x'):
+        return chr(int(name[2:], 16))
+    if name.startswith('#'):
+        return chr(int(name[1:]))
+    return ENTITIES[name]
+
+
+def decode_text(raw):
+    """Leaf text as ElementTree reports it: entities resolved, newlines normalized"""
+    text = raw.decode('utf-8')
+    if '&' in text:
+        text = ENTITY_PATTERN.sub(replace_entity, text)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+def parse_items(fragment, fields):
+    """Tuples for the ITEM elements of a fragment, parsed by ElementTree"""
+    root = ET.fromstring(b'<FRAGMENT>' + fragment + b'</FRAGMENT>')
+    for elem in root.iter('ITEM'):
+        record = {child.tag: child.text for child in elem}
+        yield tuple(record.get(field) for field in fields)
+
+
+def scan_layout(xml_file, fields=None):
+    """(fields, dtd) for the scanner; dtd is None if the export is not flat
+
+    fields defaults to all DTD fields. Flat means: inline DTD declaring
+    ITEM, UTF-8, no entity declarations.
+    """
+    header = read_header(xml_file)
+    dtd = dtd_fields(header)
+    fields = tuple(fields) if fields else dtd
+    encoding = ENCODING_DECL.search(header)
+
+    flat = (dtd is not None and set(fields) <= set(dtd) and '<!ENTITY' not in header
+            and (encoding is None or encoding.group(1).lower() in ('utf-8', 'utf8')))
+    return fields, (dtd if flat else None)
+
+
+def scan_sndb_items(xml_file, fields=None, start=0, end=None):
+    """Yield one SNDB record at a time as a tuple of field values
+
+    Fast path for the flat export shape: the memory-mapped file is matched
+    against one regex per export, built from the DTD field order, so leaf
+    values are extracted without building elements. Values come in the
+    order of fields (default: all DTD fields), None where the leaf is
+    missing or empty - the same values iter_sndb_items reports.
+
+    ITEMs the regex does not match (attributes or children on a leaf,
+    CDATA, comments, fields out of DTD order) are left between two matches
+    and parsed with ElementTree, so records keep their file order. Exports
+    without an inline DTD, in another encoding, or with entity
+    declarations go through iter_sndb_items entirely.
+
+    start/end restrict the scan to a byte range of whole ITEMs (see
+    chunked_reader.element_ranges); ranges require the flat shape.
+    """
+    fields, dtd = scan_layout(xml_file, fields)
+    if dtd is None:
+        if start or end is not None:
+            raise ValueError(f"{xml_file} is not a flat SNDB export; byte ranges are not supported")
+        for record in iter_sndb_items(xml_file, fields=fields):
+            yield tuple(record.get(field) for field in fields)
+        return
+
+    # Groups come out in DTD order; reorder if fields were requested otherwise
+    captured = [field for field in dtd if field in fields]
+    order = None if tuple(captured) == fields else [captured.index(field) for field in fields]
+    pattern = item_pattern(dtd, fields)
+
+    with open(xml_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if end is None:
+                end = data.rfind(b'</')  # root end tag
+            plain = data.find(b'&', start, end) < 0 and data.find(b'\r', start, end) < 0
+            position = start
+            for match in pattern.finditer(data, start, end):
+                if data.find(b'<ITEM', position, match.start()) >= 0:
+                    yield from parse_items(data[position:match.start()], fields)
+                position = match.end()
+
+                if plain:
+                    values = [raw.decode('utf-8') if raw else None for raw in match.groups()]
+                else:
+                    values = [decode_text(raw) if raw else None for raw in match.groups()]
+                if order is not None:
+                    values = [values[i] for i in order]
+                yield tuple(values)
+
+            # Trailing ITEMs the pattern did not match
+            if data.find(b'<ITEM', position, end) >= 0:
+                yield from parse_items(data[position:end], fields)
+
+
+def scan_sndb_range(xml_file, start, end, fields):
+    """Worker: all records of one byte range as a list of tuples"""
+    return list(scan_sndb_items(xml_file, fields, start, end))
+
+
+def scan_sndb_chunks(xml_file, fields=None, workers=None):
+    """Like scan_sndb_items, but large flat exports are scanned in parallel
+
+    The file is split into ITEM-aligned byte ranges (one per worker, see
+    chunked_reader.chunk_count); ranges are scanned in a process pool and
+    their rows yielded in file order as each range completes.
+    """
+    fields, dtd = scan_layout(xml_file, fields)
+    chunks = chunk_count(xml_file, workers) if dtd is not None else 1
+    if chunks <= 1:
+        yield from scan_sndb_items(xml_file, fields)
+        return
+
+    ranges, _ = element_ranges(xml_file, 'ITEM', chunks)
+    for rows in iter_ranges(scan_sndb_range, xml_file, ranges, fields, workers=chunks):
+        yield from rows
+
+
+def load_tables(tasks, workers=None):
+    """Run independent table loaders, in parallel when workers > 1
+
+    tasks maps a name to (loader, xml_file); loaders must be module-level
+    functions so they can run in a worker process. Returns {name: result}.
+    workers=None uses one process per task (capped at the CPU count).
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+
+    if workers <= 1:
+        return {name: loader(xml_file) for name, (loader, xml_file) in tasks.items()}
+
+    with process_pool(workers) as pool:
+        futures = {name: pool.submit(loader, xml_file) for name, (loader, xml_file) in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,149 @@
+"""
+SNDB Table: Columnar in-memory representation of an SNDB export
+
+Every field is stored as a dictionary-encoded column: a list of distinct
+(interned) string values plus an array of 4-byte codes, one per row.
+Rows are grouped by the key field (ID by default) in a compact
+offsets/order index, so all rows of a key are found in O(1):
+
+    table = SNDBTable.load('pers_koerp_orte.xml')
+    table.records('71')   # all orte rows of person 71
+    table.first('71')     # first row only
+
+The field set is read from the inline DTD of the export.
+"""
+
+import sys
+from array import array
+
+from sndb_reader import read_dtd_fields, scan_sndb_chunks
+
+
+class SNDBTable:
+    """Dictionary-encoded columns with a key index (one-to-many)"""
+
+    def __init__(self, fields, key=None):
+        self.fields = tuple(fields)
+        self.key = key or self.fields[0]
+        if self.key not in self.fields:
+            raise ValueError(f"Key field {self.key} not in fields {self.fields}")
+
+        self.values = {field: [None] for field in self.fields}  # code 0 = missing
+        self.codes = {field: array('I') for field in self.fields}
+        self.lookup = {field: {None: 0} for field in self.fields}  # build-time only
+
+        # Key index: rows of key code c are order[offsets[c]:offsets[c + 1]]
+        self.key_codes = {}
+        self.offsets = array('I')
+        self.order = array('I')
+
+    @classmethod
+    def load(cls, xml_file, fields=None, key=None, workers=1):
+        """Load an SNDB export, keeping only the given fields (default: all DTD fields)
+
+        workers > 1 (or None = CPU count) scans large exports in parallel chunks.
+        """
+        if fields is None:
+            fields = read_dtd_fields(xml_file)
+        if fields is None:
+            raise ValueError(f"No ITEM declaration in DTD of {xml_file}; pass fields explicitly")
+
+        table = cls(fields, key)
+        for row in scan_sndb_chunks(xml_file, table.fields, workers):
+            table.append(row)
+        table.build_index()
+        return table
+
+    def append(self, row):
+        """Add one row given as a tuple of field values (None = missing)"""
+        for field, value in zip(self.fields, row):
+            lookup = self.lookup[field]
+            code = lookup.get(value)
+            if code is None:
+                code = len(self.values[field])
+                self.values[field].append(sys.intern(value))
+                lookup[value] = code
+            self.codes[field].append(code)
+
+    def build_index(self):
+        """Group rows by key (counting sort over key codes) and drop build-time lookups"""
+        key_values = self.values[self.key]
+        key_codes = self.codes[self.key]
+
+        counts = array('I', bytes(4 * (len(key_values) + 1)))
+        for code in key_codes:
+            counts[code + 1] += 1
+        for code in range(len(key_values)):
+            counts[code + 1] += counts[code]
+        self.offsets = array('I', counts)
+
+        self.order = array('I', bytes(4 * len(key_codes)))
+        for row, code in enumerate(key_codes):
+            self.order[counts[code]] = row
+            counts[code] += 1
+
+        self.key_codes = {value: code for code, value in enumerate(key_values) if value is not None}
+        self.lookup = {}
+
+    # ------------------------------------------------------------
+    # Access
+    # ------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.codes[self.key])
+
+    def __eq__(self, other):
+        if not isinstance(other, SNDBTable):
+            return NotImplemented
+        return (self.fields, self.key, self.values, self.codes) == (other.fields, other.key, other.values, other.codes)
+
+    def __contains__(self, key):
+        return key in self.key_codes
+
+    def get(self, row, field):
+        """Value of one cell (None if missing)"""
+        return self.values[field][self.codes[field][row]]
+
+    def record(self, row):
+        """One row as {FIELD: text} with missing fields omitted (like iter_sndb_items)"""
+        record = {}
+        for field in self.fields:
+            value = self.values[field][self.codes[field][row]]
+            if value is not None:
+                record[field] = value
+        return record
+
+    def rows(self, key):
+        """Row numbers of all rows with this key, in file order"""
+        code = self.key_codes.get(key)
+        if code is None:
+            return array('I')
+        return self.order[self.offsets[code]:self.offsets[code + 1]]
+
+    def records(self, key):
+        """All rows of a key as records"""
+        return [self.record(row) for row in self.rows(key)]
+
+    def first(self, key):
+        """First row of a key as record (None if the key is absent)"""
+        rows = self.rows(key)
+        return self.record(rows[0]) if rows else None
+
+    def keys(self):
+        """Distinct keys in order of first appearance"""
+        return self.values[self.key][1:]
+
+    def items(self):
+        """(key, rows as value tuples) per key; used for per-key change digests"""
+        for key in self.keys():
+            yield key, tuple(tuple(self.get(row, field) for field in self.fields) for row in self.rows(key))
+
+    def column(self, field):
+        """Decoded column as a list"""
+        values = self.values[field]
+        return [values[code] for code in self.codes[field]]
+
+    def __iter__(self):
+        """All rows as records, in file order"""
+        for row in range(len(self)):
+            yield self.record(row)
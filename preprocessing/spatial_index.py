@@ -0,0 +1,150 @@
+"""
+Spatial Index: Persons by place coordinates (exact location, radius, bbox)
+
+Every place of every woman is one entry. Coordinates are quantized to
+1e-4 degrees (about 11 m) to form location keys, so persons sharing a
+place share a key; locations are bucketed in a uniform lat/lon grid, so
+radius and bounding box queries only visit nearby cells:
+
+    index = SpatialIndex.build(pipeline.women)
+    index.at(50.9803, 11.32903)                 # IDs at this location
+    index.near(50.9803, 11.32903, 5)            # [(km, ID)] within 5 km
+    index.in_bbox(50.0, 10.0, 52.0, 12.0)       # IDs in south/west/north/east box
+
+primary_only=True restricts a query to each person's first place (the
+position of the map marker). location_table() is the same data as a
+location -> person IDs table for the frontend.
+"""
+
+import json
+import math
+from collections import defaultdict
+from pathlib import Path
+
+LOCATION_VERSION = 1
+
+QUANTUM = 1e-4      # degrees per location key step (~11 m)
+CELL_SIZE = 0.25    # degrees per grid cell
+EARTH_RADIUS_KM = 6371.0088
+
+
+def location_key(lat, lon):
+    """Quantized (lat, lon) key"""
+    return round(lat / QUANTUM), round(lon / QUANTUM)
+
+
+def key_label(key):
+    """'lat,lon' label of a location key (4 decimals, as toFixed(4) in JavaScript)"""
+    return f"{key[0] * QUANTUM:.4f},{key[1] * QUANTUM:.4f}"
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex:
+    """Location keys of all places plus a grid over the locations"""
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.locations = defaultdict(list)  # location key -> [(person ID, place index)]
+        self.names = {}                     # location key -> place name (first seen)
+        self.grid = defaultdict(set)        # (lat cell, lon cell) -> {location keys}
+
+    @classmethod
+    def build(cls, women, **options):
+        """Index over the places of pipeline women ({id: woman data})"""
+        index = cls(**options)
+        for woman_id, woman_data in women.items():
+            for place_index, place in enumerate(woman_data.get('places', [])):
+                if place.get('lat') is not None and place.get('lon') is not None:
+                    index.add(woman_id, place['lat'], place['lon'], place_index, place.get('name'))
+        return index
+
+    def add(self, person_id, lat, lon, place_index=0, name=None):
+        key = location_key(lat, lon)
+        self.locations[key].append((person_id, place_index))
+        self.names.setdefault(key, name)
+        self.grid[self.cell(lat, lon)].add(key)
+
+    def __len__(self):
+        return len(self.locations)
+
+    def cell(self, lat, lon):
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def persons(self, key, primary_only=False):
+        """Distinct person IDs at a location key, in insertion order"""
+        entries = self.locations.get(key, ())
+        return list(dict.fromkeys(person_id for person_id, place_index in entries
+                                  if not primary_only or place_index == 0))
+
+    def at(self, lat, lon, primary_only=False):
+        """Person IDs at exactly this (quantized) location"""
+        return self.persons(location_key(lat, lon), primary_only)
+
+    def keys_in_cells(self, south, west, north, east):
+        """Location keys in all grid cells overlapping a box"""
+        (low_lat, low_lon), (high_lat, high_lon) = self.cell(south, west), self.cell(north, east)
+        for cell_lat in range(low_lat, high_lat + 1):
+            for cell_lon in range(low_lon, high_lon + 1):
+                yield from self.grid.get((cell_lat, cell_lon), ())
+
+    def in_bbox(self, south, west, north, east, primary_only=False):
+        """Person IDs with a place inside the box (west > east crosses the antimeridian)"""
+        if west > east:
+            return list(dict.fromkeys(self.in_bbox(south, west, north, 180.0, primary_only) +
+                                      self.in_bbox(south, -180.0, north, east, primary_only)))
+        lat_range = (round(south / QUANTUM), round(north / QUANTUM))
+        lon_range = (round(west / QUANTUM), round(east / QUANTUM))
+        persons = {}
+        for key in sorted(self.keys_in_cells(south, west, north, east)):
+            if lat_range[0] <= key[0] <= lat_range[1] and lon_range[0] <= key[1] <= lon_range[1]:
+                persons.update(dict.fromkeys(self.persons(key, primary_only)))
+        return list(persons)
+
+    def near(self, lat, lon, radius_km, primary_only=False):
+        """[(distance km, person ID)] within radius_km, nearest first (closest place per person)"""
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        cos_lat = math.cos(math.radians(lat))
+        dlon = 180.0 if cos_lat < 1e-6 else min(180.0, dlat / cos_lat)
+        south, north = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+
+        boxes = [(lon - dlon, lon + dlon)]
+        if lon - dlon < -180:
+            boxes = [(-180.0, lon + dlon), (lon - dlon + 360, 180.0)]
+        elif lon + dlon > 180:
+            boxes = [(lon - dlon, 180.0), (-180.0, lon + dlon - 360)]
+
+        nearest = {}
+        for west, east in boxes:
+            for key in self.keys_in_cells(south, west, north, east):
+                distance = haversine_km(lat, lon, key[0] * QUANTUM, key[1] * QUANTUM)
+                if distance > radius_km:
+                    continue
+                for person_id in self.persons(key, primary_only):
+                    if distance < nearest.get(person_id, math.inf):
+                        nearest[person_id] = distance
+        return sorted((distance, person_id) for person_id, distance in nearest.items())
+
+    def location_table(self, primary_only=True):
+        """{'lat,lon': {'name', 'persons'}} for locations with at least one person"""
+        table = {}
+        for key in sorted(self.locations):
+            persons = self.persons(key, primary_only)
+            if persons:
+                table[key_label(key)] = {'name': self.names[key], 'persons': persons}
+        return table
+
+
+def write_locations(index, path):
+    """Write the primary-place location table as compact JSON; returns the file size in bytes"""
+    data = {'version': LOCATION_VERSION, 'quantum': QUANTUM, 'locations': index.location_table()}
+    content = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    Path(path).write_bytes(content)
+    return len(content)
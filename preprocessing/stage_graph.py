@@ -0,0 +1,244 @@
+"""
+Stage Graph: Pipeline stages as a DAG with a concurrent scheduler
+
+A stage is a function with named inputs and outputs (artifacts). The
+graph is declared once; the scheduler derives the dependencies from the
+artifact names and starts each stage as soon as all its inputs exist:
+
+    stages = StageGraph()
+    stages.add('women', identify_women, inputs=('names', 'indiv'), outputs=('women',))
+    stages.add('letters', match_letters, inputs=('women',), outputs=('letters',))
+    stages.add('places', enrich_places, inputs=('women', 'geo'), outputs=('woman_places',))
+    results = stages.run(workers=4)     # {stage name: return value}
+    stages.critical_path()              # (seconds, [stage names]) of the last run
+
+Stage functions take no arguments and keep their state on the pipeline
+object; artifacts are names only. Independent stages ('letters' and
+'places' above) run concurrently on a thread pool, so the total time of
+a run is set by the critical path, not by the number of stages. Table
+loads inside stages still use worker processes (see sndb_reader).
+
+New stages plug in with add(); before=('stage',) makes an existing stage
+wait for the new one (e.g. an enrichment stage before validation).
+
+Cached stages (cache=True) depend only on their source files and params
+(which should include table_cache.source_hash() of the code involved).
+Their return value is pickled under a digest of both (see StageCache);
+a later run with the same digest restores the value instead of running
+the stage.
+"""
+
+import hashlib
+import os
+import pickle
+import time
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from table_cache import file_sha256
+
+STAGE_CACHE_VERSION = 1
+
+
+class Stage:
+    """One node of the graph: function, input and output artifacts, cache settings"""
+
+    def __init__(self, name, func, inputs=(), outputs=(), sources=(), params=(), cache=False, restore=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.sources = tuple(Path(source) for source in sources)
+        self.params = tuple(params)
+        self.cache = cache
+        self.restore = restore
+
+    def digest(self):
+        """Cache key: stage name, params and source file contents"""
+        digest = hashlib.sha256(repr((STAGE_CACHE_VERSION, self.name, self.params)).encode('utf-8'))
+        for source in self.sources:
+            digest.update(file_sha256(source).encode('ascii'))
+        return digest.hexdigest()[:24]
+
+
+class StageCache:
+    """On-disk results of cached stages, one entry per stage (the latest digest)"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, name, digest):
+        return self.cache_dir / f"stage-{name}-{digest}.pkl"
+
+    def get(self, name, digest):
+        """(True, value) for a stored result, else (False, None)"""
+        try:
+            with open(self.entry_path(name, digest), 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, AttributeError):
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, value
+
+    def put(self, name, digest, value):
+        """Store a result, replacing older entries of the stage (best effort: errors are ignored)"""
+        entry_file = self.entry_path(name, digest)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            for old_file in self.cache_dir.glob(f"stage-{name}-*.pkl"):
+                old_file.unlink()
+            tmp_file = entry_file.with_suffix('.tmp')
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, entry_file)
+        except OSError:
+            pass
+
+
+class StageGraph:
+    """Named stages wired by artifact names; run() schedules them by dependency"""
+
+    def __init__(self, cache=None, monitor=None):
+        self.cache = cache      # StageCache for cached stages (None = always run)
+        self.monitor = monitor  # monitor(name) -> context manager around each stage (e.g. RunProfile.stage)
+        self.stages = {}        # stage name -> Stage (declaration order)
+        self.producers = {}     # artifact -> stage name
+        self.timings = {}       # stage name -> seconds (last run)
+        self.cached = []        # stages restored from the cache (last run)
+
+    def add(self, name, func, inputs=(), outputs=(), before=(), **options):
+        """Declare a stage; before lists existing stages that wait for its outputs"""
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        for artifact in outputs:
+            if artifact in self.producers:
+                raise ValueError(f"Artifact {artifact!r} of stage {name!r} is already produced by "
+                                 f"{self.producers[artifact]!r}")
+        for other in before:
+            if other not in self.stages:
+                raise ValueError(f"Unknown stage in before: {other}")
+        stage = Stage(name, func, inputs, outputs, **options)
+        self.stages[name] = stage
+        for artifact in stage.outputs:
+            self.producers[artifact] = name
+        for other in before:
+            self.stages[other].inputs += stage.outputs
+        return stage
+
+    def __len__(self):
+        return len(self.stages)
+
+    def dependencies(self, names):
+        """{stage: set of stages it waits for} within names (artifacts from elsewhere must exist)"""
+        dependencies = {}
+        for name in names:
+            stage = self.stages[name]
+            dependencies[name] = set()
+            for artifact in stage.inputs:
+                producer = self.producers.get(artifact)
+                if producer is None and len(names) == len(self.stages):
+                    raise ValueError(f"Stage {name!r} needs {artifact!r}, which no stage produces")
+                if producer in names:
+                    dependencies[name].add(producer)
+        return dependencies
+
+    def order(self, names=None):
+        """Stages in dependency order (declaration order among ready stages)"""
+        names = list(self.stages) if names is None else [name for name in self.stages if name in names]
+        dependencies = self.dependencies(names)
+        ordered = []
+        done = set()
+        while len(ordered) < len(names):
+            ready = [name for name in names if name not in done and dependencies[name] <= done]
+            if not ready:
+                raise ValueError(f"Cycle between stages: {', '.join(name for name in names if name not in done)}")
+            ordered.append(ready[0])
+            done.add(ready[0])
+        return ordered
+
+    def execute(self, name):
+        """Run one stage (or restore its cached result); returns (value, seconds)"""
+        stage = self.stages[name]
+        start = time.perf_counter()
+        with self.monitor(name) if self.monitor else nullcontext():
+            value = self.call(stage)
+        return value, time.perf_counter() - start
+
+    def call(self, stage):
+        """Stage function result, or the restored cached result"""
+        name = stage.name
+        if stage.cache and self.cache:
+            digest = stage.digest()
+            hit, value = self.cache.get(name, digest)
+            if hit:
+                stage.restore(value)
+                self.cached.append(name)
+            else:
+                value = stage.func()
+                self.cache.put(name, digest, value)
+            return value
+        return stage.func()
+
+    def run(self, names=None, workers=None):
+        """Run all stages (or the given subset) as their inputs become ready
+
+        workers is the number of threads (None = CPU count, 1 = one stage
+        at a time in dependency order). Returns {stage name: return value};
+        the first failing stage's exception is raised once running stages finish.
+        """
+        ordered = self.order(names)
+        dependencies = self.dependencies(ordered)
+        self.timings = {}
+        self.cached = []
+        results = {}
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers <= 1:
+            for name in ordered:
+                results[name], self.timings[name] = self.execute(name)
+            return results
+
+        waiting = list(ordered)
+        running = {}
+        done = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while waiting or running:
+                for name in [name for name in waiting if dependencies[name] <= done]:
+                    waiting.remove(name)
+                    running[pool.submit(self.execute, name)] = name
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        wait(running)
+                        raise error
+                    results[name], self.timings[name] = future.result()
+                    done.add(name)
+        return results
+
+    def critical_path(self, timings=None):
+        """(seconds, [stage names]) of the slowest dependency chain in timings (default: last run)"""
+        timings = self.timings if timings is None else timings
+        ordered = [name for name in self.stages if name in timings]
+        dependencies = self.dependencies(ordered)
+        finish = {}
+        previous = {}
+        for name in self.order(ordered):
+            before = max(dependencies[name], key=lambda other: finish[other], default=None)
+            finish[name] = timings[name] + (finish[before] if before else 0.0)
+            previous[name] = before
+        if not finish:
+            return 0.0, []
+        name = max(finish, key=finish.get)
+        total = finish[name]
+        path = []
+        while name:
+            path.append(name)
+            name = previous[name]
+        return total, path[::-1]
@@ -0,0 +1,466 @@
+"""
+Synthetic Corpus: Scaled SNDB/CMIF data for load testing
+
+Builds a corpus shaped like data/ (SNDB/*.xml and ra-cmif.xml) at a chosen
+scale factor, so the pipeline and the analyzer can be run at 10x or 100x
+the real data:
+
+    generator = CorpusGenerator('../data', scale=10, seed=1)
+    manifest = generator.write('../data/synthetic/x10-seed1')
+    HerDataPipeline('../data/synthetic/x10-seed1', 'persons.json', scale=10).run()
+
+The corpus is made of replicas of the real data. Replica 0 is the real
+data; every further replica copies each person and place of it under a
+new ID (ID + replica * stride, stride a power of ten above the largest ID)
+and redraws the identifying values:
+
+    VORNAMEN, NACHNAME  - drawn from the real first names (of the person's
+                          SEXUS) and surnames, so their frequencies match
+    GND                 - '<GND>-<replica>'
+    geo_links           - authority IDs (GeoNames, GND, GOV, ...) offset
+                          or suffixed per replica, in URL and NORM_ID
+
+All other values (dates, occupations, places, relationships, register
+texts, coordinates) and the field layout of every row are kept, so
+per-person distributions and the DTDs of the exports are those of the
+real data. References follow the replica: a person's places, relations
+and letters point to the same replica's copies. A fractional scale (2.5)
+adds a last replica holding each person, place and letter with the
+fractional probability; references to entities left out of it point to
+their replica 0 copies. Each replica is chained to the previous one by
+one relationship (AGRELON 1010, as network_metrics.scale_relations), so
+the relationship network stays one scaled graph.
+
+Letters of ra-cmif.xml are copied per replica: GND refs of SNDB persons,
+authority refs of SNDB places and the display names of SNDB persons are
+mapped to the replica's copies. Exports without person or place IDs
+(nsl_agrelon) are copied unchanged.
+
+All random choices are hashes of (seed, entity, replica), so the output
+is identical for the same seed and scale, independent of file order.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import shutil
+import sys
+import time
+from collections import defaultdict
+from html import unescape
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from chunked_reader import element_ranges
+from place_authority import URL_PATTERNS, authority_key
+from sndb_reader import read_dtd_fields, scan_sndb_items
+
+CORPUS_VERSION = 1
+MANIFEST_FILE = 'corpus.json'
+CMIF_FILE = 'ra-cmif.xml'
+
+# Export name prefix -> entity whose ID is the export's ID field
+ENTITY_PREFIXES = {'pers_koerp_': 'person', 'geo_': 'place'}
+# Fields holding references to entities (besides the ID field)
+REFERENCE_FIELDS = {'ID1': 'person', 'ID2': 'person', 'SNDB_ID': 'place'}
+CHAIN_RELATION = '1010'  # AGRELON type of the links between replicas
+QUOTE = {'"': '&quot;'}  # The exports escape quotes in text
+
+# Authority schemes whose IDs are numbers (offset per replica; others get a suffix)
+NUMERIC_SCHEMES = ('geonames', 'tgn', 'wikidata')
+SUFFIXES = {'gnd': '-', 'gov': '_'}
+
+GND_URL = re.compile(r'd-nb\.info/gnd/([0-9X-]+)')
+CMIF_ELEMENT = re.compile(r'<(persName|placeName|ref)\b([^>]*)>([^<]*)</\1>')
+CMIF_URL = re.compile(r'\b(ref|target)="([^"]*)"')
+CORRESP_DESC = re.compile(r'<correspDesc\b.*?</correspDesc>', re.DOTALL)
+
+
+def draw(seed, *key):
+    """Deterministic number in [0, 1) for a seed and key"""
+    digest = hashlib.blake2b(repr((seed,) + key).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+
+def stride(ids):
+    """Smallest power of ten above all numeric IDs (offset between replicas)"""
+    largest = max((int(value) for value in ids if value and value.isdigit()), default=0)
+    return 10 ** len(str(largest))
+
+
+def replica_id(value, replica, offset):
+    """ID of an entity's copy in a replica (numbers offset, other IDs suffixed)"""
+    if replica == 0 or not value:
+        return value
+    if value.isdigit():
+        return str(int(value) + replica * offset)
+    return f"{value}-{replica}"
+
+
+def format_item(number, fields, values):
+    """One ITEM element in the export layout (missing values omitted)"""
+    leaves = ''.join(f"\n      <{field}>{escape(value, QUOTE)}</{field}>"
+                     for field, value in zip(fields, values) if value is not None)
+    return f'<ITEM num="{number}">{leaves}\n   </ITEM>'
+
+
+def entity_of(export):
+    """'person', 'place' or None for an SNDB export file name"""
+    for prefix, entity in ENTITY_PREFIXES.items():
+        if export.startswith(prefix):
+            return entity
+    return None
+
+
+class CorpusGenerator:
+    """Replicas of the SNDB exports and CMIF letters in data_dir at a scale factor"""
+
+    def __init__(self, data_dir, scale, seed=0):
+        if scale < 1:
+            raise ValueError(f"Scale must be at least 1, got {scale}")
+        self.data_dir = Path(data_dir)
+        self.sndb_dir = self.data_dir / 'SNDB'
+        self.scale = scale
+        self.seed = seed
+        self.replicas = math.ceil(scale)
+        self.fraction = scale - (self.replicas - 1)  # Share of entities in the last replica
+
+        self.exports = sorted(path.name for path in self.sndb_dir.glob('*.xml'))
+        self.strides = {}             # entity / authority scheme -> ID offset per replica
+        self.sexus = {}               # person ID -> SEXUS
+        self.gnd_persons = {}         # GND -> person ID
+        self.display_names = {}       # person ID -> (VORNAMEN, NACHNAME, TITEL) of the main entry
+        self.name_persons = {}        # display name -> person ID (unique display names only)
+        self.first_names = defaultdict(list)  # SEXUS -> VORNAMEN of every name entry
+        self.surnames = []            # NACHNAME of every name entry
+        self.key_places = {}          # authority key -> first place ID linked to it
+        self.anchors = []             # first person of each replica (chained by relationships)
+        self.prepare()
+
+    def rows(self, export):
+        """(fields, [value tuples]) of an SNDB export"""
+        path = self.sndb_dir / export
+        return read_dtd_fields(path), list(scan_sndb_items(path))
+
+    def prepare(self):
+        """Read IDs, names, GNDs and authority keys from the source exports"""
+        ids = defaultdict(list)
+        for export in self.exports:
+            entity = entity_of(export)
+            if entity is None:
+                continue
+            fields, rows = self.rows(export)
+            for field, target in list(REFERENCE_FIELDS.items()) + [('ID', entity)]:
+                if field in fields:
+                    column = fields.index(field)
+                    ids[target].extend(row[column] for row in rows)
+        for entity, values in ids.items():
+            self.strides[entity] = stride(values)
+
+        if 'pers_koerp_indiv.xml' in self.exports:
+            fields, rows = self.rows('pers_koerp_indiv.xml')
+            for row in rows:
+                record = dict(zip(fields, row))
+                self.sexus[record['ID']] = record.get('SEXUS')
+                if record.get('GND'):
+                    self.gnd_persons.setdefault(record['GND'], record['ID'])
+
+        if 'pers_koerp_main.xml' in self.exports:
+            fields, rows = self.rows('pers_koerp_main.xml')
+            names = defaultdict(list)
+            for row in rows:
+                record = dict(zip(fields, row))
+                if record.get('VORNAMEN'):
+                    self.first_names[self.sexus.get(record['ID'])].append(record['VORNAMEN'])
+                if record.get('NACHNAME'):
+                    self.surnames.append(record['NACHNAME'])
+                if record.get('LFDNR', '0') == '0':
+                    self.display_names[record['ID']] = tuple(record.get(field) for field in
+                                                             ('VORNAMEN', 'NACHNAME', 'TITEL'))
+            for person_id, parts in self.display_names.items():
+                names[self.display_name(parts)].append(person_id)
+            self.name_persons = {name: persons[0] for name, persons in names.items() if len(persons) == 1}
+
+        if 'geo_links.xml' in self.exports:
+            fields, rows = self.rows('geo_links.xml')
+            numbers = defaultdict(list)
+            for row in rows:
+                record = dict(zip(fields, row))
+                key = authority_key(record.get('URL'), record.get('NORM_ID'), record.get('QUELLE'))
+                if key and record.get('ID'):
+                    self.key_places.setdefault(key, record['ID'])
+                    scheme, value = key.split(':', 1)
+                    numbers[scheme].append(value.lstrip('Q'))
+            for scheme in NUMERIC_SCHEMES:
+                self.strides[scheme] = stride(numbers[scheme])
+
+        persons = list(self.sexus) or list(self.display_names)
+        for replica in range(self.replicas):
+            anchor = next((person_id for person_id in persons if self.included('person', person_id, replica)), None)
+            self.anchors.append(anchor)
+
+    # ------------------------------------------------------------
+    # Replicas of entities and values
+    # ------------------------------------------------------------
+
+    def included(self, entity, entity_id, replica):
+        """Whether a replica has a copy of an entity (all but the last replica have all)"""
+        if replica < self.replicas - 1 or self.fraction >= 1:
+            return True
+        return draw(self.seed, entity, entity_id, replica) < self.fraction
+
+    def reference(self, entity, entity_id, replica):
+        """ID a replica uses for an entity: its copy, or the replica 0 original if not included"""
+        if not self.included(entity, entity_id, replica):
+            return entity_id
+        return replica_id(entity_id, replica, self.strides[entity])
+
+    def pick(self, values, *key):
+        return values[int(draw(self.seed, *key) * len(values))] if values else None
+
+    def first_name(self, person_id, original, replica):
+        """Replica VORNAMEN: same original name -> same drawn name within a person"""
+        if replica == 0 or not original:
+            return original
+        pool = self.first_names.get(self.sexus.get(person_id)) or self.first_names.get(None) or [original]
+        return self.pick(pool, 'VORNAMEN', person_id, original, replica)
+
+    def surname(self, person_id, original, replica):
+        """Replica NACHNAME (see first_name)"""
+        if replica == 0 or not original:
+            return original
+        return self.pick(self.surnames, 'NACHNAME', person_id, original, replica)
+
+    def gnd(self, value, replica):
+        return f"{value}-{replica}" if replica and value else value
+
+    @staticmethod
+    def display_name(parts):
+        """Display name as the pipeline builds it (person_name)"""
+        return ' '.join(part for part in parts if part)
+
+    def replica_display_name(self, person_id, replica):
+        vornamen, nachname, titel = self.display_names[person_id]
+        return self.display_name((self.first_name(person_id, vornamen, replica),
+                                  self.surname(person_id, nachname, replica), titel))
+
+    def authority(self, key, replica):
+        """Authority key of a place copy ('geonames:2812482' -> 'geonames:102812482')"""
+        scheme, value = key.split(':', 1)
+        if replica == 0:
+            return key
+        if scheme in NUMERIC_SCHEMES and value.lstrip('Q').isdigit():
+            prefix = 'Q' if value.startswith('Q') else ''
+            return f"{scheme}:{prefix}{int(value.lstrip('Q')) + replica * self.strides[scheme]}"
+        return f"{scheme}:{value}{SUFFIXES.get(scheme, '-')}{replica}"
+
+    def place_url(self, url, replica):
+        """Authority URL of a place mapped to the replica's copy (other URLs unchanged)"""
+        key = authority_key(url)
+        place_id = self.key_places.get(key)
+        if place_id is None or not self.included('place', place_id, replica):
+            return url
+        match = URL_PATTERNS[key.split(':', 1)[0]].search(url)
+        return url[:match.start(1)] + self.authority(key, replica).split(':', 1)[1] + url[match.end(1):]
+
+    # ------------------------------------------------------------
+    # SNDB exports
+    # ------------------------------------------------------------
+
+    def replica_rows(self, export, fields, rows, replica):
+        """Rows of one replica of an export"""
+        entity = entity_of(export)
+        owner = 'ID' if 'ID' in fields else 'ID1'
+        owner_column = fields.index(owner)
+        columns = [(fields.index(field), target) for field, target in REFERENCE_FIELDS.items() if field in fields]
+        record_fields = set(fields)
+        for row in rows:
+            owner_id = row[owner_column]
+            owner_entity = entity if owner == 'ID' else REFERENCE_FIELDS[owner]
+            if not self.included(owner_entity, owner_id, replica):
+                continue
+            if replica == 0:
+                yield row
+                continue
+            values = list(row)
+            values[owner_column] = replica_id(owner_id, replica, self.strides[owner_entity])
+            for column, target in columns:
+                if column != owner_column and values[column]:
+                    values[column] = self.reference(target, values[column], replica)
+            if 'VORNAMEN' in record_fields:
+                column = fields.index('VORNAMEN')
+                values[column] = self.first_name(owner_id, row[column], replica)
+            if 'NACHNAME' in record_fields:
+                column = fields.index('NACHNAME')
+                values[column] = self.surname(owner_id, row[column], replica)
+            if export == 'pers_koerp_indiv.xml' and 'GND' in record_fields:
+                column = fields.index('GND')
+                values[column] = self.gnd(row[column], replica)
+            if export == 'geo_links.xml':
+                self.replica_link(fields, values, replica)
+            yield tuple(values)
+
+        # One relationship from this replica's anchor to the previous replica's
+        if export == 'pers_koerp_beziehungen.xml' and replica and self.anchors[replica]:
+            chain = {'ID1': replica_id(self.anchors[replica], replica, self.strides['person']),
+                     'ID2': self.reference('person', self.anchors[replica - 1], replica - 1),
+                     'AGRELON_ID1': CHAIN_RELATION, 'AGRELON_ID2': CHAIN_RELATION}
+            yield tuple(chain.get(field) for field in fields)
+
+    def replica_link(self, fields, values, replica):
+        """Rewrite the authority ID of a geo_links row (URL and NORM_ID) in place"""
+        record = dict(zip(fields, values))
+        key = authority_key(record.get('URL'), record.get('NORM_ID'), record.get('QUELLE'))
+        if key is None:
+            return
+        old = key.split(':', 1)[1]
+        new = self.authority(key, replica).split(':', 1)[1]
+        if record.get('URL') and old in record['URL']:
+            url = record['URL']
+            position = url.rindex(old)
+            values[fields.index('URL')] = url[:position] + new + url[position + len(old):]
+        if record.get('NORM_ID') == old:
+            values[fields.index('NORM_ID')] = new
+
+    def write_export(self, export, out_file):
+        """Write one scaled export; returns the number of ITEMs"""
+        source = self.sndb_dir / export
+        ranges, _ = element_ranges(source, 'ITEM', 1)
+        if entity_of(export) is None or not ranges:
+            shutil.copyfile(source, out_file)
+            return sum(1 for _ in scan_sndb_items(source)) if ranges else 0
+
+        fields, rows = self.rows(export)
+        data = source.read_bytes()
+        start, end = ranges[0]
+        number = 0
+        with open(out_file, 'w', encoding='utf-8', newline='') as out:
+            out.write(data[:start].decode('utf-8'))
+            for replica in range(self.replicas):
+                for values in self.replica_rows(export, fields, rows, replica):
+                    number += 1
+                    if number > 1:
+                        out.write('\n   ')
+                    out.write(format_item(number, fields, values))
+            out.write(data[end:].decode('utf-8'))
+        return number
+
+    # ------------------------------------------------------------
+    # CMIF letters
+    # ------------------------------------------------------------
+
+    def replica_letter(self, letter, replica):
+        """One correspDesc (source text) with persons, places and names mapped to a replica"""
+        if replica == 0:
+            return letter
+
+        def element(match):
+            tag, attributes, text = match.groups()
+            person_id = None
+            urls = dict((name, url) for name, url in CMIF_URL.findall(attributes))
+            for url in urls.values():
+                gnd = GND_URL.search(url)
+                if gnd and gnd.group(1) in self.gnd_persons:
+                    person_id = self.gnd_persons[gnd.group(1)]
+            if person_id is None and tag != 'placeName':
+                person_id = self.name_persons.get(unescape(text).strip())
+            attributes = CMIF_URL.sub(lambda url: f'{url.group(1)}="{self.replica_url(url.group(2), replica)}"',
+                                      attributes)
+            if (person_id in self.display_names and self.included('person', person_id, replica)
+                    and unescape(text).strip() == self.display_name(self.display_names[person_id])):
+                text = escape(self.replica_display_name(person_id, replica))
+            return f"<{tag}{attributes}>{text}</{tag}>"
+
+        return CMIF_ELEMENT.sub(element, letter)
+
+    def replica_url(self, url, replica):
+        """GND URL of an SNDB person or authority URL of an SNDB place, mapped to a replica"""
+        gnd = GND_URL.search(url)
+        if gnd and gnd.group(1) in self.gnd_persons:
+            if not self.included('person', self.gnd_persons[gnd.group(1)], replica):
+                return url
+            return url[:gnd.start(1)] + self.gnd(gnd.group(1), replica) + url[gnd.end(1):]
+        return self.place_url(url, replica)
+
+    def write_cmif(self, out_file):
+        """Write the scaled CMIF file; returns the number of letters"""
+        source = self.data_dir / CMIF_FILE
+        ranges, _ = element_ranges(source, 'correspDesc', 1)
+        if not ranges:
+            shutil.copyfile(source, out_file)
+            return 0
+        text = source.read_bytes()
+        start, end = ranges[0]
+        head, body, tail = (text[:start].decode('utf-8'), text[start:end].decode('utf-8'),
+                            text[end:].decode('utf-8'))
+        letters = [match.group(0) for match in CORRESP_DESC.finditer(body)]
+        separator = body[len(letters[0]):body.index('<correspDesc', 1)] if len(letters) > 1 else '\n'
+
+        count = 0
+        with open(out_file, 'w', encoding='utf-8', newline='') as out:
+            out.write(head)
+            for replica in range(self.replicas):
+                for number, letter in enumerate(letters):
+                    if not self.included('letter', number, replica):
+                        continue
+                    if count:
+                        out.write(separator)
+                    out.write(self.replica_letter(letter, replica))
+                    count += 1
+            out.write(tail)
+        return count
+
+    def write(self, out_dir):
+        """Write the corpus (SNDB/*.xml, ra-cmif.xml, corpus.json); returns the manifest"""
+        out_dir = Path(out_dir)
+        (out_dir / 'SNDB').mkdir(parents=True, exist_ok=True)
+        manifest = {
+            'version': CORPUS_VERSION,
+            'scale': self.scale,
+            'seed': self.seed,
+            'source': str(self.data_dir),
+            'items': {},
+            'letters': None
+        }
+        for export in self.exports:
+            manifest['items'][export] = self.write_export(export, out_dir / 'SNDB' / export)
+        if (self.data_dir / CMIF_FILE).exists():
+            manifest['letters'] = self.write_cmif(out_dir / CMIF_FILE)
+        (out_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+        return manifest
+
+
+def main():
+    """Command line: python synthetic_corpus.py --scale 10 [--seed 1] [--out DIR] [--benchmark]"""
+    parser = argparse.ArgumentParser(description='Generate a scaled synthetic SNDB/CMIF corpus for load testing')
+    parser.add_argument('--scale', type=float, required=True,
+                        help='Size relative to the real data (>= 1, fractions allowed)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of all random choices (default: 0)')
+    parser.add_argument('--out', type=Path, help='Output directory (default: data/synthetic/x<scale>-seed<seed>)')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Run the pipeline on the corpus with --profile metrics (persons.metrics.json)')
+    args = parser.parse_args()
+
+    data_dir = Path(__file__).parent.parent / 'data'
+    out_dir = args.out or data_dir / 'synthetic' / f"x{args.scale:g}-seed{args.seed}"
+
+    start = time.perf_counter()
+    try:
+        manifest = CorpusGenerator(data_dir, args.scale, args.seed).write(out_dir)
+    except (ValueError, OSError) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    print(f"Wrote {sum(manifest['items'].values())} SNDB items and {manifest['letters'] or 0} letters "
+          f"to {out_dir} in {time.perf_counter() - start:.1f}s")
+
+    if args.benchmark:
+        from build_herdata import HerDataPipeline
+        pipeline = HerDataPipeline(out_dir, out_dir / 'persons.json', scale=args.scale, use_cache=False,
+                                   profile_file=out_dir / 'persons.metrics.json')
+        pipeline.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Table Cache: Persistent cache for parsed SNDB tables
+
+Stores the result of a table loader (see build_herdata.load_* functions)
+as a pickle, keyed by source path and loader. Each entry records the
+source fingerprint (size, mtime, SHA-256 of the content) and a hash of
+the source of the loader and of the modules it parses with:
+
+- size and mtime unchanged  -> hit without reading the source
+- size or mtime changed     -> content is re-hashed; same hash is still a hit
+- content or code changed   -> entry is stale and evicted
+
+Warm rebuilds therefore skip XML parsing entirely. prune() removes entries
+whose source file no longer exists.
+"""
+
+import hashlib
+import inspect
+import os
+import pickle
+from pathlib import Path
+
+CACHE_VERSION = 2
+
+
+def file_sha256(path):
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path, previous=None):
+    """Source fingerprint {size, mtime_ns, sha256}
+
+    If previous has the same size and mtime, it is returned as is and
+    the file is not read.
+    """
+    stat = os.stat(path)
+    if previous and (previous['size'], previous['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+        return previous
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_sha256(path)}
+
+
+def source_hash(*objects):
+    """Hash of the source of functions or modules (changes whenever they are edited)"""
+    digest = hashlib.sha256()
+    for obj in objects:
+        digest.update(inspect.getsource(obj).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def loader_hash(loader, *modules):
+    """Hash of the source of a loader and the modules it parses with
+
+    Not of the marshalled code object: marshal output depends on reference
+    counts, so it differs between processes and the cache would never hit.
+    """
+    return source_hash(loader, *modules)
+
+
+class TableCache:
+    """On-disk cache of parsed tables keyed by source file fingerprint"""
+
+    def __init__(self, cache_dir, modules=()):
+        self.cache_dir = Path(cache_dir)
+        self.modules = tuple(modules)  # Parsing code shared by the loaders (part of every entry's key)
+        self.code_hashes = {}
+        self.hits = 0
+        self.misses = 0
+
+    def code_hash(self, loader):
+        """loader_hash of a loader and the cache's modules (computed once per loader)"""
+        if loader not in self.code_hashes:
+            self.code_hashes[loader] = loader_hash(loader, *self.modules)
+        return self.code_hashes[loader]
+
+    def entry_path(self, loader, xml_file):
+        """Cache file for (source path, loader)"""
+        key = f"{Path(xml_file).resolve()}|{loader.__module__}.{loader.__qualname__}"
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]
+        return self.cache_dir / f"table-{Path(xml_file).stem}-{loader.__name__}-{name}.pkl"
+
+    def get(self, loader, xml_file):
+        """Return cached table, or None if missing or stale (stale entries are evicted)"""
+        entry_file = self.entry_path(loader, xml_file)
+        try:
+            f = open(entry_file, 'rb')
+        except OSError:
+            self.misses += 1
+            return None
+
+        touched = False
+        with f:
+            try:
+                meta = pickle.load(f)
+                stat = os.stat(xml_file)
+                fresh = meta['version'] == CACHE_VERSION and meta['loader'] == self.code_hash(loader)
+
+                if fresh and (meta['size'], meta['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+                    # Touched or rewritten: only the content hash decides
+                    fresh = meta['size'] == stat.st_size and meta['sha256'] == file_sha256(xml_file)
+                    touched = fresh
+
+                if fresh:
+                    table = pickle.load(f)
+            except (OSError, pickle.PickleError, EOFError, KeyError):
+                fresh = False
+
+        if not fresh:
+            self.evict(entry_file)
+            self.misses += 1
+            return None
+
+        if touched:
+            # Same content, new mtime: refresh so the next lookup skips hashing
+            meta['mtime_ns'] = stat.st_mtime_ns
+            self.write(entry_file, meta, table)
+
+        self.hits += 1
+        return table
+
+    def put(self, loader, xml_file, table):
+        """Store a freshly parsed table with the source fingerprint"""
+        stat = os.stat(xml_file)
+        meta = {
+            'version': CACHE_VERSION,
+            'source': str(Path(xml_file).resolve()),
+            'loader': self.code_hash(loader),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(xml_file)
+        }
+        self.write(self.entry_path(loader, xml_file), meta, table)
+
+    def write(self, entry_file, meta, table):
+        """Atomically write meta header + table (best effort: errors are ignored)"""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_file = entry_file.with_suffix('.tmp')
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(table, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, entry_file)
+        except OSError:
+            pass
+
+    def evict(self, entry_file):
+        """Remove a cache entry if present"""
+        try:
+            entry_file.unlink()
+        except OSError:
+            pass
+
+    def prune(self):
+        """Evict entries whose source file no longer exists; return count removed
+
+        Only table entries are checked: the cache directory also holds
+        stage results (stage_graph.StageCache) and run states (run_state).
+        """
+        removed = 0
+        for entry_file in self.cache_dir.glob('table-*.pkl'):
+            try:
+                with open(entry_file, 'rb') as f:
+                    meta = pickle.load(f)
+                stale = meta['version'] != CACHE_VERSION or not Path(meta['source']).exists()
+            except (OSError, pickle.PickleError, EOFError, KeyError):
+                stale = True
+            if stale:
+                self.evict(entry_file)
+                removed += 1
+        return removed
@@ -0,0 +1,240 @@
+"""
+Text Index: Inverted full-text index over the project register entries
+
+pers_koerp_projekt_goebriefe, _tagebuch and _bug hold a REGISTEREINTRAG
+text per person (name, dates, short biography). All texts of a person
+form one document. Texts are folded like names (lowercase, diacritics
+removed, ß -> ss; see name_index.fold) and split into [a-z0-9] tokens.
+
+Every term has one posting list, stored as unsigned LEB128 varints in a
+single byte string (the term's slice is postings[offsets[t]:offsets[t + 1]]):
+
+    doc count, then per document: doc delta, term frequency, position deltas
+
+Terms are sorted, so a prefix is a contiguous range (bisect). Positions
+allow phrase queries; consecutive texts of one document are separated by
+a position gap, so phrases never span two texts:
+
+    index = TextIndex.build([('43779', ['Vulpius, Christiane ...']), ...])
+    index.term('hofdame')                 # person IDs containing the term
+    index.prefix('weim')                  # ... any term starting with 'weim'
+    index.phrase('tochter des')           # ... the tokens in this order
+    index.search('malerin weim* "in weimar"')   # AND of terms, prefixes, phrases
+
+to_json() is the same index for the static site (postings as base64;
+decoded and queried by docs/js/text-search.js).
+"""
+
+import base64
+import json
+import re
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+
+from name_index import fold
+
+TEXT_INDEX_VERSION = 1
+
+TOKEN = re.compile(r'[a-z0-9]+')
+QUERY_PART = re.compile(r'"([^"]*)"|(\S+)')
+TEXT_GAP = 1  # Extra position step between two texts of a document
+
+
+def tokenize(text):
+    """Folded tokens of a text"""
+    return TOKEN.findall(fold(text or ''))
+
+
+def encode_varints(values, out):
+    """Append unsigned LEB128 varints to a bytearray"""
+    for value in values:
+        while value > 0x7f:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+        out.append(value)
+
+
+def decode_varints(data, start=0, end=None):
+    """All varints in data[start:end]"""
+    values = []
+    value = shift = 0
+    for byte in data[start:end]:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    return values
+
+
+class TextIndex:
+    """Sorted terms with varint-encoded, delta-compressed posting lists"""
+
+    def __init__(self):
+        self.docs = []                    # doc number -> person ID
+        self.terms = []                   # sorted
+        self.offsets = array('I', [0])    # term -> start of its postings (plus end sentinel)
+        self.postings = b''
+        self.token_count = 0
+
+    @classmethod
+    def build(cls, documents):
+        """Index over (person ID, [texts]) pairs; documents without tokens are skipped"""
+        index = cls()
+        occurrences = defaultdict(list)  # term -> [(doc, [positions])]
+        for person_id, texts in documents:
+            positions = defaultdict(list)
+            position = 0
+            for text in texts:
+                for token in tokenize(text):
+                    positions[token].append(position)
+                    position += 1
+                position += TEXT_GAP
+            if not positions:
+                continue
+            doc = len(index.docs)
+            index.docs.append(person_id)
+            index.token_count += sum(map(len, positions.values()))
+            for term, term_positions in positions.items():
+                occurrences[term].append((doc, term_positions))
+
+        index.terms = sorted(occurrences)
+        postings = bytearray()
+        for term in index.terms:
+            entries = occurrences[term]
+            encode_varints((len(entries),), postings)
+            previous_doc = 0
+            for doc, positions in entries:
+                encode_varints((doc - previous_doc, len(positions)), postings)
+                encode_varints((position - before for position, before in zip(positions, [0] + positions)), postings)
+                previous_doc = doc
+            index.offsets.append(len(postings))
+        index.postings = bytes(postings)
+        return index
+
+    def __len__(self):
+        return len(self.docs)
+
+    def term_id(self, term):
+        t = bisect_left(self.terms, term)
+        return t if t < len(self.terms) and self.terms[t] == term else None
+
+    def postings_of(self, t):
+        """{doc: [positions]} of term number t"""
+        values = decode_varints(self.postings, self.offsets[t], self.offsets[t + 1])
+        result = {}
+        doc = 0
+        i = 1
+        for _ in range(values[0]):
+            doc += values[i]
+            count = values[i + 1]
+            positions = []
+            position = 0
+            for delta in values[i + 2:i + 2 + count]:
+                position += delta
+                positions.append(position)
+            result[doc] = positions
+            i += 2 + count
+        return result
+
+    def expand(self, prefix):
+        """Term numbers of all terms starting with prefix"""
+        start = bisect_left(self.terms, prefix)
+        end = bisect_left(self.terms, prefix + '\uffff')
+        return range(start, end)
+
+    def term_docs(self, word):
+        t = self.term_id(fold(word))
+        return set(self.postings_of(t)) if t is not None else set()
+
+    def prefix_docs(self, prefix):
+        docs = set()
+        for t in self.expand(fold(prefix)):
+            docs.update(self.postings_of(t))
+        return docs
+
+    def phrase_docs(self, text):
+        tokens = tokenize(text)
+        if not tokens:
+            return set()
+        lists = []
+        for token in tokens:
+            t = self.term_id(token)
+            if t is None:
+                return set()
+            lists.append(self.postings_of(t))
+
+        docs = set(lists[0]).intersection(*lists[1:])
+        matches = set()
+        for doc in docs:
+            starts = set(lists[0][doc])
+            for offset, postings in enumerate(lists[1:], 1):
+                starts &= {position - offset for position in postings[doc]}
+            if starts:
+                matches.add(doc)
+        return matches
+
+    def person_ids(self, docs):
+        return [self.docs[doc] for doc in sorted(docs)]
+
+    def term(self, word):
+        """Person IDs whose texts contain the word"""
+        return self.person_ids(self.term_docs(word))
+
+    def prefix(self, prefix):
+        """Person IDs whose texts contain a word starting with prefix"""
+        return self.person_ids(self.prefix_docs(prefix))
+
+    def phrase(self, text):
+        """Person IDs whose texts contain the words of text in this order"""
+        return self.person_ids(self.phrase_docs(text))
+
+    def search(self, query):
+        """Person IDs matching all parts: word, word* (prefix) or "several words" (phrase)"""
+        docs = None
+        for phrase, word in QUERY_PART.findall(query):
+            if phrase:
+                part = self.phrase_docs(phrase)
+            elif word.endswith('*'):
+                part = self.prefix_docs(word.rstrip('*'))
+            else:
+                tokens = tokenize(word)  # 'Sachsen-Weimar' -> phrase 'sachsen weimar'
+                part = self.term_docs(tokens[0]) if len(tokens) == 1 else self.phrase_docs(word)
+            docs = part if docs is None else docs & part
+            if not docs:
+                break
+        return self.person_ids(docs or ())
+
+    def to_json(self):
+        """JSON-serializable form (postings as base64, offsets delta-encoded as lengths)"""
+        return {
+            'version': TEXT_INDEX_VERSION,
+            'text_gap': TEXT_GAP,
+            'docs': self.docs,
+            'terms': self.terms,
+            'lengths': [end - start for start, end in zip(self.offsets, self.offsets[1:])],
+            'postings': base64.b64encode(self.postings).decode('ascii')
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        """Index read back from to_json() output"""
+        if data.get('version') != TEXT_INDEX_VERSION:
+            raise ValueError(f"Unsupported text index version: {data.get('version')}")
+        index = cls()
+        index.docs = data['docs']
+        index.terms = data['terms']
+        for length in data['lengths']:
+            index.offsets.append(index.offsets[-1] + length)
+        index.postings = base64.b64decode(data['postings'])
+        return index
+
+
+def write_text_index(index, path):
+    """Write the index as compact JSON; returns the file size in bytes"""
+    content = json.dumps(index.to_json(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    Path(path).write_bytes(content)
+    return len(content)
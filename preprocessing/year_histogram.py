@@ -0,0 +1,109 @@
+"""
+Year Histogram: Compact per-woman letter counts per year
+
+All histograms live in one flat array('I') matrix with one row per woman
+and one column per year of a fixed range (1762-1824 by default), so
+memory grows with the number of women, not with the number of letters.
+Aggregates are column sums over strided slices of that matrix:
+
+    histograms = YearHistograms()
+    histograms.add('w1', 1795)
+    histograms.years('w1')                # [1795]
+    histograms.timeline(['w1', 'w2'])     # [{'year': 1795, 'count': 1}]
+
+Years outside the range are kept exactly in a small per-woman overflow
+counter, so results never depend on the configured range.
+"""
+
+from array import array
+from collections import Counter
+
+DEFAULT_YEAR_RANGE = (1762, 1824)  # Goethe's correspondence (inclusive)
+
+
+class YearHistograms:
+    """Letter counts per (woman, year) in a row-major array('I') matrix"""
+
+    def __init__(self, year_range=None):
+        self.first_year, self.last_year = year_range or DEFAULT_YEAR_RANGE
+        if self.last_year < self.first_year:
+            raise ValueError(f"Empty year range {self.first_year}-{self.last_year}")
+        self.width = self.last_year - self.first_year + 1
+
+        self.rows = {}            # woman ID -> row number
+        self.matrix = array('I')  # row r: matrix[r * width:(r + 1) * width]
+        self.overflow = {}        # woman ID -> Counter of out-of-range years
+
+    def row(self, woman_id):
+        """Row number of a woman, allocating a zeroed row on first use"""
+        row = self.rows.get(woman_id)
+        if row is None:
+            row = self.rows[woman_id] = len(self.rows)
+            self.matrix.frombytes(bytes(self.matrix.itemsize * self.width))
+        return row
+
+    def add(self, woman_id, year, count=1):
+        """Count letters of a woman in a year"""
+        column = year - self.first_year
+        if 0 <= column < self.width:
+            self.matrix[self.row(woman_id) * self.width + column] += count
+        else:
+            self.overflow.setdefault(woman_id, Counter())[year] += count
+
+    def clear(self, woman_id):
+        """Reset a woman's counts (the row stays allocated)"""
+        row = self.rows.get(woman_id)
+        if row is not None:
+            start = row * self.width
+            self.matrix[start:start + self.width] = array('I', bytes(self.matrix.itemsize * self.width))
+        self.overflow.pop(woman_id, None)
+
+    def counts(self, woman_id):
+        """{year: count} of one woman (years with letters only)"""
+        counts = {}
+        row = self.rows.get(woman_id)
+        if row is not None:
+            start = row * self.width
+            for column, count in enumerate(self.matrix[start:start + self.width]):
+                if count:
+                    counts[self.first_year + column] = count
+        counts.update(self.overflow.get(woman_id, {}))
+        return counts
+
+    def years(self, woman_id):
+        """Sorted distinct years with at least one letter"""
+        return sorted(self.counts(woman_id))
+
+    def totals(self, woman_ids=None):
+        """Per-year totals over the given women (default: all) as {year: count}
+
+        The selected rows are gathered into one contiguous matrix; each
+        year is then the C-level sum of a strided column slice.
+        """
+        if woman_ids is None:
+            matrix = self.matrix
+            overflow_ids = self.overflow.keys()
+        else:
+            matrix = array('I')
+            for woman_id in woman_ids:
+                row = self.rows.get(woman_id)
+                if row is not None:
+                    matrix.extend(self.matrix[row * self.width:(row + 1) * self.width])
+            overflow_ids = [woman_id for woman_id in woman_ids if woman_id in self.overflow]
+
+        totals = Counter()
+        for column in range(self.width):
+            count = sum(matrix[column::self.width])
+            if count:
+                totals[self.first_year + column] = count
+        for woman_id in overflow_ids:
+            totals.update(self.overflow[woman_id])
+        return totals
+
+    def timeline(self, woman_ids=None):
+        """[{'year', 'count'}] in year order, years with letters only"""
+        return [{'year': year, 'count': count} for year, count in sorted(self.totals(woman_ids).items())]
+
+    def timelines_by(self, groups):
+        """{group: timeline} for {group: woman IDs}"""
+        return {group: self.timeline(woman_ids) for group, woman_ids in groups.items()}